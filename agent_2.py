@@ -10,6 +10,10 @@ from langgraph.prebuilt import tools_condition, ToolNode
 from operator import add
 from typing import Annotated, TypedDict
 from langchain_core.messages import HumanMessage, AIMessage
+from utils.blob_store import get_blob_text, put_blob, put_local, resolve_blob
+from utils.fmp_client import fmp_get
+from utils.model_router import routed_invoke
+from utils.serialization import dumps
 
 # Load environment variables from .env file
 load_dotenv()
@@ -18,45 +22,42 @@ load_dotenv()
 class FinancialAnalysisState(TypedDict):
     messages: Annotated[list, add]
     ticker: str
+    # utils.blob_store local references to the parsed fetcher output - kept in process, never serialized
     long_term_data: str
     short_term_data: str
+    company_profile: str
+    # utils.blob_store reference to the compact JSON that goes into the analyst prompt
     combined_data: str
 
 
-def getFundamentalLongTermData(ticker: str) -> str:
-    """Gets fundamental data for a given ticker from Financial Modeling Prep API
+def fetchLongTermData(ticker: str) -> dict:
+    """Gets annual fundamental data for a given ticker from Financial Modeling Prep API
 
     Args:
         ticker: the ticker to get fundamental data for
     
     Returns:
-        JSON string containing comprehensive financial data
+        Dict containing comprehensive financial data (parsed, not serialized)
     """
     api_key = os.getenv("FMP_API_KEY")
     if not api_key:
-        return json.dumps({"error": "FMP_API_KEY not found in environment variables"})
-    
-    base_url = "https://financialmodelingprep.com/api/v3"
+        return {"error": "FMP_API_KEY not found in environment variables"}
     
     try:
-        # Get multiple financial datasets
+        # Get multiple financial datasets (company profile is fetched once by data_fetcher_node)
         endpoints = {
-            "income_statement": f"{base_url}/income-statement/{ticker}?limit=2&apikey={api_key}",
-            "balance_sheet": f"{base_url}/balance-sheet-statement/{ticker}?limit=2&apikey={api_key}",
-            "cash_flow": f"{base_url}/cash-flow-statement/{ticker}?limit=2&apikey={api_key}",
-            "company_profile": f"{base_url}/profile/{ticker}?apikey={api_key}",
-            "financial_ratios": f"{base_url}/ratios/{ticker}?limit=2&apikey={api_key}",
-            "key_metrics": f"{base_url}/key-metrics/{ticker}?limit=2&apikey={api_key}",
-            "enterprise_value": f"{base_url}/enterprise-values/{ticker}?limit=2&apikey={api_key}"
+            "income_statement": ("income-statement", {"limit": 2}),
+            "balance_sheet": ("balance-sheet-statement", {"limit": 2}),
+            "cash_flow": ("cash-flow-statement", {"limit": 2}),
+            "financial_ratios": ("ratios", {"limit": 2}),
+            "key_metrics": ("key-metrics", {"limit": 2}),
+            "enterprise_value": ("enterprise-values", {"limit": 2})
         }
         
         fundamental_data = {}
         
-        for data_type, url in endpoints.items():
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
+        for data_type, (endpoint, params) in endpoints.items():
+            data = fmp_get(endpoint, ticker, **params)
             if data:  # Check if data is not empty
                 fundamental_data[data_type] = data
             else:
@@ -66,67 +67,58 @@ def getFundamentalLongTermData(ticker: str) -> str:
         fundamental_data["ticker"] = ticker.upper()
         fundamental_data["data_source"] = "Financial Modeling Prep"
         
-        return json.dumps(fundamental_data, indent=2)
+        return fundamental_data
         
     except requests.exceptions.RequestException as e:
-        error_msg = {
+        return {
             "error": f"API request failed: {str(e)}",
             "ticker": ticker,
             "data_source": "Financial Modeling Prep"
         }
-        return json.dumps(error_msg, indent=2)
     
     except json.JSONDecodeError as e:
-        error_msg = {
+        return {
             "error": f"Failed to parse API response: {str(e)}",
             "ticker": ticker,
             "data_source": "Financial Modeling Prep"
         }
-        return json.dumps(error_msg, indent=2)
     
     except Exception as e:
-        error_msg = {
+        return {
             "error": f"Unexpected error: {str(e)}",
             "ticker": ticker,
             "data_source": "Financial Modeling Prep"
         }
-        return json.dumps(error_msg, indent=2)
 
-def getFundamentalShortTermData(ticker: str) -> str:
+def fetchShortTermData(ticker: str) -> dict:
     """Gets quarterly fundamental data for the last two quarters from Financial Modeling Prep API
 
     Args:
         ticker: the ticker to get quarterly fundamental data for
     
     Returns:
-        JSON string containing quarterly financial data for the last 2 quarters
+        Dict containing quarterly financial data for the last 2 quarters (parsed, not serialized)
     """
     api_key = os.getenv("FMP_API_KEY")
     if not api_key:
-        return json.dumps({"error": "FMP_API_KEY not found in environment variables"})
-    
-    base_url = "https://financialmodelingprep.com/api/v3"
+        return {"error": "FMP_API_KEY not found in environment variables"}
     
     try:
         # Get quarterly financial datasets for last 2 quarters
         endpoints = {
-            "quarterly_income_statement": f"{base_url}/income-statement/{ticker}?period=quarter&limit=2&apikey={api_key}",
-            "quarterly_balance_sheet": f"{base_url}/balance-sheet-statement/{ticker}?period=quarter&limit=2&apikey={api_key}",
-            "quarterly_cash_flow": f"{base_url}/cash-flow-statement/{ticker}?period=quarter&limit=2&apikey={api_key}",
-            "quarterly_ratios": f"{base_url}/ratios/{ticker}?period=quarter&limit=2&apikey={api_key}",
-            "quarterly_key_metrics": f"{base_url}/key-metrics/{ticker}?period=quarter&limit=2&apikey={api_key}",
-            "quarterly_earnings": f"{base_url}/earnings/{ticker}?limit=2&apikey={api_key}",
-            "quarterly_financial_growth": f"{base_url}/financial-growth/{ticker}?period=quarter&limit=2&apikey={api_key}",
-            "company_profile": f"{base_url}/profile/{ticker}?apikey={api_key}"
+            "quarterly_income_statement": ("income-statement", {"period": "quarter", "limit": 2}),
+            "quarterly_balance_sheet": ("balance-sheet-statement", {"period": "quarter", "limit": 2}),
+            "quarterly_cash_flow": ("cash-flow-statement", {"period": "quarter", "limit": 2}),
+            "quarterly_ratios": ("ratios", {"period": "quarter", "limit": 2}),
+            "quarterly_key_metrics": ("key-metrics", {"period": "quarter", "limit": 2}),
+            "quarterly_earnings": ("earnings", {"limit": 2}),
+            "quarterly_financial_growth": ("financial-growth", {"period": "quarter", "limit": 2})
         }
         
         quarterly_data = {}
         
-        for data_type, url in endpoints.items():
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
+        for data_type, (endpoint, params) in endpoints.items():
+            data = fmp_get(endpoint, ticker, **params)
             if data:  # Check if data is not empty
                 quarterly_data[data_type] = data
             else:
@@ -137,35 +129,62 @@ def getFundamentalShortTermData(ticker: str) -> str:
         quarterly_data["data_source"] = "Financial Modeling Prep"
         quarterly_data["data_period"] = "Quarterly (Last 2 quarters)"
         
-        return json.dumps(quarterly_data, indent=2)
+        return quarterly_data
         
     except requests.exceptions.RequestException as e:
-        error_msg = {
+        return {
             "error": f"API request failed: {str(e)}",
             "ticker": ticker,
             "data_source": "Financial Modeling Prep",
             "data_period": "Quarterly"
         }
-        return json.dumps(error_msg, indent=2)
     
     except json.JSONDecodeError as e:
-        error_msg = {
+        return {
             "error": f"Failed to parse API response: {str(e)}",
             "ticker": ticker,
             "data_source": "Financial Modeling Prep",
             "data_period": "Quarterly"
         }
-        return json.dumps(error_msg, indent=2)
     
     except Exception as e:
-        error_msg = {
+        return {
             "error": f"Unexpected error: {str(e)}",
             "ticker": ticker,
             "data_source": "Financial Modeling Prep",
             "data_period": "Quarterly"
         }
-        return json.dumps(error_msg, indent=2)
 
+def fetchCompanyProfile(ticker: str):
+    """Gets the company profile once per run - it used to be downloaded by both fetchers"""
+    try:
+        data = fmp_get("profile", ticker)
+        return data if data else f"No company_profile data available for {ticker}"
+    except Exception as e:
+        return {"error": f"Failed to fetch company profile: {str(e)}"}
+
+
+def getFundamentalLongTermData(ticker: str) -> str:
+    """Gets fundamental data for a given ticker from Financial Modeling Prep API
+
+    Args:
+        ticker: the ticker to get fundamental data for
+    
+    Returns:
+        JSON string containing comprehensive financial data
+    """
+    return dumps(fetchLongTermData(ticker))
+
+def getFundamentalShortTermData(ticker: str) -> str:
+    """Gets quarterly fundamental data for the last two quarters from Financial Modeling Prep API
+
+    Args:
+        ticker: the ticker to get quarterly fundamental data for
+    
+    Returns:
+        JSON string containing quarterly financial data for the last 2 quarters
+    """
+    return dumps(fetchShortTermData(ticker))
 
 tools = [getFundamentalLongTermData, getFundamentalShortTermData]
 
@@ -197,41 +216,46 @@ def data_fetcher_node(state: FinancialAnalysisState) -> FinancialAnalysisState:
     ticker = extract_ticker(latest_message)
     
     if not ticker:
+        error_ref = put_blob({"error": "No valid ticker symbol found in message"})
         return {
-            "messages": state["messages"],
             "ticker": "",
-            "long_term_data": json.dumps({"error": "No valid ticker symbol found in message"}),
-            "short_term_data": json.dumps({"error": "No valid ticker symbol found in message"}),
-            "combined_data": json.dumps({"error": "No valid ticker symbol found in message"})
+            "long_term_data": error_ref,
+            "short_term_data": error_ref,
+            "company_profile": "",
+            "combined_data": error_ref
         }
     
     print(f"📊 Fetching data for ticker: {ticker}")
     print("⚡ Calling both long-term and short-term APIs simultaneously...")
     
-    # Fetch both datasets simultaneously
-    long_term_data = getFundamentalLongTermData(ticker)
-    short_term_data = getFundamentalShortTermData(ticker)
+    # Fetch both datasets, and the shared company profile only once - state carries references to the
+    # parsed objects, which are serialized once, combined, at the prompt boundary
+    long_term_data = put_local(fetchLongTermData(ticker))
+    short_term_data = put_local(fetchShortTermData(ticker))
+    company_profile = put_local(fetchCompanyProfile(ticker))
     
     print(f"✅ Data fetching completed for {ticker}")
     
     return {
-        "messages": state["messages"],
         "ticker": ticker,
         "long_term_data": long_term_data,
         "short_term_data": short_term_data,
+        "company_profile": company_profile,
         "combined_data": ""  # Will be populated by data_combiner_node
     }
 
 def data_combiner_node(state: FinancialAnalysisState) -> FinancialAnalysisState:
     """Combine long-term and short-term data into a comprehensive dataset"""
     try:
-        long_term = json.loads(state["long_term_data"])
-        short_term = json.loads(state["short_term_data"])
+        # The parsed payloads as the fetcher produced them - no parsing here
+        long_term = resolve_blob(state["long_term_data"])
+        short_term = resolve_blob(state["short_term_data"])
         
         combined = {
             "ticker": state["ticker"],
             "analysis_type": "Comprehensive Financial Analysis",
             "data_sources": "Financial Modeling Prep",
+            "company_profile": resolve_blob(state.get("company_profile")) or [],
             "long_term_analysis": {
                 "description": "3-year historical annual data for trend analysis",
                 "data": long_term
@@ -243,14 +267,14 @@ def data_combiner_node(state: FinancialAnalysisState) -> FinancialAnalysisState:
             "analyst_instructions": "Analyze both long-term trends and recent quarterly performance to provide comprehensive assessment"
         }
         
-        return {"combined_data": json.dumps(combined, indent=2)}
+        return {"combined_data": put_blob(combined)}
         
     except Exception as e:
         error_data = {
             "error": f"Failed to combine data: {str(e)}",
             "ticker": state["ticker"]
         }
-        return {"combined_data": json.dumps(error_data, indent=2)}
+        return {"combined_data": put_blob(error_data)}
 
 # System message
 sys_msg = SystemMessage(content="""You are a professional equity research analyst specializing in fundamental analysis. 
@@ -282,13 +306,13 @@ def fundamentalAnalyst(state: FinancialAnalysisState) -> FinancialAnalysisState:
     analysis_prompt = f"""
     Please analyze the following comprehensive financial data for {state['ticker']}:
     
-    {state['combined_data']}
+    {get_blob_text(state['combined_data'])}
     
     Provide your professional equity research analysis based on this data.
     """
     
     # Get analysis from LLM
-    response = llm.invoke([sys_msg, HumanMessage(content=analysis_prompt)])
+    response = routed_invoke("fundamental_analyst", [sys_msg, HumanMessage(content=analysis_prompt)])
     
     return {"messages": [response]}
 
@@ -332,6 +356,7 @@ def analyze_stock(message: str) -> dict:
         "ticker": "",
         "long_term_data": "",
         "short_term_data": "",
+        "company_profile": "",
         "combined_data": ""
     }
     
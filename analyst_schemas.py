@@ -0,0 +1,105 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+# Typed output schemas of the analyst nodes and the manager. They are sent to the provider as
+# structured-output formats (so the model can only produce matching JSON) and used to validate the
+# answers. Fields have no defaults: strict structured output requires every field.
+
+
+class Score(BaseModel):
+    score: int = Field(description="0-10")
+    justification: str = Field(description="brief explanation")
+
+    @field_validator("score")
+    @classmethod
+    def clamp_score(cls, value: int) -> int:
+        return min(10, max(0, value))
+
+
+class StrengthsAndWeaknesses(BaseModel):
+    strengths: list[str]
+    weaknesses: list[str]
+
+
+class FundamentalReport(BaseModel):
+    growth_score: Score
+    risk_score: Score
+    summary: str = Field(description="3-5 sentence human-readable summary")
+    notes: str = Field(description="key metrics and evidence in bullet points")
+    strengths_and_weaknesses: StrengthsAndWeaknesses
+
+
+class TechnicalReport(BaseModel):
+    recommendation: Literal["BUY", "HOLD", "SELL", "NONE"]
+    confidence: Literal["HIGH", "MEDIUM", "LOW"]
+    summary: str = Field(description="2-3 sentence explanation based on technical indicators")
+    key_indicators: list[str] = Field(description="3-4 most important technical signals")
+    price_target: Optional[str] = Field(description="target price or range, null if not applicable")
+    risk_level: Literal["LOW", "MEDIUM", "HIGH"]
+
+
+class DetailedAnalysis(BaseModel):
+    fundamental_highlights: list[str]
+    technical_highlights: list[str]
+    risks: list[str]
+    catalysts: list[str]
+    price_target: str
+    investment_timeline: str
+
+
+class ManagerReport(BaseModel):
+    # Field order is the output order - the first fields are streamed to the client first
+    final_recommendation: Literal["BUY", "HOLD", "SELL", "NONE"]
+    confidence: Literal["HIGH", "MEDIUM", "LOW"]
+    short_summary: str = Field(description="2-3 sentence simple explanation of the recommendation")
+    growth_score: Score
+    risk_score: Score
+    detailed_analysis: DetailedAnalysis
+
+
+class RankedTicker(BaseModel):
+    ticker: str
+    rank: int = Field(description="1 = most attractive")
+    final_recommendation: Literal["BUY", "HOLD", "SELL", "NONE"]
+    confidence: Literal["HIGH", "MEDIUM", "LOW"]
+    growth_score: int = Field(description="0-10")
+    risk_score: int = Field(description="0-10")
+    rationale: str = Field(description="1-2 sentences on why it ranks here relative to the others")
+
+
+class ComparisonReport(BaseModel):
+    best_pick: str = Field(description="ticker of the most attractive stock, or NONE")
+    short_summary: str = Field(description="2-3 sentence explanation of the ranking")
+    ranking: list[RankedTicker]
+    key_differences: list[str] = Field(description="the differences that decided the ranking")
+
+
+class DebateReport(BaseModel):
+    # Shared by the bull and the bear analyst - one schema keeps their prompts byte-identical up to the
+    # role-specific suffix
+    stance: Literal["BULL", "BEAR"]
+    thesis: str = Field(description="2-3 sentence investment thesis")
+    arguments: list[str] = Field(description="3-5 strongest arguments, each with evidence from the data")
+    rebuttals: list[str] = Field(description="answers to the strongest arguments of the other side")
+    price_target: str = Field(description="target price or range implied by the thesis")
+    conviction: Literal["HIGH", "MEDIUM", "LOW"]
+    invalidation: list[str] = Field(description="developments that would prove the thesis wrong")
+
+
+class PortfolioReport(BaseModel):
+    risk_level: Literal["LOW", "MEDIUM", "HIGH"]
+    short_summary: str = Field(description="2-3 sentence simple explanation of the portfolio's risk")
+    key_risks: list[str] = Field(description="main risk factors, with the numbers behind them")
+    concentration: list[str] = Field(description="positions, pairs or clusters that dominate the risk")
+    suggestions: list[str] = Field(description="concrete ways to reduce or rebalance the risk")
+
+
+class SectorReport(BaseModel):
+    outlook: Literal["POSITIVE", "NEUTRAL", "NEGATIVE"]
+    confidence: Literal["HIGH", "MEDIUM", "LOW"]
+    short_summary: str = Field(description="2-3 sentence summary of the sector's state and outlook")
+    key_themes: list[str] = Field(description="themes driving the sector, with the numbers behind them")
+    ranking: list[RankedTicker]
+    top_picks: list[str] = Field(description="tickers of the most attractive constituents")
+    risks: list[str] = Field(description="sector-wide risk factors")
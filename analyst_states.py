@@ -1,3 +1,6 @@
+import operator
+from typing import Annotated
+
 from langgraph.graph import MessagesState
 
 
@@ -19,8 +22,25 @@ class TechnicalAnalysisState(MessagesState):
 
 
 class AnalystManagerState(MessagesState):
+    # company_profile, fundamental_analysis and technical_analysis hold utils.blob_store references
+    # ("blob:sha256:...") - nodes load the payload only when they actually need it
     company_profile: str 
     ticker: str 
     fundamental_analysis: str
     technical_analysis: str
     manager_analysis: str
+    # The fetched payloads the two analysts worked from (blob references), reused by later stages
+    fundamental_data: str
+    technical_data: str
+    # Comparison mode: all requested tickers, and one entry per ticker collected from the parallel
+    # per-ticker branches
+    tickers: list[str]
+    comparison: Annotated[list, operator.add]
+    # Bull / bear debate: the shared data prompt and the two reports (blob references)
+    debate_context: str
+    bull_report: str
+    bear_report: str
+    # Sector mode: the requested sector / industry name and the shared sector context (blob reference)
+    # injected into every constituent's branch
+    sector: str
+    sector_context: str
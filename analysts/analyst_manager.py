@@ -1,13 +1,56 @@
+import os
+import time
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
+from langgraph.config import get_stream_writer
 
 from analyst_states import AnalystManagerState
+from analyst_schemas import ManagerReport
+from utils.blob_store import get_blob
+from utils.incremental_json import IncrementalJSONParser
+from utils.model_router import routed_structured
+from utils.market_regime import get_market_regime, get_market_regime_text
+from utils.report_diff import diff_reports, has_material_changes
+from utils.report_store import get_report_entry, put_report
+from utils.serialization import dumps
 
 # Load environment variables from .env file
 load_dotenv()
 
-llm = ChatOpenAI(model="gpt-4o")
+# Incremental synthesis: the previous recommendation per ticker is kept together with the analyst
+# reports it was based on. Later runs diff the new reports against those and either reuse the
+# recommendation (nothing material changed) or send only the previous conclusion plus the deltas.
+MANAGER_INCREMENTAL = os.getenv("MANAGER_INCREMENTAL", "true").lower() in ("1", "true", "yes")
+# Older recommendations are rebuilt from scratch
+MANAGER_REPORT_MAX_AGE_HOURS = float(os.getenv("MANAGER_REPORT_MAX_AGE_HOURS", "24"))
+
+
+def _previous_synthesis(ticker: str) -> dict:
+    if not MANAGER_INCREMENTAL:
+        return None
+    entry = get_report_entry("analyst_manager", ticker)
+    if not entry or time.time() - entry.get("created_at", 0) > MANAGER_REPORT_MAX_AGE_HOURS * 3600:
+        return None
+    return entry["report"]
+
+
+def _stream_writer():
+    """The graph's custom stream writer, a no-op when the node runs outside a graph"""
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda event: None
+
+
+def _emitter(writer):
+    """Forwards completion chunks as "token" events and completed top-level JSON fields as "field" events"""
+    parser = IncrementalJSONParser()
+
+    def on_chunk(text: str):
+        writer({"type": "token", "text": text})
+        for name, value in parser.feed(text):
+            writer({"type": "field", "name": name, "value": value})
+    return on_chunk
 
 
 def analyst_manager(state: AnalystManagerState):
@@ -31,14 +74,16 @@ def analyst_manager(state: AnalystManagerState):
     - price_target: potential target price
     - risk_level: "LOW" | "MEDIUM" | "HIGH"
 
+    **Market Regime Context**: a daily snapshot of index / sector ETF trends, breadth and realized volatility
+
     Your task is to combine both analyses and provide a **structured JSON output** with:
     
     {
         "final_recommendation": "BUY" | "HOLD" | "SELL" | "NONE",
         "confidence": "HIGH" | "MEDIUM" | "LOW",
+        "short_summary": "2-3 sentence simple explanation of the recommendation",
         "growth_score": {"score": 0-10, "justification": "brief explanation"},
         "risk_score": {"score": 0-10, "justification": "brief explanation"},
-        "short_summary": "2-3 sentence simple explanation of the recommendation",
         "detailed_analysis": {
             "fundamental_highlights": ["key fundamental points supporting the decision"],
             "technical_highlights": ["key technical points supporting the decision"],
@@ -52,26 +97,70 @@ def analyst_manager(state: AnalystManagerState):
     Guidelines:
     - Weight fundamental analysis more heavily for long-term investment decisions
     - Weight technical analysis more heavily for timing and entry/exit points
+    - Use the market regime to calibrate timing and confidence, not to override company-specific evidence
     - If fundamental and technical analyses conflict, explain the discrepancy and provide balanced guidance
     - Consider both analyses when determining final confidence level
     - Use simple, clear language that retail investors can understand
     - Be objective and highlight both opportunities and risks""")
 
     """Combine fundamental and technical analysis reports to provide final investment recommendation"""
-    # Create a message with both analysis reports
-    analysis_prompt = f"""
-    As a senior investment analyst, please synthesize the following reports for {state['ticker']} and provide your final investment recommendation:
+    ticker = state['ticker']
+    fundamental_analysis = get_blob(state['fundamental_analysis'])
+    technical_analysis = get_blob(state['technical_analysis'])
+    inputs = {
+        "fundamental_analysis": fundamental_analysis,
+        "technical_analysis": technical_analysis,
+        "market_regime": get_market_regime().get("regime"),
+    }
+
+    # Streamed to the client in stream_mode="custom": tokens as they arrive, fields once complete
+    emit = _emitter(_stream_writer())
+
+    previous = _previous_synthesis(ticker)
+    if previous is not None:
+        changes = diff_reports(previous["inputs"], inputs)
+        if not has_material_changes(changes):
+            # Nothing that would change the conclusion - reuse it without calling the LLM
+            emit(previous["manager_analysis"])
+            return {"manager_analysis": previous["manager_analysis"]}
+
+        analysis_prompt = f"""
+    You previously issued the following investment recommendation for {ticker}:
+
+    **PREVIOUS RECOMMENDATION:**
+    {previous["manager_analysis"]}
+
+    Since then the analyst reports changed as follows (field: before -> after, "material" marks changes that may affect the conclusion):
+
+    **CHANGES:**
+    {dumps(changes)}
+
+    Update your recommendation to reflect these changes and return the complete recommendation in the exact JSON format specified in the system message. Keep everything that the changes do not affect, and explain in the short_summary what changed.
+    """
+    else:
+        # Create a message with both analysis reports
+        analysis_prompt = f"""
+    As a senior investment analyst, please synthesize the following reports for {ticker} and provide your final investment recommendation:
 
     **FUNDAMENTAL ANALYSIS REPORT:**
-    {state['fundamental_analysis']}
+    {dumps(fundamental_analysis)}
 
     **TECHNICAL ANALYSIS REPORT:**
-    {state['technical_analysis']}
+    {dumps(technical_analysis)}
+
+    **MARKET REGIME CONTEXT:**
+    {get_market_regime_text()}
 
     Based on both reports above, provide your comprehensive investment recommendation in the exact JSON format specified in the system message. Consider how the fundamental strengths/weaknesses align with the technical signals, and provide a balanced assessment that combines both perspectives.
     """
     
     # Get analysis from LLM
-    response = llm.invoke([sys_msg, HumanMessage(content=analysis_prompt)])
-    
-    return {"manager_analysis": response.content}
+    report, response = routed_structured("analyst_manager", [sys_msg, HumanMessage(content=analysis_prompt)],
+                                         ManagerReport, on_chunk=emit)
+    if report is None:
+        # Output failed validation even after the repair call - pass on whatever the model produced
+        return {"manager_analysis": response.content if response is not None else ""}
+
+    manager_analysis = dumps(report, pretty=True)
+    put_report("analyst_manager", ticker, {"manager_analysis": manager_analysis, "inputs": inputs})
+    return {"manager_analysis": manager_analysis}
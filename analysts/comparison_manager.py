@@ -0,0 +1,121 @@
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.graph import END, START, StateGraph
+
+from analyst_schemas import ComparisonReport
+from analyst_states import AnalystManagerState
+from analysts.analyst_manager import _emitter, _stream_writer
+from analysts.fundamental_agent import fundamental_analyst
+from analysts.technical_analyst import technical_analyst
+from utils.blob_store import get_blob
+from utils.company_profile_tool import get_company_profile
+from utils.market_regime import get_market_regime_text
+from utils.model_router import routed_structured
+from utils.serialization import dumps
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Comparison mode ("compare AAPL, MSFT and GOOGL"): the main graph fans out one analyze_ticker branch per
+# ticker (map), each running the usual profile -> fundamental || technical pipeline - with its report
+# and FMP caches - and comparison_manager ranks all of them in a single synthesis call (reduce).
+
+_ticker_builder = StateGraph(AnalystManagerState)
+_ticker_builder.add_node("get_company_profile", get_company_profile)
+_ticker_builder.add_node("fundamental_analyst", fundamental_analyst)
+_ticker_builder.add_node("technical_analyst", technical_analyst)
+_ticker_builder.add_edge(START, "get_company_profile")
+_ticker_builder.add_edge("get_company_profile", "fundamental_analyst")
+_ticker_builder.add_edge("get_company_profile", "technical_analyst")
+_ticker_builder.add_edge("fundamental_analyst", END)
+_ticker_builder.add_edge("technical_analyst", END)
+ticker_graph = _ticker_builder.compile()
+
+
+def analyze_ticker(state: AnalystManagerState) -> AnalystManagerState:
+    """One branch of the comparison (or sector) fan-out: the per-ticker pipeline for state["ticker"]
+
+    Returns:
+        AnalystManagerState with a single comparison entry holding the branch's blob references
+    """
+    ticker = state["ticker"]
+    # Sector mode passes the shared sector context on to the branch's analysts
+    result = ticker_graph.invoke({"ticker": ticker, "messages": [], "sector_context": state.get("sector_context", "")})
+    return {"comparison": [{
+        "ticker": ticker,
+        "company_profile": result.get("company_profile"),
+        "fundamental_analysis": result.get("fundamental_analysis"),
+        "technical_analysis": result.get("technical_analysis"),
+    }]}
+
+
+def _profile_summary(profile) -> dict:
+    records = profile.get("company_profile") if isinstance(profile, dict) else None
+    record = records[0] if isinstance(records, list) and records else {}
+    if not isinstance(record, dict):
+        return {}
+    summary = {
+        "name": record.get("companyName"),
+        "sector": record.get("sector"),
+        "industry": record.get("industry"),
+        "market_cap": record.get("mktCap", record.get("marketCap")),
+        "price": record.get("price"),
+        "beta": record.get("beta"),
+    }
+    return {key: value for key, value in summary.items() if value is not None}
+
+
+def _branch_reports(state: AnalystManagerState) -> dict:
+    """The collected branch results as {ticker: {profile, fundamental_analysis, technical_analysis}},
+    in the requested ticker order"""
+    # The comparison list accumulates over the turns of a thread - keep the requested tickers only, each
+    # with its latest entry
+    latest = {entry["ticker"]: entry for entry in state.get("comparison", [])}
+    entries = [latest[ticker] for ticker in state.get("tickers", []) if ticker in latest]
+    return {
+        entry["ticker"]: {
+            "profile": _profile_summary(get_blob(entry["company_profile"])) if entry["company_profile"] else {},
+            "fundamental_analysis": get_blob(entry["fundamental_analysis"]) if entry["fundamental_analysis"] else None,
+            "technical_analysis": get_blob(entry["technical_analysis"]) if entry["technical_analysis"] else None,
+        }
+        for entry in entries
+    }
+
+
+def comparison_manager(state: AnalystManagerState):
+    """Ranks the compared tickers from their analyst reports in one synthesis call"""
+    sys_msg = SystemMessage(content="""You are a senior equity research analyst and investment manager. You compare several stocks
+    and rank them from the most to the least attractive investment.
+
+    For every stock you receive a short company profile, a fundamental analysis report (growth_score, risk_score,
+    summary, notes, strengths_and_weaknesses) and a technical analysis report (recommendation, confidence, summary,
+    key_indicators, price_target, risk_level). You also receive a market regime context shared by all of them.
+
+    Guidelines:
+    - Rank every stock exactly once, rank 1 being the most attractive
+    - Give each stock its own final recommendation - a stock can rank last and still be a BUY
+    - Weight fundamentals more heavily for the long-term view and technicals for timing
+    - Compare the stocks with each other, not only with the market: name the differences that decided the ranking
+    - Say so when a report is missing or failed and lower the confidence for that stock
+    - Use simple, clear language that retail investors can understand""")
+
+    reports = _branch_reports(state)
+
+    analysis_prompt = f"""
+    Compare and rank the following stocks: {", ".join(reports)}
+
+    **ANALYST REPORTS PER TICKER:**
+    {dumps(reports)}
+
+    **MARKET REGIME CONTEXT:**
+    {get_market_regime_text()}
+    """
+
+    report, response = routed_structured("comparison_manager", [sys_msg, HumanMessage(content=analysis_prompt)],
+                                         ComparisonReport, on_chunk=_emitter(_stream_writer()))
+    if report is None:
+        # Output failed validation even after the repair call - pass on whatever the model produced
+        return {"manager_analysis": response.content if response is not None else ""}
+
+    report["ranking"].sort(key=lambda ranked: ranked["rank"])
+    return {"manager_analysis": dumps(report, pretty=True)}
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from analyst_schemas import DebateReport
+from analyst_states import AnalystManagerState
+from utils.blob_store import get_blob, get_blob_text, put_blob, resolve_blob, resolve_blob_text
+from utils.fundamental_analysis_tool import fetch_fundamental_data
+from utils.model_router import get_router_stats, routed_structured
+from utils.technical_analysis_tool import get_technical_analysis
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Bull and bear analysts argue for and against buying from the same data. Their prompts are
+# [shared system message, shared data block, short role suffix]: everything before the suffix is
+# byte-identical (built once by debate_context and read back from the blob store), so the provider's
+# prompt cache serves the data block of the second call at a discount. The same prompt_cache_key
+# routes both calls to the same cache.
+BULL_BEAR_REPORTS = os.getenv("BULL_BEAR_REPORTS", "true").lower() == "true"
+# The provider caches a prefix once its first request has been processed. When both calls start
+# together on a cold prefix, the second waits up to this long for the first (0 disables).
+DEBATE_PREFIX_STAGGER_SECONDS = float(os.getenv("DEBATE_PREFIX_STAGGER_SECONDS", "1.0"))
+
+debate_sys_msg = SystemMessage(content="""You are an equity research analyst taking part in an investment debate about one stock.
+    One analyst argues the bull case (for buying shares), the other the bear case (against buying shares).
+    Your role is given at the end of the conversation.
+
+    You will receive:
+    - the fundamental data (annual and quarterly statements, ratios, valuation and peer data)
+    - the technical data (price history summary and indicators)
+    - the reports of the fundamental and the technical analyst
+
+    Guidelines:
+    - Argue your side as strongly as the data honestly allows - cite concrete numbers for every argument
+    - Anticipate the strongest arguments of the other side and answer them
+    - Do not invent data; if the evidence for your side is weak, say so and lower your conviction
+    - Name the developments that would prove your thesis wrong""")
+
+BULL_SUFFIX = "Your role: BULL. Make the case for buying shares of {ticker} now."
+BEAR_SUFFIX = "Your role: BEAR. Make the case against buying shares of {ticker} now."
+
+_leaders = {}
+_leaders_lock = threading.Lock()
+
+
+@contextmanager
+def _prefix_turn(cache_key: str):
+    """The first call with a prefix goes immediately; a concurrent call with the same prefix waits
+    (bounded) until the first one has been answered, so it finds the prefix cached"""
+    with _leaders_lock:
+        done = _leaders.get(cache_key)
+        leader = done is None
+        if leader:
+            done = _leaders[cache_key] = threading.Event()
+    if not leader and DEBATE_PREFIX_STAGGER_SECONDS > 0:
+        done.wait(DEBATE_PREFIX_STAGGER_SECONDS)
+    try:
+        yield
+    finally:
+        if leader:
+            with _leaders_lock:
+                _leaders.pop(cache_key, None)
+            done.set()
+
+
+def debate_context(state: AnalystManagerState) -> AnalystManagerState:
+    """Builds the data block shared by the bull and bear prompts
+
+    Runs after the fundamental and technical analysts and reads the payloads they put in state, so
+    nothing is fetched again. Only a reused fundamental report without its stored payload makes this node
+    fetch the fundamentals.
+
+    Returns:
+        AnalystManagerState with debate_context set to a blob reference of the prompt text
+    """
+    ticker = state["ticker"]
+    fundamental_data = state.get("fundamental_data")
+    if fundamental_data:
+        fundamental_data = get_blob_text(fundamental_data)
+    else:
+        profile = resolve_blob(state.get("company_profile"))
+        company_profile = profile.get("company_profile") if isinstance(profile, dict) else None
+        fundamental_data = resolve_blob_text(fetch_fundamental_data(ticker, company_profile))
+    technical_data = state.get("technical_data")
+    technical_data = get_blob(technical_data) if technical_data else get_technical_analysis.invoke({"ticker": ticker})
+
+    prompt = f"""
+    Stock under debate: {ticker}
+
+    **FUNDAMENTAL DATA:**
+    {fundamental_data}
+
+    **TECHNICAL DATA:**
+    {technical_data}
+
+    **FUNDAMENTAL ANALYST REPORT:**
+    {get_blob_text(state["fundamental_analysis"])}
+
+    **TECHNICAL ANALYST REPORT:**
+    {get_blob_text(state["technical_analysis"])}
+    """
+    return {"debate_context": put_blob(prompt)}
+
+
+def _debate(stage: str, state: AnalystManagerState, suffix: str) -> dict:
+    ticker = state["ticker"]
+    prefix = get_blob(state["debate_context"])
+    cache_key = "debate:" + hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+    messages = [debate_sys_msg, HumanMessage(content=prefix), HumanMessage(content=suffix.format(ticker=ticker))]
+
+    with _prefix_turn(cache_key):
+        report, _ = routed_structured(stage, messages, DebateReport, prompt_cache_key=cache_key)
+    if report is None:
+        # Output failed validation even after the repair call
+        report = {"error": f"{stage} report could not be completed for {ticker}"}
+    return report
+
+
+def bull_analyst(state: AnalystManagerState) -> AnalystManagerState:
+    """The case for buying shares, argued from the shared debate context"""
+    return {"bull_report": put_blob(_debate("bull_analyst", state, BULL_SUFFIX))}
+
+
+def bear_analyst(state: AnalystManagerState) -> AnalystManagerState:
+    """The case against buying shares, argued from the shared debate context"""
+    return {"bear_report": put_blob(_debate("bear_analyst", state, BEAR_SUFFIX))}
+
+
+def get_debate_cache_stats() -> dict:
+    """Prefix-cache hit rate of the bull and bear calls (share of their prompt tokens read from cache)"""
+    stages = get_router_stats()["stages"]
+    stats = {}
+    for stage in ("bull_analyst", "bear_analyst"):
+        values = stages.get(stage, {})
+        stats[stage] = {key: values.get(key) for key in ("input_tokens", "cache_read_tokens", "cache_hit_rate")}
+    input_tokens = sum(values["input_tokens"] or 0 for values in stats.values())
+    cache_read = sum(values["cache_read_tokens"] or 0 for values in stats.values())
+    stats["combined_cache_hit_rate"] = round(cache_read / input_tokens, 4) if input_tokens else None
+    return stats
@@ -1,20 +1,26 @@
-import json
+import os
+import time
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 
 from langgraph.graph import START, StateGraph, MessagesState
-from utils.fundamental_analysis_tool import get_fundamental_data
+from utils.fundamental_analysis_tool import data_fingerprint, fetch_fundamental_data, probe_latest_filing
 from analyst_states import AnalystManagerState
+from analyst_schemas import FundamentalReport
+from utils.blob_store import get_blob_text, put_blob, resolve_blob
+from utils.model_router import routed_structured
+from utils.report_store import get_report_entry, put_report
+from utils.sector_aggregates import sector_context_text
 
 # Load environment variables from .env file
 load_dotenv()
 
-# TODO: add tool for calling sector data for future comparisons
 
-
-# Define LLM - no tools binding needed since we call getFundamentalData directly
-model = ChatOpenAI(model="gpt-4o")
+# Fundamentals only change with new filings, so a stored report is reused while no newer filing exists.
+# Valuation multiples move with the price though, hence the maximum age (0 disables reuse).
+FUNDAMENTAL_REPORT_MAX_AGE_DAYS = float(os.getenv("FUNDAMENTAL_REPORT_MAX_AGE_DAYS", "7"))
+# Report store stage holding the fetched payload of the latest plain report, under the same key
+PAYLOAD_STAGE = "fundamental_data"
 
 
 # System message
@@ -23,7 +29,12 @@ fundamental_analyst_sys_msg = SystemMessage(content="""You are a professional eq
     You have access to comprehensive financial data including:
     - 2 years of annual financial statements (income, balance sheet, cash flow)
     - 2 quarters of recent quarterly data (income, balance sheet, cash flow, earnings)
-    - Financial ratios, key metrics, and enterprise values (both annual and quarterly)
+    - Precomputed metrics for every period: margins, growth rates, returns, leverage and liquidity ratios,
+      plus valuation multiples (P/E, P/S, P/B, EV/EBITDA, FCF yield) for the latest fiscal year
+    - "history": long-run trends over up to 10+ fiscal years - revenue / income / EPS / FCF CAGRs (3, 5, 10 years),
+      growth volatility, growth and profitability streaks, margin averages and slopes, quarterly growth streaks
+    - When available, "peer_comparison": percentile ranks (0-100) of the latest fiscal year's metrics
+      among industry and sector peers, with the peer median and number of peers
     
     Note: Company profile data (sector, industry, market cap, description) is available through a separate tool if needed.
 
@@ -32,9 +43,11 @@ fundamental_analyst_sys_msg = SystemMessage(content="""You are a professional eq
     Your output must:
     1. Provide a concise **summary** of the company's financial state based on both annual trends and recent quarterly performance.
     2. Assess **growth potential** (strong / moderate / weak) with justification from both historical and recent data.
+       Use the history to tell durable trends from a single good or bad year.
     3. Assess **risk factors** (low / moderate / high) with justification from financial ratios and trends.
     4. Evaluate whether the stock appears **undervalued, fairly valued, or overvalued** 
-       relative to its sector and key financial metrics.
+       relative to its sector and key financial metrics. Use the peer percentiles for the sector comparison
+       when they are provided; otherwise say that no peer data was available.
     5. Mention notable strengths and weaknesses, highlighting any significant changes in recent quarters.
     6. Output a **structured JSON object** with:
        - "growth_score": {"score": 0-10, "justification": "brief explanation"},
@@ -46,68 +59,108 @@ fundamental_analyst_sys_msg = SystemMessage(content="""You are a professional eq
     Keep your tone factual, objective, and professional. 
     Base your analysis strictly on the comprehensive financial data provided.""")
 
+def _fresh_entry(ticker: str, stage: str = "fundamental_analyst") -> dict:
+    entry = get_report_entry(stage, ticker)
+    if not entry or not isinstance(entry.get("key"), dict) or FUNDAMENTAL_REPORT_MAX_AGE_DAYS <= 0:
+        return None
+    if time.time() - entry.get("created_at", 0) > FUNDAMENTAL_REPORT_MAX_AGE_DAYS * 86400:
+        return None
+    return entry
+
+
+def _store_report(stage: str, ticker: str, report: dict, fingerprint: dict, payload: dict):
+    put_report(stage, ticker, report, fingerprint)
+    if stage == "fundamental_analyst":
+        # Kept next to the plain report, so a later reuse of the report can hand on the data it was built on
+        put_report(PAYLOAD_STAGE, ticker, payload, fingerprint)
+
+
+def _stored_payload(ticker: str) -> dict:
+    """State update with the stored payload the reused plain report was built on (empty when missing)"""
+    data_entry = get_report_entry(PAYLOAD_STAGE, ticker)
+    report_entry = get_report_entry("fundamental_analyst", ticker)
+    if not data_entry or not report_entry or data_entry.get("key") != report_entry.get("key"):
+        return {}
+    return {"fundamental_data": put_blob(data_entry["report"])}
+
+
+def cached_fundamental_report(ticker: str, latest_filing: str = None) -> dict:
+    """The stored report when no newer filing exists than the one it was based on, else None
+
+    Args:
+        ticker: the ticker to look up
+        latest_filing: result of probe_latest_filing (probed when omitted)
+    """
+    entry = _fresh_entry(ticker)
+    if entry is None:
+        return None
+    try:
+        latest_filing = latest_filing or probe_latest_filing(ticker)
+    except Exception:
+        return None
+    if latest_filing and entry["key"].get("quarterly_filing") == latest_filing:
+        return entry["report"]
+    return None
+
+
 # Node
 def fundamental_analyst(state: AnalystManagerState) -> AnalystManagerState:
     """Analyze fundamental data and populate the fundamental_analysis state"""
 
     ticker = state["ticker"]
+    # Sector mode injects the shared sector context; those reports are stored apart from the plain ones
+    sector_context = sector_context_text(state.get("sector_context"), ticker)
+    report_stage = "sector_fundamental_analyst" if sector_context else "fundamental_analyst"
+    # One cheap probe: if no filing is newer than the stored report's data, skip the fetch and the LLM call
+    cached_report = None if sector_context else cached_fundamental_report(ticker)
+    if cached_report is not None:
+        return {"fundamental_analysis": put_blob(cached_report), **_stored_payload(ticker)}
+
+    # Reuse the profile fetched by get_company_profile (when present) for valuation multiples
+    profile = resolve_blob(state.get("company_profile"))
+    company_profile = profile.get("company_profile") if isinstance(profile, dict) else None
     # Get fundamental data
-    fundamental_data = get_fundamental_data(ticker)
+    fundamental_payload = fetch_fundamental_data(ticker, company_profile)
+    # The payload is serialized once - the prompt below and later stages (debate) read the blob's text
+    data_ref = put_blob(fundamental_payload)
+    fingerprint = data_fingerprint(fundamental_payload)
+    if sector_context:
+        fingerprint = {**fingerprint, "sector_context": state["sector_context"]}
+
+    # Same data as the stored report was produced from - the LLM would only repeat itself
+    entry = _fresh_entry(ticker, report_stage)
+    if entry is not None and entry["key"] == fingerprint:
+        _store_report(report_stage, ticker, entry["report"], fingerprint, fundamental_payload)
+        return {"fundamental_analysis": put_blob(entry["report"]), "fundamental_data": data_ref}
+
+    fundamental_data = get_blob_text(data_ref)
     
     # Create analysis request
     analysis_prompt = f"""
     Analyze the following fundamental data for {ticker} and provide your assessment:
     
     {fundamental_data}
-    
+    {sector_context}
     Please provide your analysis in the exact JSON format specified in the system message.
     """
     
     # Get analysis from LLM
     messages = [fundamental_analyst_sys_msg, HumanMessage(content=analysis_prompt)]
-    response = model.invoke(messages)
-    
-    # Parse the response to extract the structured data
-    try:
-        # Extract JSON from the response content
-        response_content = response.content
-        # Try to find JSON in the response
-        import re
-        json_match = re.search(r'\{.*\}', response_content, re.DOTALL)
-        if json_match:
-            analysis_json = json.loads(json_match.group())
-        else:
-            # Fallback if JSON parsing fails
-            analysis_json = {
-                "growth_score": {"score": 5, "justification": "Analysis failed to parse"},
-                "risk_score": {"score": 5, "justification": "Analysis failed to parse"},
-                "summary": "Failed to parse fundamental analysis",
-                "notes": ["Parsing error occurred"],
-                "strengths_and_weaknesses": {"strengths": [], "weaknesses": []}
-            }
-        
-        # Populate fundamental_analysis state
-        fundamental_analysis = {
-            "summary": analysis_json.get("summary", ""),
-            "growth_score": analysis_json.get("growth_score", {"score": 0, "justification": ""}),
-            "risk_score": analysis_json.get("risk_score", {"score": 0, "justification": ""}),
-            "notes": str(analysis_json.get("notes", "")),
-            "strengths_and_weaknesses": analysis_json.get("strengths_and_weaknesses", {"strengths": [], "weaknesses": []})
-        }
-        
-        return {"fundamental_analysis": fundamental_analysis}
-        
-    except (json.JSONDecodeError, AttributeError) as e:
-        # Fallback if parsing fails
+    fundamental_analysis, _ = routed_structured("fundamental_analyst", messages, FundamentalReport,
+                                                complete="error" not in fundamental_payload)
+    if fundamental_analysis is None:
+        # Output failed validation even after the repair call
         fundamental_analysis = {
-            "summary": f"Fundamental analysis completed for {ticker}",
-            "growth_score": {"score": 5, "justification": "Analysis parsing failed"},
-            "risk_score": {"score": 5, "justification": "Analysis parsing failed"},
-            "notes": f"Error parsing analysis: {str(e)}",
+            "summary": f"Fundamental analysis could not be completed for {ticker}",
+            "growth_score": {"score": 5, "justification": "Analysis failed schema validation"},
+            "risk_score": {"score": 5, "justification": "Analysis failed schema validation"},
+            "notes": "Analysis failed schema validation",
             "strengths_and_weaknesses": {"strengths": [], "weaknesses": []}
         }
-        
-        return {"fundamental_analysis": fundamental_analysis}
+    elif "error" not in fundamental_payload:
+        _store_report(report_stage, ticker, fundamental_analysis, fingerprint, fundamental_payload)
+
+    return {"fundamental_analysis": put_blob(fundamental_analysis), "fundamental_data": data_ref}
 
 # Build graph
 builder = StateGraph(AnalystManagerState, input_schema=MessagesState)
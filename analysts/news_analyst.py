@@ -1,9 +1,12 @@
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
 from langgraph.graph import END, START, MessagesState, StateGraph
 from langgraph.prebuilt import ToolNode, tools_condition
 
 from utils.google_news_search_tool import google_news_search_tool
+from utils.model_router import json_validator, routed_invoke
+from utils.news_index import NEWS_PROMPT_MAX_AGE_DAYS, add_news, article_key, normalize_article, retrieve_context
+from utils.news_retrieval_tool import news_retrieval_tool
+from utils.serialization import dumps, loads
 from utils.tavily_news_search_tool import tavily_news_search_tool
 
 
@@ -20,10 +23,17 @@ def news_analyst(state: MessagesState):
     
     2. **Fallback Tool - Tavily Search**: If the Google search fails or returns insufficient results, 
        use this as a backup to gather news information with reliable API-based search.
+
+    3. **Retrieval Tool - Stored News**: Use this for targeted questions across all stored articles,
+       e.g. "guidance changes" or "supply chain issues", after a search has filled the index.
     
     **Search Strategy**: Always try the Google search tool first. If it encounters errors, timeouts, or returns 
     no useful results, then use the Tavily search tool as a reliable fallback to ensure you always have 
     news data for your analysis.
+
+    Every fetched article is stored in a local index for the ticker. Search results come back as the most
+    relevant text chunks of all stored articles (earnings and guidance, analyst actions, supply chain,
+    deals, legal and regulatory risk) rather than raw snippets.
     
     Your role is to analyze recent news articles and market commentary to assess:
     1. Overall market sentiment (Positive, Neutral, Negative)
@@ -50,7 +60,7 @@ def news_analyst(state: MessagesState):
     """)
     
 
-    response = llm_with_tools.invoke([sys_msg] + state["messages"])
+    response = routed_invoke("news_analyst", [sys_msg] + state["messages"], tools=tools)
 
     return {"messages": [response]}
 
@@ -64,10 +74,42 @@ def news_analyst_manager(state: MessagesState):
     }
     """)
 
-    response = llm_with_tools.invoke([sys_msg] + state["messages"])
+    # A short summary of the analysis - small tier unless the answer is not the expected JSON
+    response = routed_invoke("news_analyst_manager", [sys_msg] + state["messages"], tools=tools,
+                             validate=json_validator("summary"))
 
     return {"messages": [response]}
 
+def index_news(state: MessagesState):
+    """Stores the articles returned by the search tools in the ticker's news index and replaces the raw
+    results with the top-k relevant chunks of the recently stored news, keeping the analyst's prompt
+    bounded - the articles this search returned always keep a chunk"""
+    tool_calls = {call["id"]: call for message in state["messages"] if isinstance(message, AIMessage)
+                  for call in message.tool_calls}
+    replaced = []
+    for message in reversed(state["messages"]):
+        if not isinstance(message, ToolMessage):
+            break
+        if message.name not in SEARCH_TOOLS:
+            continue
+        ticker = tool_calls.get(message.tool_call_id, {}).get("args", {}).get("ticker")
+        try:
+            payload = loads(message.content)
+        except ValueError:
+            continue
+        articles = payload.get("articles") if isinstance(payload, dict) else payload
+        if not ticker or not isinstance(articles, list):
+            continue
+        articles = [article for article in articles if isinstance(article, dict)]
+        added = add_news(ticker, articles)
+        chunks = retrieve_context(ticker, max_age_days=NEWS_PROMPT_MAX_AGE_DAYS,
+                                  include_articles=[article_key(normalize_article(article)) for article in articles])
+        content = dumps({"ticker": ticker.upper(), "new_chunks_indexed": added, "chunks": chunks})
+        replaced.append(ToolMessage(content=content, tool_call_id=message.tool_call_id, name=message.name,
+                                    id=message.id))
+    return {"messages": replaced}
+
+
 def news_analyst_condition(state: MessagesState) -> str:
     route = tools_condition(state)
     if route == "tools":
@@ -75,21 +117,23 @@ def news_analyst_condition(state: MessagesState) -> str:
     return "default"
 
 
-llm = ChatOpenAI(model="gpt-4o")
-tools = [google_news_search_tool, tavily_news_search_tool]
-llm_with_tools = llm.bind_tools(tools)
+tools = [google_news_search_tool, tavily_news_search_tool, news_retrieval_tool]
+# Tools whose results are indexed by index_news
+SEARCH_TOOLS = {google_news_search_tool.name, tavily_news_search_tool.name}
 
 builder = StateGraph(MessagesState)
 builder.add_node("news_analyst", news_analyst)
 builder.add_node("news_analyst_manager", news_analyst_manager)
 builder.add_node("tools", ToolNode(tools))
+builder.add_node("index_news", index_news)
 builder.add_edge(START, "news_analyst")
 builder.add_conditional_edges(
     "news_analyst",
    news_analyst_condition,
    path_map={"tools": "tools","default": "news_analyst_manager"}
 )
-builder.add_edge("tools", "news_analyst")
+builder.add_edge("tools", "index_news")
+builder.add_edge("index_news", "news_analyst")
 builder.add_edge("news_analyst_manager", END)
 # Compile graph
 graph = builder.compile()
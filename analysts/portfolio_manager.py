@@ -0,0 +1,82 @@
+import sys
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from analyst_schemas import PortfolioReport
+from utils.market_regime import get_market_regime_text
+from utils.model_router import routed_structured
+from utils.portfolio_risk import PORTFOLIO_LOOKBACK_DAYS, portfolio_risk, refresh_prices
+from utils.serialization import dumps
+
+# Load environment variables from .env file
+load_dotenv()
+
+portfolio_manager_sys_msg = SystemMessage(content="""You are a senior portfolio risk manager. You review the risk profile of a client's stock portfolio.
+
+    You will receive a risk summary computed from daily returns:
+    - portfolio: annualized volatility and return, daily VaR / CVaR (95%), max and current drawdown, worst day,
+      diversification ratio (weighted average volatility / portfolio volatility)
+    - concentration: largest weight, effective number of holdings, risk share of the top 10 contributors,
+      average pairwise correlation
+    - top_risk_contributors: holdings with the largest share of portfolio volatility (risk_share) - a risk share
+      well above the weight means the holding adds more risk than capital
+    - top_diversifiers and most_correlated_pairs
+    - missing: holdings without enough price history (not modeled)
+    You also receive the market regime context.
+
+    Guidelines:
+    - Explain the risk in plain language a retail investor understands, citing the numbers
+    - Point out where risk is concentrated even if capital is not (risk share vs weight, correlated clusters)
+    - Suggest concrete, proportionate changes; do not recommend individual stock picks beyond the holdings
+    - Mention holdings that could not be modeled""")
+
+
+def portfolio_manager(risk_summary: dict) -> dict:
+    """Synthesizes a portfolio risk summary into a structured risk report
+
+    Args:
+        risk_summary: output of utils.portfolio_risk.portfolio_risk
+
+    Returns:
+        PortfolioReport fields, or an error dictionary when the model output failed validation
+    """
+    analysis_prompt = f"""
+    Review the following portfolio risk summary:
+
+    **PORTFOLIO RISK SUMMARY:**
+    {dumps(risk_summary)}
+
+    **MARKET REGIME CONTEXT:**
+    {get_market_regime_text()}
+    """
+    messages = [portfolio_manager_sys_msg, HumanMessage(content=analysis_prompt)]
+    report, _ = routed_structured("portfolio_manager", messages, PortfolioReport)
+    return report if report is not None else {"error": "Portfolio report failed schema validation"}
+
+
+def analyze_portfolio(holdings: dict, lookback: int = PORTFOLIO_LOOKBACK_DAYS, refresh: bool = True) -> dict:
+    """Portfolio analysis entry point: one risk model over all holdings plus a single synthesis call
+
+    Args:
+        holdings: {symbol: weight or position value}, e.g. {"AAPL": 0.3, "MSFT": 0.2, ...}
+        lookback: trading days of history for the risk model
+        refresh: bring stale price history up to date first
+
+    Returns:
+        {"risk": risk summary, "analysis": portfolio report}
+    """
+    if refresh:
+        refresh_prices(list(holdings), lookback_days=int(lookback * 1.6))
+    risk = portfolio_risk(holdings, lookback)
+    if "error" in risk:
+        return {"risk": risk, "analysis": None}
+    return {"risk": risk, "analysis": portfolio_manager(risk)}
+
+
+if __name__ == "__main__":
+    # python -m analysts.portfolio_manager AAPL=0.3 MSFT=0.2 NVDA=0.5
+    holdings = {}
+    for arg in sys.argv[1:]:
+        symbol, _, weight = arg.partition("=")
+        holdings[symbol] = float(weight or 1)
+    print(dumps(analyze_portfolio(holdings), pretty=True))
@@ -0,0 +1,97 @@
+import sys
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.graph import END
+from langgraph.types import Send
+
+from analyst_schemas import SectorReport
+from analyst_states import AnalystManagerState
+from analysts.analyst_manager import _emitter, _stream_writer
+from analysts.comparison_manager import _branch_reports
+from utils.blob_store import get_blob, put_blob
+from utils.market_regime import get_market_regime_text
+from utils.model_router import routed_structured
+from utils.sector_aggregates import SECTOR_MAX_TICKERS, build_sector_context
+from utils.serialization import dumps
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Sector mode ("analyze the semiconductor sector"): sector_context resolves the constituents and computes
+# the shared sector aggregates once, the main graph fans out one analyze_ticker branch per constituent
+# with that context injected into its analysts, and sector_manager writes a single sector report.
+
+sector_manager_sys_msg = SystemMessage(content="""You are a senior sector analyst and portfolio manager. You write the sector report
+    portfolio managers read: the state of one sector or industry and the ranking of its largest constituents.
+
+    You will receive:
+    - the sector context: group fundamental medians, equal-weight sector returns (1m / 3m / 6m), breadth (share of
+      constituents above their 50-day average), return dispersion, average pairwise correlation, the sector ETF trend
+      and each constituent's metrics and performance relative to the sector
+    - for every constituent a short company profile, a fundamental analysis report and a technical analysis report,
+      both written with the sector context in mind
+    - the market regime context
+
+    Guidelines:
+    - Start from the sector: is it in an uptrend or downtrend, broad or narrow (breadth, dispersion), cheap or
+      expensive versus its own medians, and what drives it
+    - Rank every constituent exactly once, rank 1 being the most attractive, each with its own final recommendation
+    - Name what separates the leaders from the laggards - relative strength, growth, margins, valuation
+    - Say so when a report is missing or failed and lower the confidence for that stock
+    - Use simple, clear language and cite the numbers""")
+
+
+def sector_context(state: AnalystManagerState) -> AnalystManagerState:
+    """Resolves the requested sector and computes the context shared by all constituent branches
+
+    Returns:
+        AnalystManagerState with tickers set to the constituents and sector_context to a blob reference
+        of the aggregates (on failure no constituents and the error as manager_analysis)
+    """
+    context = build_sector_context(state["sector"], SECTOR_MAX_TICKERS)
+    if "error" in context:
+        return {"sector_context": put_blob(context), "tickers": [], "manager_analysis": dumps(context, pretty=True)}
+    print(f"🏭 {context['group']}: analyzing {', '.join(context['constituents'])}")
+    return {"sector_context": put_blob(context), "tickers": context["constituents"]}
+
+
+def sector_condition(state: AnalystManagerState):
+    """One parallel branch per constituent, each carrying the shared sector context"""
+    if not state.get("tickers"):
+        return END
+    return [Send("analyze_sector_ticker", {"ticker": ticker, "sector_context": state["sector_context"]})
+            for ticker in state["tickers"]]
+
+
+def sector_manager(state: AnalystManagerState):
+    """Writes the sector report from the shared context and the constituents' reports in one synthesis call"""
+    context = get_blob(state["sector_context"])
+    analysis_prompt = f"""
+    Write the sector report for the {context["kind"]} {context["group"]}.
+
+    **SECTOR CONTEXT:**
+    {dumps(context)}
+
+    **ANALYST REPORTS PER CONSTITUENT:**
+    {dumps(_branch_reports(state))}
+
+    **MARKET REGIME CONTEXT:**
+    {get_market_regime_text()}
+    """
+
+    messages = [sector_manager_sys_msg, HumanMessage(content=analysis_prompt)]
+    report, response = routed_structured("sector_manager", messages, SectorReport, on_chunk=_emitter(_stream_writer()))
+    if report is None:
+        # Output failed validation even after the repair call - pass on whatever the model produced
+        return {"manager_analysis": response.content if response is not None else ""}
+
+    report["ranking"].sort(key=lambda ranked: ranked["rank"])
+    return {"manager_analysis": dumps(report, pretty=True)}
+
+
+if __name__ == "__main__":
+    # python -m analysts.sector_manager Semiconductors
+    from setup import analyze_sector
+
+    result = analyze_sector(" ".join(sys.argv[1:]) or "Semiconductors")
+    print(result.get("manager_analysis"))
@@ -1,9 +1,14 @@
-import json
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 
 from langgraph.graph import START, StateGraph, MessagesState
 from analyst_states import AnalystManagerState
+from analyst_schemas import TechnicalReport
+from utils.blob_store import put_blob
+from utils.model_router import routed_structured
+from utils.report_store import get_report, put_report
+from utils.market_regime import get_market_regime_text
+from utils.sector_aggregates import sector_context_text
+from utils.serialization import loads
 from utils.technical_analysis_tool import get_technical_analysis
 
 
@@ -15,6 +20,8 @@ You have access to a technical analysis tool that provides:
 - Key technical indicators: SMA 20/50, RSI 14, MACD, Bollinger Bands
 - Price performance metrics: 3-month change, volatility, average volume
 - Latest market data: current price, recent OHLC data
+- Multi-timeframe context: the same indicators on weekly and monthly bars (up to 5 years), the trend on
+  each timeframe and whether the daily, weekly and monthly trends are aligned
 
 Your role is to analyze the technical indicators and market data to provide trading recommendations.
 
@@ -26,7 +33,9 @@ Your analysis process:
    - MACD: Momentum and trend changes
    - Bollinger Bands: Volatility and potential breakouts
    - Volume: Confirmation of price moves
-3. Consider overall market momentum and volatility
+   - Timeframes: a daily signal that agrees with the weekly and monthly trend is stronger than one against it
+3. Consider overall market momentum and volatility using the market regime context (index and sector ETF
+   trends, breadth and realized volatility) - a setup that fights a risk-off tape deserves lower confidence
 
 Your output must be a **structured JSON object** with:
 - "recommendation": "BUY" | "HOLD" | "SELL" | "NONE"
@@ -45,72 +54,64 @@ Recommendation guidelines:
 Keep your analysis objective and based strictly on technical indicators. Do not speculate beyond the provided data.""")
 
 
-# Define LLM - no tools binding needed since we call get_technical_analysis directly
-model = ChatOpenAI(model="gpt-4o")
+
+def technical_report_key(latest_data: dict) -> str:
+    """Validity key of a technical report: the latest bar it was built on (date and close), so a new bar
+    or an intraday move of the last one produces a new report"""
+    return f"{latest_data['date']}|{latest_data['close']}"
 
 
 def technical_analyst(state: AnalystManagerState) -> AnalystManagerState:
     # Get technical data directly
     ticker = state["ticker"]
-    technical_data = get_technical_analysis(ticker)
+    # Sector mode injects the shared sector context; those reports are stored apart from the plain ones
+    sector_context = sector_context_text(state.get("sector_context"), ticker)
+    report_stage = "sector_technical_analyst" if sector_context else "technical_analyst"
+    technical_data = get_technical_analysis.invoke({"ticker": ticker})
+    failed = '"error"' in technical_data
+    # Handed on to later stages (debate) instead of calling the tool again
+    data_ref = put_blob(technical_data)
+
+    # Reuse the report built on the same latest bar (e.g. pre-computed by the pre-market warmer)
+    report_key = None
+    if not failed:
+        report_key = technical_report_key(loads(technical_data)["latest_data"]) \
+                     + (f"|{state['sector_context']}" if sector_context else "")
+        cached_report = get_report(report_stage, ticker, report_key)
+        if cached_report is not None:
+            return {"technical_analysis": put_blob(cached_report), "technical_data": data_ref}
     
     # Create analysis request
     analysis_prompt = f"""
     Analyze the following technical data for {ticker} and provide your trading recommendation:
     
     {technical_data}
+
+    Market regime context (shared daily snapshot):
+    {get_market_regime_text()}
+    {sector_context}
     
     Please provide your analysis in the exact JSON format specified in the system message.
     """
     
     # Get analysis from LLM
     messages = [sys_msg, HumanMessage(content=analysis_prompt)]
-    response = model.invoke(messages)
-    
-    # Parse the response to extract the structured data
-    try:
-        # Extract JSON from the response content
-        response_content = response.content
-        # Try to find JSON in the response
-        import re
-        json_match = re.search(r'\{.*\}', response_content, re.DOTALL)
-        if json_match:
-            analysis_json = json.loads(json_match.group())
-        else:
-            # Fallback if JSON parsing fails
-            analysis_json = {
-                "recommendation": "NONE",
-                "confidence": "LOW",
-                "summary": "Failed to parse technical analysis",
-                "key_indicators": ["Parsing error occurred"],
-                "price_target": None,
-                "risk_level": "HIGH"
-            }
-        
-        # Populate technical_analysis state
-        technical_analysis = {
-            "recommendation": analysis_json.get("recommendation", "NONE"),
-            "confidence": analysis_json.get("confidence", "LOW"),
-            "summary": analysis_json.get("summary", ""),
-            "key_indicators": analysis_json.get("key_indicators", []),
-            "price_target": analysis_json.get("price_target", ""),
-            "risk_level": analysis_json.get("risk_level", "MEDIUM")
-        }
-        
-        return {"technical_analysis": technical_analysis}
-        
-    except (json.JSONDecodeError, AttributeError) as e:
-        # Fallback if parsing fails
+    technical_analysis, _ = routed_structured("technical_analyst", messages, TechnicalReport,
+                                              complete=not failed)
+    if technical_analysis is None:
+        # Output failed validation even after the repair call
         technical_analysis = {
             "recommendation": "NONE",
-            "confidence": "LOW", 
-            "summary": f"Technical analysis completed for {ticker}",
-            "key_indicators": [f"Error parsing analysis: {str(e)}"],
-            "price_target": "",
+            "confidence": "LOW",
+            "summary": f"Technical analysis could not be completed for {ticker}",
+            "key_indicators": ["Analysis failed schema validation"],
+            "price_target": None,
             "risk_level": "HIGH"
         }
-        
-        return {"technical_analysis": technical_analysis}
+    elif not failed:
+        put_report(report_stage, ticker, technical_analysis, report_key)
+
+    return {"technical_analysis": put_blob(technical_analysis), "technical_data": data_ref}
 
 # Build graph
 builder = StateGraph(AnalystManagerState)
@@ -0,0 +1,81 @@
+"""Micro-benchmark: agent_2 data pipeline before and after removing the parse/serialize round trips
+
+Run from the repository root (needs git - the baseline is the agent_2.py of BENCH_BASELINE_REV):
+    python -m benchmarks.bench_agent_2_pipeline
+
+Both variants run their real fetcher and combiner nodes on the same FMP payloads (see
+benchmarks/fmp_fixtures.py), so only the in-process work is measured.
+"""
+import io
+import os
+import time
+import types
+import contextlib
+import subprocess
+import tracemalloc
+
+import agent_2
+from benchmarks.fmp_fixtures import load_fixture
+from utils.blob_store import get_blob_text
+
+TICKER = "AAPL"
+ROUNDS = 200
+
+_payloads = {}
+
+
+def cached_fixture(endpoint: str, symbol: str = "", **params):
+    # Build each payload once so only the pipeline's own work is timed
+    key = (endpoint, symbol, tuple(sorted(params.items())))
+    if key not in _payloads:
+        _payloads[key] = load_fixture(endpoint, symbol, **params)
+    return _payloads[key]
+
+
+# agent_2.py before the pipeline passed parsed data between its nodes
+BASELINE_REV = os.getenv("BENCH_BASELINE_REV", "30ca6cf^")
+
+
+def load_baseline():
+    """Imports agent_2.py as of BASELINE_REV under another module name"""
+    source = subprocess.run(["git", "show", f"{BASELINE_REV}:agent_2.py"], capture_output=True, text=True,
+                            check=True).stdout
+    module = types.ModuleType("agent_2_baseline")
+    exec(compile(source, f"agent_2.py@{BASELINE_REV}", "exec"), module.__dict__)
+    return module
+
+
+def pipeline(module):
+    def run() -> str:
+        state = {"messages": [module.HumanMessage(content=f"analyze {TICKER}")]}
+        state.update(module.data_fetcher_node(state))
+        state.update(module.data_combiner_node(state))
+        return f"Please analyze the following comprehensive financial data for {TICKER}:\n{get_blob_text(state['combined_data'])}"
+    return run
+
+
+def measure(run):
+    with contextlib.redirect_stdout(io.StringIO()):  # silence the node progress prints
+        run()  # warm up
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            prompt = run()
+        elapsed_ms = (time.perf_counter() - start) / ROUNDS * 1000
+
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return elapsed_ms, peak, len(prompt)
+
+
+if __name__ == "__main__":
+    baseline = load_baseline()
+    for module in (baseline, agent_2):
+        module.fmp_get = cached_fixture
+    results = {"baseline": measure(pipeline(baseline)), "current": measure(pipeline(agent_2))}
+    for label, (elapsed_ms, peak, prompt_chars) in results.items():
+        print(f"{label:<8} {elapsed_ms:8.3f} ms/run   peak {peak / 1024:8.1f} KiB   prompt {prompt_chars:7d} chars")
+
+    before, current = results["baseline"], results["current"]
+    print(f"speedup {before[0] / current[0]:.2f}x, peak memory {current[1] / before[1]:.0%} of baseline")
@@ -0,0 +1,63 @@
+"""Benchmark: utils.serialization vs. the stdlib json calls the tools used to make
+
+Run from the repository root:
+    python -m benchmarks.bench_serialization
+
+Uses the FMP fixtures from benchmarks/fmp_fixtures.py (recorded payloads when present), shaped
+like a fundamental fetch (annual + quarterly statements) and a year of daily price history.
+"""
+import json
+import time
+
+import numpy as np
+
+from benchmarks.fmp_fixtures import STATEMENT_ENDPOINTS, load_fixture
+from utils import serialization
+from utils.serialization import dumps, loads
+
+TICKER = "AAPL"
+ROUNDS = 200
+
+
+def fundamental_payload() -> dict:
+    payload = {"company_profile": load_fixture("profile", TICKER)}
+    for endpoint in STATEMENT_ENDPOINTS:
+        payload[endpoint] = load_fixture(endpoint, TICKER, limit=2)
+        payload[f"quarterly_{endpoint}"] = load_fixture(endpoint, TICKER, period="quarter", limit=2)
+    return payload
+
+
+def technical_payload() -> dict:
+    history = load_fixture("historical-price-full", TICKER, days=260)["historical"]
+    closes = np.array([bar["close"] for bar in history])
+    # NumPy scalars, like the indicators get_technical_analysis used to pass through default=str
+    return {"historical": history, "indicators": {"sma_20": closes[-20:].mean(), "volatility": closes.std(),
+                                                  "avg_volume": np.int64(sum(bar["volume"] for bar in history))}}
+
+
+def timed(fn) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn()
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def compare(label: str, payload):
+    legacy_text = json.dumps(payload, indent=2, default=str)
+    fast_text = dumps(payload)
+
+    legacy_dump = timed(lambda: json.dumps(payload, indent=2, default=str))
+    fast_dump = timed(lambda: dumps(payload))
+    legacy_load = timed(lambda: json.loads(legacy_text))
+    fast_load = timed(lambda: loads(fast_text))
+
+    print(f"{label}")
+    print(f"  dumps  stdlib indent=2 {legacy_dump:7.3f} ms   {serialization.JSON_BACKEND} compact {fast_dump:7.3f} ms   ({legacy_dump / fast_dump:.1f}x)")
+    print(f"  loads  stdlib          {legacy_load:7.3f} ms   {serialization.JSON_BACKEND:<7}         {fast_load:7.3f} ms   ({legacy_load / fast_load:.1f}x)")
+    print(f"  size   {len(legacy_text):>9} chars -> {len(fast_text):>9} chars ({len(fast_text) / len(legacy_text):.0%})")
+
+
+if __name__ == "__main__":
+    compare("fundamental payload (annual + quarterly)", fundamental_payload())
+    compare("technical payload (1y daily bars + numpy indicators)", technical_payload())
@@ -0,0 +1,90 @@
+import os
+import json
+import random
+from datetime import date, timedelta
+
+# FMP payload fixtures for benchmarks. Record real responses once with
+#   python -m benchmarks.fmp_fixtures AAPL MSFT
+# (needs FMP_API_KEY); without recorded fixtures, FMP-shaped payloads are synthesized.
+FIXTURES_DIR = os.getenv("BENCH_FIXTURES_DIR", os.path.join(os.path.dirname(__file__), "fixtures"))
+
+STATEMENT_ENDPOINTS = {
+    "income-statement": 38,
+    "balance-sheet-statement": 54,
+    "cash-flow-statement": 40,
+    "ratios": 56,
+    "key-metrics": 60,
+    "enterprise-values": 8,
+    "financial-growth": 36,
+    "earnings": 10,
+}
+
+
+def _fixture_path(endpoint: str, symbol: str, params: dict) -> str:
+    suffix = "_".join(f"{k}-{v}" for k, v in sorted(params.items()) if k != "apikey")
+    name = f"{symbol}_{endpoint}{'_' + suffix if suffix else ''}.json"
+    return os.path.join(FIXTURES_DIR, name)
+
+
+def _synthesize(endpoint: str, symbol: str, params: dict):
+    rng = random.Random(f"{symbol}-{endpoint}-{sorted(params.items())}")
+    if endpoint == "profile":
+        return [{
+            "symbol": symbol, "companyName": f"{symbol} Inc.", "price": round(rng.uniform(20, 500), 2),
+            "mktCap": rng.randint(10**9, 3 * 10**12), "sector": "Technology", "industry": "Consumer Electronics",
+            "description": "Designs, manufactures and markets products and services. " * 12,
+            "ceo": "Jane Doe", "country": "US", "exchangeShortName": "NASDAQ", "ipoDate": "1980-12-12",
+        }]
+    if endpoint == "historical-price-full":
+        price = rng.uniform(50, 300)
+        bars = []
+        start = date(2020, 1, 1)
+        for day in range(int(params.get("days", 260))):
+            price *= 1 + rng.gauss(0, 0.015)
+            bars.append({"date": (start + timedelta(days=day)).isoformat(), "open": price,
+                         "high": price * 1.01, "low": price * 0.99, "close": price,
+                         "volume": rng.randint(10**6, 10**8)})
+        return {"symbol": symbol, "historical": bars}
+
+    fields = STATEMENT_ENDPOINTS.get(endpoint, 20)
+    periods = []
+    for period in range(int(params.get("limit", 2))):
+        record = {"date": f"{2024 - period}-09-28", "symbol": symbol, "reportedCurrency": "USD",
+                  "fillingDate": f"{2024 - period}-11-01", "period": params.get("period", "FY").upper()}
+        for field in range(fields):
+            record[f"{endpoint.replace('-', '_')}_field_{field}"] = rng.uniform(-1e11, 1e11)
+        periods.append(record)
+    return periods
+
+
+def load_fixture(endpoint: str, symbol: str = "", **params):
+    """Drop-in replacement for utils.fmp_client.fmp_get that serves recorded or synthetic payloads"""
+    path = _fixture_path(endpoint, symbol, params)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return json.loads(f.read())
+    return _synthesize(endpoint, symbol, params)
+
+
+def record_fixtures(symbol: str):
+    """Downloads the payloads the tools request for a symbol and stores them as fixtures"""
+    from utils.fmp_client import fmp_get
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    requests_to_record = [("profile", {})]
+    for endpoint in STATEMENT_ENDPOINTS:
+        requests_to_record.append((endpoint, {"limit": 2}))
+        requests_to_record.append((endpoint, {"period": "quarter", "limit": 2}))
+
+    for endpoint, params in requests_to_record:
+        data = fmp_get(endpoint, symbol, **params)
+        with open(_fixture_path(endpoint, symbol, params), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        print(f"✅ Recorded {endpoint} {params} for {symbol}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    for ticker in sys.argv[1:] or ["AAPL"]:
+        record_fixtures(ticker.upper())
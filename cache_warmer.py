@@ -0,0 +1,256 @@
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from dotenv import load_dotenv
+
+from analysts.fundamental_agent import cached_fundamental_report, fundamental_analyst
+from analysts.technical_analyst import technical_analyst, technical_report_key
+from utils.blob_store import resolve_blob
+from utils.company_profile_tool import get_company_profile
+from utils.fmp_bulk import bulk_refresh
+from utils.fmp_client import CACHE_DIR, CACHE_TTL
+from utils.llm_scheduler import BATCH, llm_priority
+from utils.fundamental_analysis_tool import (ANNUAL_PERIODS, QUARTERLY_GROWTH_LAG, QUARTERLY_PERIODS, fetch_fundamental_data,
+                                              probe_latest_filing, statement_limits)
+from utils.market_regime import get_market_regime_text
+from utils.price_store import last_completed_session, load_prices, update_prices
+from utils.profile_store import get_profile
+from utils.report_store import get_report
+from utils.serialization import loads
+from utils.statement_store import load_statements
+from utils.technical_analysis_tool import PRICE_HISTORY_DAYS, get_technical_analysis, history_request_days
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Pre-market cache warming: users cluster around the open, so the watchlists are fetched (and
+# optionally analyzed) in the window before it. Interactive requests then hit the FMP response
+# cache, the price store and the report store instead of bursting upstream.
+WATCHLISTS_PATH = os.getenv("WATCHLISTS_PATH", "watchlists.json")
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+MARKET_OPEN = os.getenv("MARKET_OPEN", "09:30")
+WARM_WINDOW_MINUTES = int(os.getenv("WARM_WINDOW_MINUTES", "60"))
+WARM_RUN_LLM = os.getenv("WARM_RUN_LLM", "false").lower() in ("1", "true", "yes")
+WARM_WORKERS = int(os.getenv("WARM_WORKERS", "4"))
+# FMP plan limit and the share of it the warmer may use (the rest is left for interactive traffic)
+FMP_RATE_LIMIT_PER_MIN = int(os.getenv("FMP_RATE_LIMIT_PER_MIN", "300"))
+WARM_RATE_SHARE = float(os.getenv("WARM_RATE_SHARE", "0.5"))
+# FMP requests made per ticker: profile, filing probe, 6 statements, earnings, 90 days + longer price history
+CALLS_PER_TICKER = 11
+
+
+def load_watchlists(path: str = WATCHLISTS_PATH) -> dict:
+    """Reads the configured watchlists
+
+    Watchlists come from a JSON file ({"name": ["AAPL", "MSFT", ...]}) and/or the WARM_TICKERS
+    environment variable (comma-separated, added as the "env" watchlist).
+
+    Returns:
+        Dict of watchlist name -> list of tickers
+    """
+    watchlists = {}
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            watchlists = loads(f.read())
+    env_tickers = [t.strip().upper() for t in os.getenv("WARM_TICKERS", "").split(",") if t.strip()]
+    if env_tickers:
+        watchlists["env"] = env_tickers
+    return watchlists
+
+
+def warm_set(watchlists: dict) -> list:
+    """All unique tickers across the watchlists, in first-seen order"""
+    return list(dict.fromkeys(t.upper() for tickers in watchlists.values() for t in tickers))
+
+
+def warm_ticker(ticker: str, run_llm: bool = WARM_RUN_LLM) -> dict:
+    """Fetches everything an analysis of one ticker needs, optionally running the analyst stages too
+
+    Returns:
+        Dict with "ticker" and either "ok": True or the "error" that stopped the warm-up
+    """
+    try:
+        state = {"ticker": ticker}
+        state.update(get_company_profile(state))
+        update_prices(ticker)
+
+        if run_llm:
+            # The analyst nodes fetch their data (through the caches) and store their reports.
+            # Batch priority: interactive requests arriving meanwhile go first.
+            with llm_priority(BATCH):
+                fundamental_analyst(state)
+                technical_analyst(state)
+        else:
+            probe_latest_filing(ticker)
+            profile = resolve_blob(state["company_profile"])
+            fetch_fundamental_data(ticker, profile.get("company_profile") if isinstance(profile, dict) else None)
+            get_technical_analysis.invoke({"ticker": ticker})
+        return {"ticker": ticker, "ok": True}
+    except Exception as e:
+        return {"ticker": ticker, "ok": False, "error": str(e)}
+
+
+def warm(tickers: list, run_llm: bool = WARM_RUN_LLM, deadline: datetime = None) -> dict:
+    """Warms the caches for all tickers, paced to stay within the FMP rate limit share
+
+    Args:
+        tickers: the warm set
+        run_llm: also pre-run the fundamental and technical analyst stages
+        deadline: when the work should be done (used only to warn when the pacing can't make it)
+
+    Returns:
+        The readiness report after the run
+    """
+    interval = CALLS_PER_TICKER * 60 / (FMP_RATE_LIMIT_PER_MIN * WARM_RATE_SHARE)
+    if deadline:
+        needed = timedelta(seconds=interval * len(tickers))
+        if datetime.now(MARKET_TIMEZONE) + needed > deadline:
+            print(f"⚠️ Warming {len(tickers)} tickers takes ~{needed} at the allowed rate - not all will be ready")
+
+    if CACHE_TTL <= 0 or not CACHE_DIR:
+        print("⚠️ The FMP response cache is off or private to this process (set FMP_CACHE_TTL and FMP_CACHE_DIR) - "
+              "only the price, statement and report stores are warmed for the server")
+    print(f"🔥 Warming {len(tickers)} tickers (one every {interval:.1f}s, LLM stages: {run_llm})")
+    get_market_regime_text()
+    # Profiles and daily bars of the whole warm set in a few bulk requests - the per-ticker warm-up
+    # below then finds them in the caches
+    try:
+        bulk = bulk_refresh(tickers)
+        print(f"📦 Bulk refresh: {bulk['profiles']} profiles, {bulk['updated']} price histories from "
+              f"{len(bulk['sessions'])} end-of-day sessions, {len(bulk['fallback'])} one by one")
+    except Exception as e:
+        print(f"⚠️ Bulk refresh failed, warming ticker by ticker: {e}")
+
+    failures = []
+    with ThreadPoolExecutor(max_workers=WARM_WORKERS, thread_name_prefix="warm") as executor:
+        futures = []
+        for ticker in tickers:
+            futures.append(executor.submit(warm_ticker, ticker, run_llm))
+            time.sleep(interval)
+        for future in futures:
+            result = future.result()
+            if not result["ok"]:
+                failures.append(result)
+                print(f"⚠️ Could not warm {result['ticker']}: {result['error']}")
+
+    report = readiness_report(tickers, run_llm)
+    report["failures"] = failures
+    return report
+
+
+def readiness_report(tickers: list, include_reports: bool = WARM_RUN_LLM) -> dict:
+    """How much of the warm set would be served from the local stores right now
+
+    Only the profile, statement, price and report stores are read - the check makes no FMP requests
+    and holds whether or not the FMP response cache is on.
+
+    Returns:
+        Dict with overall "ready" / "ready_pct", per-component counts and the missing components per ticker
+    """
+    fundamental_reports = {t: _fundamental_report_cached(t) for t in tickers} if include_reports else {}
+    checks = {
+        "profile": lambda t: get_profile(t) is not None,
+        # A reusable report makes the statements unnecessary
+        "fundamentals": lambda t: _statements_stored(t) or fundamental_reports.get(t, False),
+        "prices": lambda t: history_request_days(t) == PRICE_HISTORY_DAYS,
+        "price_history": lambda t: _price_history_current(t),
+    }
+    if include_reports:
+        checks["fundamental_report"] = lambda t: fundamental_reports[t]
+        checks["technical_report"] = lambda t: _technical_report_cached(t)
+
+    components = {name: 0 for name in checks}
+    missing = {}
+    for ticker in tickers:
+        absent = []
+        for name, check in checks.items():
+            if check(ticker):
+                components[name] += 1
+            else:
+                absent.append(name)
+        if absent:
+            missing[ticker] = absent
+
+    ready = len(tickers) - len(missing)
+    return {
+        "as_of": datetime.now(MARKET_TIMEZONE).isoformat(timespec="seconds"),
+        "tickers": len(tickers),
+        "ready": ready,
+        "ready_pct": round(ready / len(tickers) * 100, 1) if tickers else 100.0,
+        "components": components,
+        "missing": missing,
+    }
+
+
+def _statements_stored(ticker: str) -> bool:
+    # The store holds the long history, so the next fundamental fetch is the usual few periods
+    return statement_limits(ticker) == (ANNUAL_PERIODS + 1, QUARTERLY_PERIODS + QUARTERLY_GROWTH_LAG)
+
+
+def _fundamental_report_cached(ticker: str) -> bool:
+    # The latest stored quarterly filing stands in for the probe - the warm-up just stored it
+    stored = load_statements(ticker, "quarter")
+    if stored is None or not len(stored["date"]):
+        return False
+    latest_filing = str(stored["filing_date"][-1]) or str(stored["date"][-1])
+    return cached_fundamental_report(ticker, latest_filing) is not None
+
+
+def _technical_report_cached(ticker: str) -> bool:
+    # The warm-up stored the latest bars, so the report is keyed on the last stored one
+    stored = load_prices(ticker)
+    if stored is None or not len(stored["date"]):
+        return False
+    latest = {"date": str(stored["date"][-1]), "close": round(float(stored["close"][-1]), 2)}
+    return get_report("technical_analyst", ticker, technical_report_key(latest)) is not None
+
+
+def _price_history_current(ticker: str) -> bool:
+    stored = load_prices(ticker)
+    return stored is not None and len(stored["date"]) > 0 and stored["date"][-1].astype(object) >= last_completed_session()
+
+
+def next_window_start(now: datetime = None) -> datetime:
+    """Start of the next warming window: WARM_WINDOW_MINUTES before the open, on a weekday"""
+    now = now or datetime.now(MARKET_TIMEZONE)
+    hour, minute = (int(part) for part in MARKET_OPEN.split(":"))
+    day = now.date()
+    while True:
+        open_time = datetime(day.year, day.month, day.day, hour, minute, tzinfo=MARKET_TIMEZONE)
+        start = open_time - timedelta(minutes=WARM_WINDOW_MINUTES)
+        if day.weekday() < 5 and now < start:
+            return start
+        day += timedelta(days=1)
+
+
+def run_scheduler(run_llm: bool = WARM_RUN_LLM, stop_event: threading.Event = None):
+    """Runs the warmer before every market open until stop_event is set
+
+    The watchlists are re-read before each run, so edits take effect the next morning.
+    """
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        start = next_window_start()
+        print(f"⏰ Next warm-up at {start.isoformat(timespec='minutes')}")
+        if stop_event.wait((start - datetime.now(MARKET_TIMEZONE)).total_seconds()):
+            break
+        tickers = warm_set(load_watchlists())
+        report = warm(tickers, run_llm, deadline=start + timedelta(minutes=WARM_WINDOW_MINUTES))
+        print(f"✅ Warm set ready: {report['ready']}/{report['tickers']} ({report['ready_pct']}%)")
+
+
+if __name__ == "__main__":
+    # python cache_warmer.py [--now] [--llm]
+    run_llm = WARM_RUN_LLM or "--llm" in sys.argv
+    if "--now" in sys.argv:
+        report = warm(warm_set(load_watchlists()), run_llm)
+        print(f"✅ Warm set ready: {report['ready']}/{report['tickers']} ({report['ready_pct']}%)")
+        for ticker, components in report["missing"].items():
+            print(f"   {ticker}: missing {', '.join(components)}")
+    else:
+        run_scheduler(run_llm)
@@ -1,23 +1,31 @@
+import os
 import re
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 
 from langgraph.graph import END, START, StateGraph, MessagesState
+from langgraph.types import Send
 from analysts.analyst_manager import analyst_manager
+from analysts.comparison_manager import analyze_ticker, comparison_manager
+from analysts.debate_analysts import BULL_BEAR_REPORTS, bear_analyst, bull_analyst, debate_context
+from analysts.sector_manager import sector_condition, sector_context, sector_manager
 from analysts.fundamental_agent import fundamental_analyst
 from analysts.technical_analyst import technical_analyst
 from analyst_states import AnalystManagerState
+from utils.blob_store import resolve_blob
 from utils.company_profile_tool import get_company_profile
+from utils.model_router import routed_invoke
+from utils.similarity_index import find_similar
 
 # Load environment variables from .env file
 load_dotenv()
 
-llm = ChatOpenAI(model="gpt-4o")
-small_llm = ChatOpenAI(model="gpt-4o-mini")
+# Comparison requests analyze at most this many tickers (in parallel)
+COMPARE_MAX_TICKERS = int(os.getenv("COMPARE_MAX_TICKERS", "5"))
+
 
 def ticker_extractor(state: MessagesState) -> AnalystManagerState:
-    """Extract ticker from the input message string"""
+    """Extract the ticker(s) from the input message string"""
     
     # System message for ticker extraction
     ticker_extraction_msg = SystemMessage(content="""You are a ticker extraction specialist. 
@@ -27,6 +35,9 @@ def ticker_extractor(state: MessagesState) -> AnalystManagerState:
     - Look for 2-5 letter uppercase stock symbols (e.g., AAPL, TSLA, GOOGL, MSFT)
     - The ticker might be in phrases like "analyze AAPL", "TSLA stock", "look at GOOGL"
     - Only return the ticker symbol itself, nothing else
+    - If the user asks about several stocks (e.g. a comparison), return all symbols separated by ", "
+    - If the user asks about a whole sector or industry rather than named stocks, return "SECTOR: " followed by
+      the sector or industry name
     - If you can't find a clear ticker, return "UNKNOWN"
     
     Examples:
@@ -34,21 +45,40 @@ def ticker_extractor(state: MessagesState) -> AnalystManagerState:
     - "I want to know about Tesla stock TSLA" → TSLA  
     - "Can you analyze GOOGL for me?" → GOOGL
     - "What about MSFT?" → MSFT
+    - "compare AAPL, MSFT and GOOGL" → AAPL, MSFT, GOOGL
+    - "how is the semiconductor sector doing?" → SECTOR: Semiconductors
     """)
 
-    response = llm.invoke([ticker_extraction_msg] + state["messages"])
-    ticker = response.content
+    # Small tier, escalated to the large one when the answer is not a ticker list
+    response = routed_invoke("ticker_extractor", [ticker_extraction_msg] + state["messages"],
+                             validate=lambda r: bool(re.match(r"^([A-Z]{2,5}(, ?[A-Z]{2,5})*|UNKNOWN|SECTOR: .+)$",
+                                                              r.content.strip())))
+    if response.content.strip().startswith("SECTOR:"):
+        return {"messages": [response], "ticker": "", "tickers": [],
+                "sector": response.content.strip()[len("SECTOR:"):].strip()}
 
-    if not re.match(r"^[A-Z]{2,5}$", ticker):
-        ticker = ""
+    tickers = []
+    for symbol in re.split(r"[,\s]+", response.content.strip()):
+        if re.match(r"^[A-Z]{2,5}$", symbol) and symbol != "UNKNOWN" and symbol not in tickers:
+            tickers.append(symbol)
+    tickers = tickers[:COMPARE_MAX_TICKERS]
     
     return {
             "messages": [response],
-            "ticker": ticker
+            "ticker": tickers[0] if len(tickers) == 1 else "",
+            "tickers": tickers,
+            # Clear an earlier sector request of the same thread, ticker_condition checks it first
+            "sector": "",
+            "sector_context": ""
            }
 
 # TODO: in case of no ticker but the rest of the analysts data is available route it to a simple node that explains the data
-def ticker_condition(state: AnalystManagerState) -> str:
+def ticker_condition(state: AnalystManagerState):
+        if state.get("sector"):
+            return "sector"
+        if len(state.get("tickers", [])) > 1:
+            # Comparison: one parallel branch per ticker, collected by comparison_manager
+            return [Send("analyze_ticker", {"ticker": ticker}) for ticker in state["tickers"]]
         return "has_ticker" if state["ticker"] else "no_ticker"
 
 
@@ -60,11 +90,18 @@ builder.add_node("get_company_profile", get_company_profile)
 builder.add_node("fundamental_analyst", fundamental_analyst)
 builder.add_node("technical_analyst", technical_analyst)
 builder.add_node("analyst_manager", analyst_manager)
+builder.add_node("analyze_ticker", analyze_ticker)
+builder.add_node("comparison_manager", comparison_manager)
+builder.add_node("sector_context", sector_context)
+builder.add_node("analyze_sector_ticker", analyze_ticker)
+builder.add_node("sector_manager", sector_manager)
 
 # Start with state initialization to extract ticker
 builder.add_edge(START, "ticker_extractor")
 
-builder.add_conditional_edges("ticker_extractor", ticker_condition, path_map={"has_ticker": "get_company_profile", "no_ticker": END})
+builder.add_conditional_edges("ticker_extractor", ticker_condition,
+                              path_map={"has_ticker": "get_company_profile", "no_ticker": END,
+                                        "analyze_ticker": "analyze_ticker", "sector": "sector_context"})
 # Then run fundamental analyst and technical analyst parallelly
 builder.add_edge("get_company_profile", "fundamental_analyst")
 builder.add_edge("get_company_profile", "technical_analyst")
@@ -72,5 +109,68 @@ builder.add_edge("get_company_profile", "technical_analyst")
 builder.add_edge("fundamental_analyst", "analyst_manager")
 builder.add_edge("technical_analyst", "analyst_manager")
 builder.add_edge("analyst_manager", END)
+if BULL_BEAR_REPORTS:
+    # Bull and bear reports run alongside the manager, both from one shared (prompt-cached) data block
+    builder.add_node("debate_context", debate_context)
+    builder.add_node("bull_analyst", bull_analyst)
+    builder.add_node("bear_analyst", bear_analyst)
+    builder.add_edge("fundamental_analyst", "debate_context")
+    builder.add_edge("technical_analyst", "debate_context")
+    builder.add_edge("debate_context", "bull_analyst")
+    builder.add_edge("debate_context", "bear_analyst")
+    builder.add_edge("bull_analyst", END)
+    builder.add_edge("bear_analyst", END)
+# Comparison mode: the per-ticker branches are ranked in one synthesis call
+builder.add_edge("analyze_ticker", "comparison_manager")
+builder.add_edge("comparison_manager", END)
+# Sector mode: shared sector context once, one branch per constituent, one sector report
+builder.add_conditional_edges("sector_context", sector_condition, ["analyze_sector_ticker", END])
+builder.add_edge("analyze_sector_ticker", "sector_manager")
+builder.add_edge("sector_manager", END)
+
+graph = builder.compile()
+
+
+def stream_recommendation(message: str):
+    """Runs the analysis and yields the manager's output while it is being generated
+
+    Args:
+        message: the user request, e.g. "analyze AAPL" or "compare AAPL, MSFT and GOOGL"
+
+    Yields:
+        {"type": "token", "text": ...} for every completion chunk,
+        {"type": "field", "name": ..., "value": ...} as soon as a top-level field (final_recommendation,
+        confidence, short_summary, ...) is complete, and finally
+        {"type": "done", "manager_analysis": ..., "bull_report": ..., "bear_report": ...}
+    """
+    final_state = {}
+    for mode, chunk in graph.stream({"messages": [HumanMessage(content=message)]}, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            yield chunk
+        else:
+            final_state = chunk
+    yield {"type": "done", "manager_analysis": final_state.get("manager_analysis"),
+           "bull_report": resolve_blob(final_state.get("bull_report")),
+           "bear_report": resolve_blob(final_state.get("bear_report"))}
+
+
+def compare_similar(ticker: str, k: int = 3) -> dict:
+    """Runs ticker and its k most similar stocks (see utils.similarity_index) through the comparison mode
+
+    Returns:
+        The final graph state, with the ranking in manager_analysis and the candidates in "similar"
+    """
+    similar = find_similar(ticker, k)
+    symbols = [ticker.upper()] + [neighbor["symbol"] for neighbor in similar]
+    message = f"compare {', '.join(symbols)}" if similar else f"analyze {ticker.upper()}"
+    result = graph.invoke({"messages": [HumanMessage(content=message)]})
+    return {**result, "similar": similar}
+
+
+def analyze_sector(sector: str) -> dict:
+    """Runs the sector mode for a sector or industry name (e.g. "Semiconductors")
 
-graph = builder.compile()
\ No newline at end of file
+    Returns:
+        The final graph state, with the sector report in manager_analysis and the constituents in "tickers"
+    """
+    return graph.invoke({"messages": [HumanMessage(content=f"analyze the {sector} sector")]})
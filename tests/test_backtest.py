@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from utils.backtest import WARMUP_DAYS, compute_indicators, ema, evaluate_rule, forward_fill, rsi, signals_to_positions, sma
+
+# Vectorized indicator -> stockstats column it has to reproduce (get_technical_analysis uses stockstats)
+STOCKSTATS_COLUMNS = {
+    "sma_20": "close_20_sma",
+    "sma_50": "close_50_sma",
+    "rsi_14": "rsi_14",
+    "macd": "macd",
+    "macd_signal": "macds",
+    "boll_ub": "boll_ub",
+    "boll_lb": "boll_lb",
+}
+
+
+def _random_walk(seed: int, days: int) -> np.ndarray:
+    return 100 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.02, days)))
+
+
+def _stockstats(close: np.ndarray) -> dict:
+    pd = pytest.importorskip("pandas")
+    stockstats = pytest.importorskip("stockstats")
+    frame = stockstats.wrap(pd.DataFrame({"open": close, "high": close, "low": close, "close": close,
+                                          "volume": 1e6}))
+    return {ours: frame[column].to_numpy() for ours, column in STOCKSTATS_COLUMNS.items()}
+
+
+def test_indicators_match_stockstats():
+    # Three tickers in one matrix; the last one lists 40 days later (leading NaNs)
+    closes = [_random_walk(seed, 160) for seed in range(3)]
+    closes[2][:40] = np.nan
+    indicators = compute_indicators(np.vstack(closes))
+
+    for row, close in enumerate(closes):
+        listed = ~np.isnan(close)
+        expected = _stockstats(close[listed])
+        for name, values in expected.items():
+            ours = indicators[name][row][listed]
+            # The rolling windows stay NaN until they are full, stockstats starts with partial windows
+            full = ~np.isnan(ours)
+            window = 50 if name == "sma_50" else 20 if name.startswith(("sma", "boll")) else 0
+            assert full.sum() == len(ours) - max(window - 1, 0), name
+            np.testing.assert_allclose(ours[full], values[full], rtol=1e-9, atol=1e-9, err_msg=name)
+        assert np.isnan(indicators["close"][row][~listed]).all()
+
+
+def test_sma_hand_checked():
+    np.testing.assert_allclose(sma(np.array([[1.0, 2.0, 3.0, 4.0, 5.0]]), 3), [[np.nan, np.nan, 2.0, 3.0, 4.0]])
+    # A gap inside the window leaves it short of a full window
+    np.testing.assert_allclose(sma(np.array([[1.0, np.nan, 3.0, 4.0, 5.0]]), 2), [[np.nan, np.nan, np.nan, 3.5, 4.5]])
+
+
+def test_ema_is_adjusted():
+    # alpha 0.5: (2 + 0.5 * 1) / (1 + 0.5), then (4 + 0.5 * 2 + 0.25 * 1) / 1.75
+    np.testing.assert_allclose(ema(np.array([[1.0, 2.0, 4.0]]), 0.5), [[1.0, 5 / 3, 3.0]])
+    np.testing.assert_allclose(ema(np.array([[np.nan, 2.0, 4.0]]), 0.5), [[np.nan, 2.0, 10 / 3]])
+
+
+def test_rsi_extremes():
+    rising = np.arange(1.0, 31.0)[None, :]
+    flat = np.full((1, 30), 10.0)
+    values = rsi(np.vstack([rising, -rising + 100, flat]), 14)
+    np.testing.assert_allclose(values[:, -1], [100.0, 0.0, 50.0])
+
+
+def test_forward_fill_and_positions():
+    matrix = np.array([[np.nan, 1.0, np.nan, 3.0, np.nan], [2.0, np.nan, np.nan, np.nan, 5.0]])
+    np.testing.assert_array_equal(forward_fill(matrix), [[np.nan, 1.0, 1.0, 3.0, 3.0], [2.0, 2.0, 2.0, 2.0, 5.0]])
+
+    signals = np.array([[0, 1, 0, -1, 0, 1]])
+    np.testing.assert_array_equal(signals_to_positions(signals), [[0, 1, 1, 0, 0, 1]])
+    np.testing.assert_array_equal(signals_to_positions(signals, allow_short=True), [[0, 1, 1, -1, -1, 1]])
+
+
+def test_evaluate_rule_trades_from_the_next_bar():
+    # Price rises 10% a day; the rule always says BUY, which only counts after the warmup
+    days = WARMUP_DAYS + 5
+    close = 100 * 1.1 ** np.arange(days)[None, :]
+    always_buy = lambda ind: np.ones(ind["close"].shape, dtype=np.int8)
+    result = evaluate_rule({"close": close}, always_buy, cost_bps=10, horizon=2)
+
+    # Long from the close of day WARMUP_DAYS: four daily returns, the first one pays 10 bps
+    assert result["total_return"][0] == pytest.approx((1.1 - 0.001) * 1.1 ** 3 - 1)
+    assert result["buy_and_hold"][0] == pytest.approx(1.1 ** 4 - 1)
+    assert result["trades"][0] == 1
+    assert result["exposure"][0] == pytest.approx(4 / (days - 1))
+    assert result["max_drawdown"][0] == 0.0
+    assert (result["buy_signals"][0], result["buy_hits"][0], result["sell_signals"][0]) == (1, 1, 0)
+    assert result["portfolio"]["total_return"] == pytest.approx(result["total_return"][0], abs=1e-4)
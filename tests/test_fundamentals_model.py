@@ -0,0 +1,125 @@
+import math
+
+import numpy as np
+import pytest
+
+from utils.fundamentals_model import (VALUATION_METRICS, StatementPeriod, build_periods, compute_metrics,
+                                      history_trends, summarize_periods)
+
+
+def _income(date, revenue, net_income, **fields):
+    return {"date": date, "period": "FY", "fillingDate": f"{date[:4]}-10-30", "revenue": revenue,
+            "grossProfit": revenue * 0.4, "operatingIncome": revenue * 0.2, "netIncome": net_income,
+            "ebitda": revenue * 0.25, "epsdiluted": net_income / 10, **fields}
+
+
+def _balance(date, **fields):
+    return {"date": date, "totalAssets": 400.0, "totalStockholdersEquity": 200.0, "totalDebt": 100.0,
+            "netDebt": 50.0, "totalCurrentAssets": 150.0, "totalCurrentLiabilities": 100.0,
+            "inventory": 30.0, "cashAndShortTermInvestments": 50.0, **fields}
+
+
+def _cash_flow(date, free_cash_flow):
+    return {"date": date, "freeCashFlow": free_cash_flow, "operatingCashFlow": free_cash_flow * 1.5,
+            "dividendsPaid": -5.0}
+
+
+# Revenue grows exactly 10% a year, net income 20%
+ANNUAL_INCOME = [_income("2020-09-30", 100.0, 10.0), _income("2021-09-30", 110.0, 12.0),
+                 _income("2022-09-30", 121.0, 14.4), _income("2023-09-30", 133.1, 17.28)]
+
+
+@pytest.fixture
+def annual():
+    dates = [record["date"] for record in ANNUAL_INCOME]
+    # Deliberately out of order and with the balance sheets / cash flows in a different order
+    return build_periods(ANNUAL_INCOME[::-1][1:] + ANNUAL_INCOME[-1:], [_balance(d) for d in dates],
+                         [_cash_flow(d, 20.0) for d in reversed(dates)])
+
+
+def test_build_periods_aligns_by_date_newest_first(annual):
+    assert [period.date for period in annual] == ["2023-09-30", "2022-09-30", "2021-09-30", "2020-09-30"]
+    assert annual[0].revenue == pytest.approx(133.1)
+    assert annual[0].filing_date == "2023-10-30"
+    assert annual[0].total_equity == 200.0 and annual[0].free_cash_flow == 20.0
+    # Fields FMP did not send are NaN in the model and None when exported
+    assert math.isnan(annual[0].research_and_development)
+    assert annual[0].to_dict()["research_and_development"] is None
+
+
+def test_build_periods_without_statements():
+    assert build_periods({"Error Message": "limit reached"}) == []
+    periods = build_periods([_income("2023-09-30", 50.0, 5.0), "bad row"])
+    assert len(periods) == 1 and math.isnan(periods[0].total_assets)
+
+
+def test_margins_and_growth(annual):
+    metrics = compute_metrics(annual, growth_lag=1)
+    np.testing.assert_allclose(metrics["gross_margin"], 0.4)
+    np.testing.assert_allclose(metrics["net_margin"], [17.28 / 133.1, 14.4 / 121, 12 / 110, 0.1])
+    # The oldest period has nothing to grow from
+    np.testing.assert_allclose(metrics["revenue_growth"], [0.1, 0.1, 0.1, np.nan])
+    np.testing.assert_allclose(metrics["net_income_growth"], [0.2, 0.2, 0.2, np.nan])
+    np.testing.assert_allclose(metrics["current_ratio"], 1.5)
+    np.testing.assert_allclose(metrics["quick_ratio"], 1.2)
+    np.testing.assert_allclose(metrics["payout_ratio"][-1], 0.5)
+
+
+def test_growth_lag_compares_same_quarter_last_year():
+    revenues = [100.0, 90.0, 80.0, 70.0, 50.0, 60.0]
+    quarters = build_periods([_income(f"2023-{6 - i:02d}-01", revenue, 1.0) for i, revenue in enumerate(revenues)])
+    growth = compute_metrics(quarters, growth_lag=4)["revenue_growth"]
+    np.testing.assert_allclose(growth, [100 / 50 - 1, 90 / 60 - 1, np.nan, np.nan, np.nan, np.nan])
+
+
+def test_division_by_zero_and_negative_base():
+    periods = [StatementPeriod("2023-12-31", "FY", revenue=0.0, gross_profit=10.0, net_income=5.0),
+               StatementPeriod("2022-12-31", "FY", revenue=10.0, gross_profit=4.0, net_income=-10.0)]
+    metrics = compute_metrics(periods)
+    assert math.isnan(metrics["gross_margin"][0])
+    # Growth from a loss is measured against its absolute value: (5 - -10) / 10
+    assert metrics["net_income_growth"][0] == pytest.approx(1.5)
+
+
+def test_valuation_only_for_latest_period(annual):
+    metrics = compute_metrics(annual, market_cap=1728.0)
+    assert metrics["pe_ratio"][0] == pytest.approx(100.0)
+    assert metrics["price_to_book"][0] == pytest.approx(1728.0 / 200)
+    assert metrics["ev_to_ebitda"][0] == pytest.approx((1728.0 + 50) / (133.1 * 0.25))
+    for name in VALUATION_METRICS:
+        assert np.isnan(metrics[name][1:]).all()
+    assert not set(VALUATION_METRICS) & set(compute_metrics(annual))
+
+
+def test_summarize_periods_rounds_and_drops_missing(annual):
+    summary = summarize_periods(annual, compute_metrics(annual), max_periods=2)
+    assert len(summary) == 2
+    latest = summary[0]
+    assert latest["revenue"] == 133.1 and latest["net_income"] == 17.28
+    assert latest["metrics"]["revenue_growth"] == 0.1
+    assert latest["metrics"]["net_margin"] == round(17.28 / 133.1, 4)
+    assert "research_and_development" not in latest and "rnd_to_revenue" not in latest["metrics"]
+
+
+def test_history_trends_cagr_and_streaks(annual):
+    trends = history_trends(annual)
+    assert trends["years"] == 4
+    assert trends["period_range"] == "2020-09-30 to 2023-09-30"
+    revenue = trends["line_items"]["revenue"]
+    # 100 -> 133.1 over three years is exactly 10% a year; five and ten years are not available
+    assert revenue["cagr_3y"] == pytest.approx(0.1)
+    assert "cagr_5y" not in revenue and "cagr_10y" not in revenue
+    assert revenue["growth_volatility"] == pytest.approx(0.0)
+    assert revenue["growth_streak_years"] == 3
+    assert revenue["positive_streak_years"] == 4
+    assert trends["line_items"]["net_income"]["cagr_3y"] == pytest.approx(0.2)
+    assert trends["margins"]["gross_margin"]["latest"] == 0.4
+    assert trends["margins"]["gross_margin"]["slope_per_year"] == pytest.approx(0.0)
+
+
+def test_history_trends_cagr_needs_positive_ends():
+    incomes = [_income(f"{2020 + i}-12-31", 100.0, net_income) for i, net_income in enumerate([-5.0, 1.0, 2.0, 4.0])]
+    trends = history_trends(build_periods(incomes))
+    assert "cagr_3y" not in trends["line_items"]["net_income"]
+    assert trends["line_items"]["net_income"]["positive_streak_years"] == 3
+    assert history_trends(build_periods(incomes[:1])) == {}
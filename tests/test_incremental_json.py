@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from utils.incremental_json import IncrementalJSONParser, iter_array_items, parse_fields
+
+COMPLETION = ('```json\n{"final_recommendation": "BUY", "confidence": 0.82, "catalysts": ["AI demand", "buybacks"],'
+              ' "scores": {"growth": 8, "note": "a \\"quoted\\" } brace"}, "short_summary": "Caf\\u00e9 chain \\\\ '
+              'with {braces} and [brackets]", "hedged": false, "target": null}\n```\nDone.')
+EXPECTED = json.loads(COMPLETION[len("```json\n"):COMPLETION.index("\n```\n")])
+
+
+def _feed_in_chunks(text: str, size: int):
+    parser = IncrementalJSONParser()
+    completed = []
+    for start in range(0, len(text), size):
+        completed.extend(parser.feed(text[start:start + size]))
+    return parser, completed
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, len(COMPLETION)])
+def test_fields_match_the_full_parse_at_any_chunk_boundary(size):
+    parser, completed = _feed_in_chunks(COMPLETION, size)
+    assert parser.done
+    assert parser.fields == EXPECTED
+    assert completed == list(EXPECTED.items())
+
+
+def test_string_escapes():
+    assert EXPECTED["short_summary"] == "Café chain \\ with {braces} and [brackets]"
+    assert parse_fields(COMPLETION)["short_summary"] == EXPECTED["short_summary"]
+    assert parse_fields(COMPLETION)["scores"] == {"growth": 8, "note": 'a "quoted" } brace'}
+    # An escaped backslash right before the closing quote does not escape the quote
+    assert parse_fields('{"path": "C:\\\\", "next": 1}') == {"path": "C:\\", "next": 1}
+
+
+def test_fields_are_returned_when_complete():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"final_recommendation": "BU') == []
+    assert parser.feed('Y", "confidence": 0.8') == [("final_recommendation", "BUY")]
+    # A number is only complete at the next delimiter
+    assert parser.feed("2") == []
+    assert parser.feed(', "catalysts": ["a"') == [("confidence", 0.82)]
+    assert parser.feed("]") == [("catalysts", ["a"])]
+    assert not parser.done
+    assert parser.feed("}") == [] and parser.done
+    # Text after the object is ignored
+    assert parser.feed('{"late": 1}') == []
+
+
+def test_truncated_stream_keeps_completed_fields_only():
+    text = '{"a": "done", "b": {"nested": [1, 2'
+    assert parse_fields(text) == {"a": "done"}
+    assert parse_fields('{"a": 1, "b": "unterminated \\"str') == {"a": 1}
+    assert parse_fields('{"a": 1, "b": 2.5') == {"a": 1}
+    assert parse_fields("no json here") == {}
+
+
+def test_invalid_value_is_skipped():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"a": tru, "b": "ok"}') == [("b", "ok")]
+    assert parser.fields == {"b": "ok"}
+
+
+def test_empty_object():
+    parser = IncrementalJSONParser()
+    parser.feed("  {  }")
+    assert parser.done and parser.fields == {}
+
+
+ITEMS = [{"symbol": "AAPL", "close": 190.5, "name": "Apple, Inc. [ADR]"},
+         {"symbol": "MSFT", "close": 410.0, "name": "Micro\"soft\" }"},
+         {"symbol": "NVDA", "close": 880.25, "name": "Nvidia"}]
+
+
+@pytest.mark.parametrize("size", [1, 5, 64, 10000])
+def test_array_items_at_any_chunk_boundary(size):
+    body = json.dumps(ITEMS, indent=1)
+    chunks = (body[start:start + size] for start in range(0, len(body), size))
+    assert list(iter_array_items(chunks)) == ITEMS
+
+
+def test_array_items_are_yielded_before_the_stream_ends():
+    body = json.dumps(ITEMS)
+    first_end = body.index("}") + 1
+    items = iter_array_items(iter([body[:first_end], body[first_end:]]))
+    assert next(items) == ITEMS[0]
+
+
+def test_truncated_array_drops_the_partial_item():
+    body = json.dumps(ITEMS)
+    assert list(iter_array_items([body[:-20]])) == ITEMS[:2]
+
+
+def test_non_array_body_and_empty_array():
+    assert list(iter_array_items(['{"Error Message": ', '"Limit reached"}'])) == [{"Error Message": "Limit reached"}]
+    assert list(iter_array_items(["[", " ]"])) == []
+    assert list(iter_array_items([])) == []
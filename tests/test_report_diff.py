@@ -0,0 +1,62 @@
+from utils.report_diff import diff_reports, flatten, has_material_changes
+
+
+def _reports(recommendation="BUY", growth_score=7, summary="Strong quarter.", risks=None, regime="risk_on"):
+    return {
+        "fundamental_analysis": {"growth_score": {"score": growth_score, "reasoning": "Revenue up."},
+                                 "risks": risks if risks is not None else ["competition"]},
+        "technical_analysis": {"recommendation": recommendation, "confidence": "high", "summary": summary},
+        "market_regime": regime,
+    }
+
+
+def test_flatten():
+    assert flatten({"a": {"b": 1, "c": {"d": [1, 2]}}, "e": {}, "f": None}) == {
+        "a.b": 1, "a.c.d": [1, 2], "e": {}, "f": None}
+    assert flatten("text") == {"": "text"}
+
+
+def test_identical_reports_have_no_changes():
+    assert diff_reports(_reports(), _reports()) == {}
+    assert not has_material_changes({})
+
+
+def test_text_changes_are_listed_but_not_material():
+    changes = diff_reports(_reports(), _reports(summary="Solid quarter."))
+    assert changes == {"technical_analysis.summary": {"before": "Strong quarter.", "after": "Solid quarter.",
+                                                      "material": False}}
+    assert not has_material_changes(changes)
+
+
+def test_categorical_change_is_material():
+    changes = diff_reports(_reports(), _reports(recommendation="HOLD", regime="risk_off"))
+    assert changes["technical_analysis.recommendation"] == {"before": "BUY", "after": "HOLD", "material": True}
+    assert changes["market_regime"]["material"]
+    assert has_material_changes(changes)
+
+
+def test_score_threshold():
+    assert diff_reports(_reports(growth_score=7), _reports(growth_score=7.5)) == {
+        "fundamental_analysis.growth_score.score": {"before": 7, "after": 7.5, "material": False}}
+    changes = diff_reports(_reports(growth_score=7), _reports(growth_score=6))
+    assert changes["fundamental_analysis.growth_score.score"]["material"]
+    # A score that appears, disappears or stops being a number is always material
+    changes = diff_reports(_reports(growth_score=7), _reports(growth_score="n/a"))
+    assert changes["fundamental_analysis.growth_score.score"]["material"]
+
+
+def test_list_fields_report_added_and_removed_items():
+    changes = diff_reports(_reports(risks=["competition", "regulation"]), _reports(risks=["regulation", "supply chain"]))
+    assert changes["fundamental_analysis.risks"] == {"added": ["supply chain"], "removed": ["competition"],
+                                                    "material": False}
+
+
+def test_fields_missing_on_one_side():
+    current = _reports()
+    current["technical_analysis"]["risk_level"] = "medium"
+    changes = diff_reports(_reports(), current)
+    assert changes == {"technical_analysis.risk_level": {"before": None, "after": "medium", "material": True}}
+
+    # No previous synthesis: everything is new
+    changes = diff_reports(None, {"market_regime": "risk_on"})
+    assert changes == {"market_regime": {"before": None, "after": "risk_on", "material": True}}
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from utils.technical_analysis_tool import resample_bars
+
+
+def _bars(dates, closes, volumes=None):
+    closes = np.array(closes, dtype=float)
+    return {
+        "date": np.array(dates, dtype="datetime64[D]"),
+        "open": closes - 0.5,
+        "high": closes + 1.0,
+        "low": closes - 1.0,
+        "close": closes,
+        "volume": np.array(volumes if volumes is not None else [100.0] * len(closes), dtype=float),
+    }
+
+
+def test_weekly_bars_start_on_monday():
+    # Thu 2024-01-04, Fri 01-05 | Mon 01-08, Wed 01-10, Fri 01-12 | Mon 01-15 (01-06 / 01-07 is a weekend)
+    bars = _bars(["2024-01-04", "2024-01-05", "2024-01-08", "2024-01-10", "2024-01-12", "2024-01-15"],
+                 [10, 12, 11, 15, 9, 13], [100, 200, 300, 400, 500, 600])
+    weekly = resample_bars(bars, "W")
+    np.testing.assert_array_equal(weekly["date"], np.array(["2024-01-05", "2024-01-12", "2024-01-15"],
+                                                            dtype="datetime64[D]"))
+    np.testing.assert_array_equal(weekly["open"], [9.5, 10.5, 12.5])
+    np.testing.assert_array_equal(weekly["high"], [13.0, 16.0, 14.0])
+    np.testing.assert_array_equal(weekly["low"], [9.0, 8.0, 12.0])
+    np.testing.assert_array_equal(weekly["close"], [12.0, 9.0, 13.0])
+    np.testing.assert_array_equal(weekly["volume"], [300.0, 1200.0, 600.0])
+
+
+def test_sunday_belongs_to_the_week_before():
+    weekly = resample_bars(_bars(["2024-01-07", "2024-01-08"], [1, 2]), "W")
+    assert len(weekly["date"]) == 2
+
+
+def test_monthly_bars():
+    bars = _bars(["2023-12-28", "2023-12-29", "2024-01-02", "2024-01-31", "2024-02-01"], [5, 6, 7, 4, 8])
+    monthly = resample_bars(bars, "M")
+    np.testing.assert_array_equal(monthly["date"], np.array(["2023-12-29", "2024-01-31", "2024-02-01"],
+                                                             dtype="datetime64[D]"))
+    np.testing.assert_array_equal(monthly["open"], [4.5, 6.5, 7.5])
+    np.testing.assert_array_equal(monthly["close"], [6.0, 4.0, 8.0])
+    np.testing.assert_array_equal(monthly["high"], [7.0, 8.0, 9.0])
+    np.testing.assert_array_equal(monthly["low"], [4.0, 3.0, 7.0])
+    np.testing.assert_array_equal(monthly["volume"], [200.0, 200.0, 100.0])
+
+
+def test_missing_values_are_skipped():
+    bars = _bars(["2024-01-08", "2024-01-09", "2024-01-10"], [10, 20, 15], [100, np.nan, 50])
+    bars["high"][1] = np.nan
+    bars["low"][0] = np.nan
+    weekly = resample_bars(bars, "W")
+    assert (weekly["high"][0], weekly["low"][0], weekly["volume"][0]) == (16.0, 14.0, 150.0)
+
+
+@pytest.mark.parametrize("unit, rule", [("W", "W-SUN"), ("M", "MS")])
+def test_matches_pandas_resample(unit, rule):
+    pd = pytest.importorskip("pandas")
+    dates = pd.bdate_range("2023-01-02", "2024-06-28")
+    closes = 100 + np.cumsum(np.random.default_rng(1).normal(0, 1, len(dates)))
+    bars = _bars(dates.values.astype("datetime64[D]"), closes)
+    ours = resample_bars(bars, unit)
+
+    frame = pd.DataFrame({key: bars[key] for key in ("open", "high", "low", "close", "volume")}, index=dates)
+    expected = frame.resample(rule).agg({"open": "first", "high": "max", "low": "min", "close": "last",
+                                         "volume": "sum"}).dropna()
+    for key in ("open", "high", "low", "close", "volume"):
+        np.testing.assert_allclose(ours[key], expected[key].to_numpy(), err_msg=key)
+    last_days = frame.index.to_series().resample(rule).max().dropna()
+    np.testing.assert_array_equal(ours["date"], last_days.values.astype("datetime64[D]"))
+
+
+def test_empty_history():
+    empty = resample_bars(_bars([], []), "W")
+    assert all(len(values) == 0 for values in empty.values())
+    assert empty["date"].dtype == np.dtype("datetime64[D]")
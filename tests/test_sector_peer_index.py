@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+import utils.sector_peer_index as peer_index
+from utils.sector_peer_index import build_peer_index, get_peer_context, latest_metrics, percentile_rank
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0.5, 0.0),     # below the minimum
+    (1.0, 10.0),    # the minimum itself: mid-rank (0 + 1) / 2 of 5
+    (2.5, 40.0),    # between two values: 2 of 5 below
+    (3.0, 70.0),    # three ties at 3.0 between 2 below and 5 at or below: mid-rank 3.5 of 5
+    (9.0, 100.0),   # above the maximum
+])
+def test_percentile_rank(value, expected):
+    assert percentile_rank(np.array([1.0, 2.0, 3.0, 3.0, 3.0]), value) == expected
+
+
+def test_percentile_rank_edge_cases():
+    assert percentile_rank(np.array([]), 1.0) is None
+    assert percentile_rank(np.array([2.0]), 2.0) == 50.0
+    assert percentile_rank(np.array([2.0, 2.0, 2.0]), 2.0) == 50.0
+    assert percentile_rank(np.array([1.0, 2.0, 3.0, 4.0, 5.0]), 5.0) == 90.0
+    # Rounded to one decimal
+    assert percentile_rank(np.array([1.0, 2.0, 3.0]), 1.5) == 33.3
+
+
+def _record(symbol, industry, pe_ratio, net_margin, sector="Technology"):
+    return {"symbol": symbol, "sector": sector, "industry": industry, "market_cap": 1e10,
+            "metrics": {"pe_ratio": pe_ratio, "net_margin": net_margin}}
+
+
+@pytest.fixture
+def index():
+    universe = [
+        _record("A", "Software", 10.0, 0.10),
+        _record("B", "Software", 20.0, 0.20),
+        _record("C", "Software", -15.0, 0.05),        # loss-making: no P/E rank
+        _record("D", "Software", 30.0, float("nan")),
+        _record("E", "Software", 40.0, 0.30),
+        _record("F", "Software", 50.0, 0.40),
+        _record("G", "Hardware", 0.0, 0.15),
+        _record("H", "Hardware", 25.0, None),
+        {"sector": "Technology", "metrics": {"pe_ratio": 1.0}},   # no symbol, ignored
+    ]
+    return build_peer_index(universe)
+
+
+def test_build_drops_non_positive_multiples_and_missing_values(index):
+    arrays = index["arrays"]
+    np.testing.assert_array_equal(arrays["industry:Software|pe_ratio"], [10.0, 20.0, 30.0, 40.0, 50.0])
+    np.testing.assert_array_equal(arrays["industry:Software|net_margin"], [0.05, 0.10, 0.20, 0.30, 0.40])
+    np.testing.assert_array_equal(arrays["sector:Technology|pe_ratio"], [10.0, 20.0, 25.0, 30.0, 40.0, 50.0])
+    # Negative margins are valid values, only the valuation multiples are filtered
+    assert len(arrays["sector:Technology|net_margin"]) == 6
+    assert set(index["symbols"]) == set("ABCDEFGH")
+    assert "net_margin" not in index["symbols"]["H"]["metrics"]
+
+
+def test_peer_context_ranks_sector_and_large_industries(index):
+    context = get_peer_context("b", index=index)
+    software = context["industry (Software)"]
+    assert software["pe_ratio"] == {"value": 20.0, "percentile": 30.0, "peer_median": 30.0, "peers": 5}
+    assert software["net_margin"]["percentile"] == 50.0
+    assert context["sector (Technology)"]["pe_ratio"]["percentile"] == pytest.approx(25.0)
+    assert context["index_built_at"] == index["built_at"]
+
+
+def test_peer_context_skips_small_groups_and_negative_multiples(index):
+    # Hardware has two members (below MIN_PEERS), so only the sector comparison is left
+    context = get_peer_context("G", index=index)
+    assert list(context) == ["sector (Technology)", "index_built_at"]
+    # A P/E of 0 is not ranked, the margin is
+    assert set(context["sector (Technology)"]) == {"net_margin"}
+
+    context = get_peer_context("X", "Technology", "Software", {"pe_ratio": -3.0, "net_margin": 0.25}, index=index)
+    assert "pe_ratio" not in context["industry (Software)"]
+    assert context["industry (Software)"]["net_margin"]["percentile"] == 60.0
+
+
+def test_peer_context_errors(index):
+    assert "error" in get_peer_context("X", "Energy", None, {"pe_ratio": 10.0}, index=index)
+    assert "error" in get_peer_context("X", "Technology", None, {"pe_ratio": float("nan")}, index=index)
+
+
+def test_latest_metrics_keeps_finite_latest_values():
+    metrics = {"pe_ratio": np.array([12.0, np.nan]), "net_margin": np.array([np.nan, 0.2]), "gross_margin": np.array([]),
+               "unrelated": np.array([1.0])}
+    assert latest_metrics(metrics) == {"pe_ratio": 12.0}
+
+
+def test_save_and_reload_after_rebuild(index, tmp_path, monkeypatch):
+    monkeypatch.setattr(peer_index, "_index", None)
+    monkeypatch.setattr(peer_index, "_index_version", None)
+    path = str(tmp_path / "peer_index.npz")
+    assert peer_index.load_peer_index(path) is None
+
+    peer_index.save_peer_index(index, path)
+    loaded = peer_index.load_peer_index(path)
+    assert loaded["symbols"]["B"] == index["symbols"]["B"] and loaded["built_at"] == index["built_at"]
+    # A NaN metric of a ticker record comes back as a missing value
+    assert loaded["symbols"]["D"]["metrics"]["net_margin"] is None
+    np.testing.assert_array_equal(loaded["arrays"]["industry:Software|pe_ratio"], [10.0, 20.0, 30.0, 40.0, 50.0])
+    assert peer_index.load_peer_index(path) is loaded
+
+    rebuilt = build_peer_index([_record("Z", "Software", 5.0, 0.5)])
+    peer_index.save_peer_index(rebuilt, path)
+    monkeypatch.setattr(peer_index, "_index_version", -1)  # mtime resolution can hide a quick rewrite
+    assert set(peer_index.load_peer_index(path)["symbols"]) == {"Z"}
@@ -0,0 +1,72 @@
+import datetime
+import importlib
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+import utils.serialization
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def serialization(request, monkeypatch):
+    """utils.serialization with the backend chosen at import time forced to each backend"""
+    if request.param == "orjson" and utils.serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    monkeypatch.setenv("JSON_BACKEND", request.param)
+    module = importlib.reload(utils.serialization)
+    assert module.JSON_BACKEND == request.param
+    yield module
+    monkeypatch.delenv("JSON_BACKEND")
+    importlib.reload(utils.serialization)
+
+
+def test_round_trip_is_compact(serialization):
+    payload = {"ticker": "AAPL", "values": [1, 2.5, None, True], "nested": {"name": "Société"}}
+    text = serialization.dumps(payload)
+    assert text == '{"ticker":"AAPL","values":[1,2.5,null,true],"nested":{"name":"Société"}}'
+    assert serialization.loads(text) == payload
+    assert serialization.loads(text.encode("utf-8")) == payload
+
+
+def test_pretty_indents_two_spaces(serialization):
+    assert serialization.dumps({"a": [1]}, pretty=True) == '{\n  "a": [\n    1\n  ]\n}'
+
+
+def test_numpy_dates_and_decimals(serialization):
+    payload = {
+        "int": np.int64(3),
+        "float": np.float32(0.5),
+        "array": np.array([[1, 2], [3, 4]]),
+        "date": datetime.date(2024, 3, 1),
+        "datetime": datetime.datetime(2024, 3, 1, 9, 30),
+        "decimal": Decimal("1.25"),
+    }
+    assert serialization.loads(serialization.dumps(payload)) == {
+        "int": 3,
+        "float": 0.5,
+        "array": [[1, 2], [3, 4]],
+        "date": "2024-03-01",
+        "datetime": "2024-03-01T09:30:00",
+        "decimal": 1.25,
+    }
+
+
+def test_pandas_missing_values_are_null(serialization):
+    pd = pytest.importorskip("pandas")
+    assert serialization.dumps([pd.NaT, pd.NA]) == "[null,null]"
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), float("-inf"), np.float64("nan"), np.float32("inf")])
+def test_non_finite_floats_are_null(serialization, value):
+    assert serialization.dumps({"a": value, "b": [1.5, value]}) == '{"a":null,"b":[1.5,null]}'
+
+
+def test_non_finite_array_values_are_null(serialization):
+    text = serialization.dumps({"closes": np.array([1.0, np.nan, np.inf]), "pair": (np.nan, 2)}, pretty=True)
+    assert serialization.loads(text) == {"closes": [1.0, None, None], "pair": [None, 2]}
+
+
+def test_unserializable_objects_raise(serialization):
+    with pytest.raises(TypeError):
+        serialization.dumps({"a": object()})
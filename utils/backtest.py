@@ -0,0 +1,309 @@
+import os
+import sys
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.price_store import aligned_closes, backfill_prices, list_symbols
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Vectorized backtests of the indicator signals get_technical_analysis hands to the technical analyst.
+# All tickers are aligned into one (tickers x days) close matrix from the local price store and every
+# indicator is a whole-array operation on it; the recursive EMAs step through time with column
+# operations across all tickers at once. Indicator definitions follow stockstats (SMA 20/50, Wilder
+# RSI 14, MACD 12/26/9 with adjusted EMAs, Bollinger 20 / 2 std).
+BACKTEST_COST_BPS = float(os.getenv("BACKTEST_COST_BPS", "5"))      # per unit of position change
+BACKTEST_HORIZON_DAYS = int(os.getenv("BACKTEST_HORIZON_DAYS", "20"))  # forward window of the hit rate
+TRADING_DAYS = 252
+# Bars before signals are trusted (the longest indicator window)
+WARMUP_DAYS = 50
+
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """Fills gaps inside each row with the last valid value (leading NaNs stay NaN)"""
+    valid = ~np.isnan(matrix)
+    index = np.where(valid, np.arange(matrix.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = matrix[np.arange(matrix.shape[0])[:, None], index]
+    filled[np.cumsum(valid, axis=1) == 0] = np.nan
+    return filled
+
+
+def _rolling_sum(matrix: np.ndarray, window: int):
+    """Rolling sums of the values and of the valid-value counts along the time axis"""
+    values = np.nan_to_num(matrix)
+    counts = (~np.isnan(matrix)).astype(float)
+    sums = np.cumsum(values, axis=1)
+    totals = np.cumsum(counts, axis=1)
+    sums[:, window:] = sums[:, window:] - sums[:, :-window]
+    totals[:, window:] = totals[:, window:] - totals[:, :-window]
+    return sums, totals
+
+
+def sma(matrix: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average, NaN until a full window of values is available"""
+    sums, counts = _rolling_sum(matrix, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts >= window, sums / counts, np.nan)
+
+
+def rolling_std(matrix: np.ndarray, window: int) -> np.ndarray:
+    """Sample standard deviation (ddof=1) over a full window"""
+    # Centering on each row's first value keeps the sum of squares well conditioned
+    first = matrix[np.arange(matrix.shape[0]), np.argmax(~np.isnan(matrix), axis=1)]
+    centered = matrix - first[:, None]
+    sums, counts = _rolling_sum(centered, window)
+    squares, _ = _rolling_sum(centered ** 2, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = (squares - sums ** 2 / counts) / (counts - 1)
+    return np.where(counts >= window, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+
+
+def ema(matrix: np.ndarray, alpha: float) -> np.ndarray:
+    """Adjusted exponential moving average (pandas ewm(adjust=True)), starting at each row's first value"""
+    decay = 1.0 - alpha
+    values = np.nan_to_num(matrix)
+    valid = (~np.isnan(matrix)).astype(float)
+    out = np.empty_like(values)
+    numerator = np.zeros(matrix.shape[0])
+    weights = np.zeros(matrix.shape[0])
+    for t in range(matrix.shape[1]):
+        numerator = numerator * decay + values[:, t]
+        weights = weights * decay + valid[:, t]
+        out[:, t] = numerator / np.where(weights > 0, weights, np.nan)
+    return out
+
+
+def rsi(close: np.ndarray, window: int = 14) -> np.ndarray:
+    """Wilder RSI (smoothed averages of gains and losses)"""
+    change = np.diff(close, axis=1, prepend=np.nan)
+    started = ~np.isnan(close)
+    gains = np.where(started, np.where(change > 0, change, 0.0), np.nan)
+    losses = np.where(started, np.where(change < 0, -change, 0.0), np.nan)
+    avg_gain, avg_loss = ema(gains, 1.0 / window), ema(losses, 1.0 / window)
+    total = avg_gain + avg_loss
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, 100 * avg_gain / total, np.where(np.isnan(total), np.nan, 50.0))
+
+
+def compute_indicators(close: np.ndarray) -> dict:
+    """The technical analysis tool's indicators over a (tickers x days) close matrix"""
+    span = lambda n: 2.0 / (n + 1)
+    macd = ema(close, span(12)) - ema(close, span(26))
+    macd_signal = ema(macd, span(9))
+    boll_mid = sma(close, 20)
+    boll_width = 2 * rolling_std(close, 20)
+    return {
+        "close": close,
+        "sma_20": boll_mid,
+        "sma_50": sma(close, 50),
+        "rsi_14": rsi(close, 14),
+        "macd": macd,
+        "macd_signal": macd_signal,
+        "boll_ub": boll_mid + boll_width,
+        "boll_lb": boll_mid - boll_width,
+    }
+
+
+# Rule-based mappings from indicators to signals: +1 BUY, -1 SELL, 0 HOLD
+def _trend_rule(ind: dict) -> np.ndarray:
+    up = (ind["close"] > ind["sma_20"]) & (ind["sma_20"] > ind["sma_50"])
+    down = (ind["close"] < ind["sma_20"]) & (ind["sma_20"] < ind["sma_50"])
+    return up.astype(np.int8) - down.astype(np.int8)
+
+
+def _rsi_rule(ind: dict) -> np.ndarray:
+    return (ind["rsi_14"] < 30).astype(np.int8) - (ind["rsi_14"] > 70).astype(np.int8)
+
+
+def _macd_rule(ind: dict) -> np.ndarray:
+    return (ind["macd"] > ind["macd_signal"]).astype(np.int8) - (ind["macd"] < ind["macd_signal"]).astype(np.int8)
+
+
+def _bollinger_rule(ind: dict) -> np.ndarray:
+    return (ind["close"] < ind["boll_lb"]).astype(np.int8) - (ind["close"] > ind["boll_ub"]).astype(np.int8)
+
+
+def _consensus_rule(ind: dict) -> np.ndarray:
+    score = _trend_rule(ind) + _rsi_rule(ind) + _macd_rule(ind) + _bollinger_rule(ind)
+    return (score >= 2).astype(np.int8) - (score <= -2).astype(np.int8)
+
+
+RULES = {
+    "sma_trend": _trend_rule,
+    "rsi_reversion": _rsi_rule,
+    "macd_cross": _macd_rule,
+    "bollinger_reversion": _bollinger_rule,
+    "consensus": _consensus_rule,
+}
+
+
+def signals_to_positions(signals: np.ndarray, allow_short: bool = False) -> np.ndarray:
+    """BUY goes long, SELL goes flat (short with allow_short), HOLD keeps the previous position"""
+    target = np.where(signals > 0, 1.0, np.where(signals < 0, -1.0 if allow_short else 0.0, np.nan))
+    positions = forward_fill(target)
+    return np.nan_to_num(positions)
+
+
+def _performance(daily_returns: np.ndarray) -> dict:
+    """Total / annualized return, volatility, Sharpe and max drawdown per row of daily returns"""
+    returns = np.nan_to_num(daily_returns)
+    days = np.maximum((~np.isnan(daily_returns)).sum(axis=1), 1)
+    equity = np.cumprod(1 + returns, axis=1)
+    total = equity[:, -1] - 1
+    annualized = np.where(equity[:, -1] > 0, equity[:, -1] ** (TRADING_DAYS / days) - 1, -1.0)
+    volatility = returns.std(axis=1) * np.sqrt(TRADING_DAYS)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sharpe = np.where(volatility > 0, returns.mean(axis=1) * TRADING_DAYS / volatility, np.nan)
+    drawdown = (equity / np.maximum.accumulate(equity, axis=1) - 1).min(axis=1)
+    return {"total_return": total, "annualized_return": annualized, "volatility": volatility,
+            "sharpe": sharpe, "max_drawdown": drawdown}
+
+
+def _round(value, digits: int = 4):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def evaluate_rule(ind: dict, rule, cost_bps: float = BACKTEST_COST_BPS, horizon: int = BACKTEST_HORIZON_DAYS,
+                  allow_short: bool = False) -> dict:
+    """Backtests one signal mapping on all tickers at once
+
+    Signals are computed at the close and traded from the next bar on (no look-ahead); every unit of
+    position change costs cost_bps.
+
+    Returns:
+        per-ticker arrays (the _performance metrics, buy_and_hold, trades, exposure, buy/sell hit rates
+        and signal counts) plus the equal-weight portfolio of all tickers
+    """
+    close = ind["close"]
+    signals = rule(ind)
+    signals[:, :WARMUP_DAYS] = 0
+    signals[np.isnan(close)] = 0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        asset_returns = close[:, 1:] / close[:, :-1] - 1
+    positions = signals_to_positions(signals, allow_short)[:, :-1]
+    turnover = np.abs(np.diff(positions, axis=1, prepend=0.0))
+    strategy = positions * np.nan_to_num(asset_returns) - turnover * cost_bps / 1e4
+    strategy[np.isnan(asset_returns)] = np.nan
+
+    result = _performance(strategy)
+    held = asset_returns.copy()
+    held[:, :WARMUP_DAYS] = np.nan
+    result["buy_and_hold"] = _performance(held)["total_return"]
+    result["trades"] = (turnover > 0).sum(axis=1)
+    result["exposure"] = (positions != 0).mean(axis=1)
+
+    # Hit rates: share of new BUY (SELL) signals followed by a rise (fall) over the horizon
+    with np.errstate(invalid="ignore", divide="ignore"):
+        forward = np.full_like(close, np.nan)
+        forward[:, :-horizon] = close[:, horizon:] / close[:, :-horizon] - 1
+    previous = np.concatenate([np.zeros((signals.shape[0], 1), np.int8), signals[:, :-1]], axis=1)
+    for name, side in (("buy", 1), ("sell", -1)):
+        onsets = (signals == side) & (previous != side) & ~np.isnan(forward)
+        hits = onsets & (forward * side > 0)
+        result[f"{name}_signals"] = onsets.sum(axis=1)
+        result[f"{name}_hits"] = hits.sum(axis=1)
+
+    # Equal weight across the tickers trading on each day
+    active = (~np.isnan(strategy)).sum(axis=0)
+    portfolio = (np.nansum(strategy, axis=0) / np.maximum(active, 1))[None, :]
+    result["portfolio"] = {key: _round(values[0]) for key, values in _performance(portfolio).items()}
+    return result
+
+
+def _summary(result: dict, symbols: list, per_ticker: bool) -> dict:
+    def hit_rate(hits, signals):
+        return _round(hits / signals) if signals else None
+
+    summary = {
+        "portfolio": result["portfolio"],
+        "median_total_return": _round(np.nanmedian(result["total_return"])),
+        "median_buy_and_hold": _round(np.nanmedian(result["buy_and_hold"])),
+        "beat_buy_and_hold": _round(np.mean(result["total_return"] > result["buy_and_hold"])),
+        "trades": int(result["trades"].sum()),
+        "buy_signals": int(result["buy_signals"].sum()),
+        "buy_hit_rate": hit_rate(result["buy_hits"].sum(), result["buy_signals"].sum()),
+        "sell_signals": int(result["sell_signals"].sum()),
+        "sell_hit_rate": hit_rate(result["sell_hits"].sum(), result["sell_signals"].sum()),
+    }
+    if per_ticker:
+        summary["per_ticker"] = {
+            symbol: {
+                "total_return": _round(result["total_return"][row]),
+                "buy_and_hold": _round(result["buy_and_hold"][row]),
+                "sharpe": _round(result["sharpe"][row]),
+                "max_drawdown": _round(result["max_drawdown"][row]),
+                "trades": int(result["trades"][row]),
+                "exposure": _round(result["exposure"][row]),
+                "buy_hit_rate": hit_rate(result["buy_hits"][row], result["buy_signals"][row]),
+                "sell_hit_rate": hit_rate(result["sell_hits"][row], result["sell_signals"][row]),
+            }
+            for row, symbol in enumerate(symbols)
+        }
+    return summary
+
+
+def run_backtest(symbols: list = None, rules: list = None, lookback: int = None, cost_bps: float = BACKTEST_COST_BPS,
+                 horizon: int = BACKTEST_HORIZON_DAYS, allow_short: bool = False, per_ticker: bool = False) -> dict:
+    """Backtests the indicator rules on locally stored price history
+
+    Args:
+        symbols: tickers to test (default: every symbol in the price store)
+        rules: names from RULES (default: all)
+        lookback: only use the most recent N trading days
+        cost_bps: transaction cost per unit of position change, in basis points
+        horizon: forward window in trading days for the signal hit rates
+        allow_short: SELL signals go short instead of flat
+        per_ticker: include per-ticker metrics
+
+    Returns:
+        Dictionary with the tested period and, per rule, portfolio metrics, hit rates and return statistics
+    """
+    start = time.perf_counter()
+    dates, symbols, close = aligned_closes(symbols or list_symbols(), lookback)
+    if not symbols:
+        return {"error": "No stored price history - run update_prices / backfill_prices first"}
+
+    indicators = compute_indicators(forward_fill(close))
+    indicators["close"] = close
+    results = {}
+    for name in rules or RULES:
+        result = evaluate_rule(indicators, RULES[name], cost_bps, horizon, allow_short)
+        results[name] = _summary(result, symbols, per_ticker)
+
+    return {
+        "period": {"start": str(dates[0]), "end": str(dates[-1]), "days": len(dates)},
+        "tickers": len(symbols),
+        "cost_bps": cost_bps,
+        "horizon_days": horizon,
+        "rules": results,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+if __name__ == "__main__":
+    # python -m utils.backtest [--years N] [SYMBOL ...]   (--years downloads missing history first)
+    args = sys.argv[1:]
+    years = None
+    if args[:1] == ["--years"]:
+        years, args = float(args[1]), args[2:]
+    if years:
+        for symbol in args or list_symbols():
+            backfill_prices(symbol, int(years * 365))
+    report = run_backtest(args or None)
+    if "error" in report:
+        print(f"❌ {report['error']}")
+        sys.exit(1)
+    period = report["period"]
+    print(f"📊 {report['tickers']} tickers, {period['start']} -> {period['end']} ({period['days']} days), "
+          f"{report['cost_bps']} bps costs, computed in {report['seconds']}s")
+    for name, summary in report["rules"].items():
+        portfolio = summary["portfolio"]
+        print(f"  {name:<20} portfolio {portfolio['annualized_return']:+.2%}/yr  sharpe {portfolio['sharpe']}  "
+              f"maxDD {portfolio['max_drawdown']:.1%}  | BUY hit {summary['buy_hit_rate']}  "
+              f"SELL hit {summary['sell_hit_rate']}  trades {summary['trades']}")
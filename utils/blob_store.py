@@ -0,0 +1,203 @@
+import os
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+from utils.serialization import dumps, dumps_bytes, loads
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Large payloads (fetched data, analyst reports) are written here once, keyed by the hash of their
+# content, and only the short reference string travels through the graph state. That keeps state
+# copies and checkpoints small no matter how big the payloads get.
+BLOB_PREFIX = "blob:sha256:"
+
+# Blobs are persisted here so any process - another worker, a resumed checkpointed thread - can resolve a
+# reference. Set it to "" for memory-only blobs (single process)
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join(".cache", "blobs"))
+# In-memory LRU size. Evicted blobs are reloaded from disk - memory-only blobs are gone, so keep the bound
+# well above what in-flight runs reference
+BLOB_STORE_MAX_BYTES = int(os.getenv("BLOB_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Blob files not written or re-stored for this long are deleted (checked at most every BLOB_SWEEP_SECONDS)
+BLOB_STORE_MAX_AGE_DAYS = float(os.getenv("BLOB_STORE_MAX_AGE_DAYS", "7"))
+BLOB_SWEEP_SECONDS = 3600
+
+# Parsed payloads that only travel between nodes of one run in this process are kept as objects under a
+# "local:" reference - never serialized. Bounded: the least recently used objects are dropped first.
+LOCAL_PREFIX = "local:"
+BLOB_LOCAL_MAX_OBJECTS = int(os.getenv("BLOB_LOCAL_MAX_OBJECTS", "256"))
+
+_objects = OrderedDict()
+_blobs = OrderedDict()
+_blob_bytes = 0
+_lock = threading.Lock()
+_next_sweep = 0.0
+
+
+def is_blob_ref(value) -> bool:
+    """Checks whether a state value is a blob reference"""
+    return isinstance(value, str) and value.startswith(BLOB_PREFIX)
+
+
+def is_local_ref(value) -> bool:
+    """Checks whether a state value is a reference to an in-process object (put_local)"""
+    return isinstance(value, str) and value.startswith(LOCAL_PREFIX)
+
+
+def put_local(payload) -> str:
+    """Keeps a parsed payload in this process and returns a reference to it - no serialization
+
+    Only for payloads consumed within the same process and run; the referenced object is shared, so
+    readers must not modify it.
+
+    Returns:
+        A short reference string like "local:<hex>"
+    """
+    ref = LOCAL_PREFIX + uuid.uuid4().hex
+    with _lock:
+        _objects[ref] = payload
+        while len(_objects) > BLOB_LOCAL_MAX_OBJECTS:
+            _objects.popitem(last=False)
+    return ref
+
+
+def _get_local(ref: str):
+    with _lock:
+        if ref not in _objects:
+            raise KeyError(f"Local object not found (evicted or from another process): {ref}")
+        _objects.move_to_end(ref)
+        return _objects[ref]
+
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(BLOB_STORE_DIR, digest[:2], f"{digest}.json")
+
+
+def _remember(digest: str, data: bytes):
+    global _blob_bytes
+    with _lock:
+        if digest in _blobs:
+            _blobs.move_to_end(digest)
+            return
+        _blobs[digest] = data
+        _blob_bytes += len(data)
+        # Evict least recently used blobs - they are reloaded from disk when persisted
+        while _blob_bytes > BLOB_STORE_MAX_BYTES and len(_blobs) > 1:
+            _, evicted = _blobs.popitem(last=False)
+            _blob_bytes -= len(evicted)
+
+
+def put_blob(payload) -> str:
+    """Stores a JSON-serializable payload and returns its content-addressed reference
+
+    The payload is serialized once in compact form. Storing the same content twice is a no-op.
+
+    Args:
+        payload: any JSON-serializable object (dict, list, str, ...)
+
+    Returns:
+        A short reference string like "blob:sha256:<hex digest>"
+    """
+    data = dumps_bytes(payload)
+    digest = hashlib.sha256(data).hexdigest()
+
+    with _lock:
+        known = digest in _blobs
+    if not known:
+        _remember(digest, data)
+    if BLOB_STORE_DIR:
+        path = _blob_path(digest)
+        try:
+            # Storing the same content again keeps its file from being swept
+            os.utime(path)
+        except OSError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        _maybe_sweep()
+
+    return BLOB_PREFIX + digest
+
+
+def sweep_blobs(max_age_days: float = BLOB_STORE_MAX_AGE_DAYS) -> int:
+    """Deletes blob files (and leftover temp files) older than max_age_days
+
+    Returns:
+        The number of files deleted
+    """
+    if not BLOB_STORE_DIR or not os.path.isdir(BLOB_STORE_DIR) or max_age_days <= 0:
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    deleted = 0
+    for entry in os.scandir(BLOB_STORE_DIR):
+        if not entry.is_dir():
+            continue
+        for blob in os.scandir(entry.path):
+            try:
+                if blob.stat().st_mtime < cutoff:
+                    os.remove(blob.path)
+                    deleted += 1
+            except OSError:
+                pass
+    return deleted
+
+
+def _maybe_sweep():
+    """Starts a background sweep when the last one is older than BLOB_SWEEP_SECONDS"""
+    global _next_sweep
+    with _lock:
+        if time.monotonic() < _next_sweep:
+            return
+        _next_sweep = time.monotonic() + BLOB_SWEEP_SECONDS
+    threading.Thread(target=sweep_blobs, name="blob-sweep", daemon=True).start()
+
+
+def _load_bytes(ref: str) -> bytes:
+    if not is_blob_ref(ref):
+        raise ValueError(f"Not a blob reference: {ref!r}")
+    digest = ref[len(BLOB_PREFIX):]
+
+    with _lock:
+        data = _blobs.get(digest)
+        if data is not None:
+            _blobs.move_to_end(digest)
+            return data
+
+    if BLOB_STORE_DIR and os.path.exists(_blob_path(digest)):
+        with open(_blob_path(digest), "rb") as f:
+            data = f.read()
+        _remember(digest, data)
+        return data
+
+    raise KeyError(f"Blob not found: {ref}")
+
+
+def get_blob_text(ref: str) -> str:
+    """Returns the stored compact JSON text of a blob - use this when the payload goes into a prompt"""
+    return _load_bytes(ref).decode("utf-8")
+
+
+def get_blob(ref: str):
+    """Loads and decodes a blob by reference"""
+    return loads(_load_bytes(ref))
+
+
+def resolve_blob(value):
+    """Returns the payload for blob and local references and passes any other value through"""
+    if is_local_ref(value):
+        return _get_local(value)
+    return get_blob(value) if is_blob_ref(value) else value
+
+
+def resolve_blob_text(value) -> str:
+    """Like resolve_blob, but returns text suitable for interpolating into a prompt"""
+    if is_blob_ref(value):
+        return get_blob_text(value)
+    value = resolve_blob(value)
+    return value if isinstance(value, str) else dumps(value)
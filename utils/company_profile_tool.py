@@ -4,6 +4,8 @@ import json
 from dotenv import load_dotenv
 from langchain_core.tools import tool
 from analyst_states import AnalystManagerState
+from utils.blob_store import put_blob
+from utils.profile_store import fetch_profile
 
 
 # Load environment variables from .env file
@@ -21,62 +23,52 @@ def get_company_profile(state: AnalystManagerState) -> AnalystManagerState:
         state: AnalystManagerState containing the ticker to analyze
     
     Returns:
-        AnalystManagerState with company_profile populated
+        AnalystManagerState with company_profile set to a blob reference of the profile data
     """
     api_key = os.getenv("FMP_API_KEY")
     if not api_key:
         error_data = {
             "error": "FMP_API_KEY not found in environment variables"
         }
-        state.company_profile = json.dumps(error_data, indent=2)
-        return state
+        return {"company_profile": put_blob(error_data)}
     
-    base_url = "https://financialmodelingprep.com/api/v3"
     ticker = state.get("ticker", "")
     # Validate ticker parameter
     if not ticker:
         error_data = {
             "error": "No ticker provided"
         }
-        return {"company_profile": json.dumps(error_data, indent=2)}
+        return {"company_profile": put_blob(error_data)}
     try:
-        # Company profile endpoint
-        url = f"{base_url}/profile/{ticker}?apikey={api_key}"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
+        # Company profile endpoint (served from the profile store while it holds a recent one)
+        data = fetch_profile(ticker)
         if data:
             # Return company profile data
             profile_data = {
                 "company_profile": data,
             }
-            return {"company_profile": json.dumps(profile_data, indent=2)}
+            return {"company_profile": put_blob(profile_data)}
         else:
             # Return error information
             error_data = {
                 "error": f"No company profile data available for {ticker}"
             }
-            state.company_profile = json.dumps(error_data, indent=2)
-            return state
+            return {"company_profile": put_blob(error_data)}
         
     except requests.exceptions.RequestException as e:
         error_data = {
             "error": f"API request failed: {str(e)}"
         }
-        state.company_profile = json.dumps(error_data, indent=2)
-        return state
+        return {"company_profile": put_blob(error_data)}
     
     except json.JSONDecodeError as e:
         error_data = {
             "error": f"Failed to parse API response: {str(e)}"
         }
-        state.company_profile = json.dumps(error_data, indent=2)
-        return state
+        return {"company_profile": put_blob(error_data)}
     
     except Exception as e:
         error_data = {
             "error": f"Unexpected error: {str(e)}"
         }
-        state.company_profile = json.dumps(error_data, indent=2)
-        return state
+        return {"company_profile": put_blob(error_data)}
@@ -1,6 +1,6 @@
 from duckduckgo_search import DDGS
 from datetime import datetime
-import json
+from utils.serialization import dumps
 
 def parse_duckduckgo_date(date_str):
     """
@@ -43,7 +43,7 @@ def get_duckduckgo_news(query, start_date, end_date, max_results=50, region="us-
                     "snippet": r.get("body")
                 })
 
-    return json.dumps(results, indent=2, ensure_ascii=False)
+    return dumps(results)
 
 
 # Example usage
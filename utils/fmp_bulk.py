@@ -0,0 +1,170 @@
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.fmp_client import BULK_BASE_URL, CACHE_TTL, fmp_stream, prime_cache
+from utils.incremental_json import iter_array_items
+from utils.profile_store import put_profile
+from utils.price_store import PRICE_FIELDS, append_prices, bars_from_fmp, last_completed_session, load_prices, update_prices
+from utils.technical_analysis_tool import PRICE_HISTORY_DAYS, price_request_window, price_window
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Bulk ingestion: profiles and daily bars for a whole universe in a few large requests instead of one
+# request per ticker. Responses are stream-parsed and split into the per-symbol entries the
+# single-ticker tools already read - the profile store, the local price store and (when the FMP response
+# cache is on) the technical tool's price window.
+PROFILE_BATCH_SIZE = int(os.getenv("FMP_PROFILE_BATCH_SIZE", "500"))
+# Symbols further behind than this many sessions are updated one by one (they need a history download)
+BULK_EOD_MAX_SESSIONS = int(os.getenv("FMP_BULK_EOD_MAX_SESSIONS", "10"))
+BULK_FALLBACK_WORKERS = 8
+
+
+def bulk_profiles(symbols: list, batch_size: int = PROFILE_BATCH_SIZE) -> dict:
+    """Fetches company profiles with comma-separated symbol lists and stores them per symbol
+
+    Returns:
+        {symbol: profile record} for every symbol FMP returned
+    """
+    profiles = {}
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+    for start in range(0, len(symbols), batch_size):
+        batch = symbols[start:start + batch_size]
+        for record in iter_array_items(fmp_stream("profile", ",".join(batch))):
+            if not isinstance(record, dict) or "Error Message" in record:
+                raise RuntimeError(f"Bulk profile request failed: {record}")
+            symbol = record.get("symbol")
+            if symbol:
+                # get_company_profile and the fundamental tool read the profile store before calling FMP
+                put_profile(symbol, record)
+                profiles[symbol] = record
+    return profiles
+
+
+def _iter_lines(chunks):
+    """Complete lines of a text stream (only the unfinished last line is buffered)"""
+    tail = ""
+    for chunk in chunks:
+        lines = (tail + chunk).split("\n")
+        tail = lines.pop()
+        yield from lines
+    if tail:
+        yield tail
+
+
+def _eod_rows(session: str, wanted: dict):
+    """Streams one session of the bulk end-of-day CSV, yielding (symbol, bar) for the wanted symbols
+    whose bar is newer than their last stored one ({symbol: last stored date})"""
+    header = None
+    for line in _iter_lines(fmp_stream("batch-request-end-of-day-prices", base_url=BULK_BASE_URL, date=session)):
+        line = line.strip()
+        if not line:
+            continue
+        if header is None:
+            if line.startswith("{"):
+                raise RuntimeError(f"Bulk end-of-day request failed: {line[:200]}")
+            header = {name: index for index, name in enumerate(line.split(","))}
+            continue
+        values = line.split(",")
+        symbol, date = values[header["symbol"]], values[header["date"]][:10]
+        if symbol not in wanted or date <= wanted[symbol]:
+            continue
+        bar = {"date": date}
+        for field in PRICE_FIELDS:
+            try:
+                bar[field] = float(values[header[field]])
+            except (ValueError, KeyError, IndexError):
+                bar[field] = None
+        yield symbol, bar
+
+
+def prime_price_window(symbol: str, bars: dict):
+    """Caches the technical tool's next historical-price-full request from the stored bars, when the
+    store covers the whole (usual) window and the response cache is on"""
+    if CACHE_TTL <= 0:
+        return False
+    from_date, to_date = price_request_window(symbol, bars)
+    if (from_date, to_date) != price_window(PRICE_HISTORY_DAYS) or not len(bars["date"]):
+        return False
+    if bars["date"][0] > np.datetime64(from_date) or bars["date"][-1] < np.datetime64(last_completed_session()):
+        return False
+    keep = bars["date"] >= np.datetime64(from_date)
+    historical = [
+        {"date": str(day), **{field: None if np.isnan(bars[field][i]) else float(bars[field][i]) for field in PRICE_FIELDS}}
+        for i, day in zip(np.flatnonzero(keep)[::-1], bars["date"][keep][::-1])
+    ]
+    prime_cache("historical-price-full", symbol, {"symbol": symbol, "historical": historical},
+                **{"from": from_date, "to": to_date})
+    return True
+
+
+def bulk_update_prices(symbols: list, max_sessions: int = BULK_EOD_MAX_SESSIONS, history_days: int = 400) -> dict:
+    """Brings the stored daily bars of many symbols up to date with one bulk request per missing session
+
+    Symbols without stored history, or too far behind, are updated one by one (they need a history
+    download anyway, of history_days when nothing is stored).
+
+    Returns:
+        Dict with the fetched "sessions", the number of symbols "updated" in bulk, the "fallback" symbols
+        and the number of technical price windows "primed"
+    """
+    target = np.datetime64(last_completed_session())
+    wanted, fallback, stores = {}, [], {}
+    for symbol in dict.fromkeys(symbol.upper() for symbol in symbols):
+        stored = load_prices(symbol)
+        if stored is None or not len(stored["date"]):
+            fallback.append(symbol)
+            continue
+        stores[symbol] = stored
+        last = stored["date"][-1]
+        if last >= target:
+            continue
+        if np.busday_count(last + 1, target + 1) > max_sessions:
+            fallback.append(symbol)
+        else:
+            wanted[symbol] = str(last)
+
+    sessions, rows = [], defaultdict(list)
+    if wanted:
+        start = np.datetime64(min(wanted.values())) + 1
+        sessions = [str(day) for day in np.arange(start, target + 1, dtype="datetime64[D]") if np.is_busday(day)]
+        for session in sessions:
+            for symbol, row in _eod_rows(session, wanted):
+                rows[symbol].append(row)
+        for symbol, records in rows.items():
+            stores[symbol] = append_prices(symbol, bars_from_fmp(records))
+
+    if fallback:
+        def update(symbol):
+            try:
+                return symbol, update_prices(symbol, history_days)
+            except Exception as e:
+                print(f"⚠️ Could not update {symbol}: {e}")
+                return symbol, None
+
+        with ThreadPoolExecutor(max_workers=BULK_FALLBACK_WORKERS) as pool:
+            stores.update({symbol: bars for symbol, bars in pool.map(update, fallback) if bars is not None})
+
+    primed = sum(prime_price_window(symbol, bars) for symbol, bars in stores.items())
+    return {"sessions": sessions, "updated": len(rows), "fallback": fallback, "primed": primed}
+
+
+def bulk_refresh(symbols: list) -> dict:
+    """Profiles and daily bars of a whole universe in a handful of requests"""
+    profiles = bulk_profiles(symbols)
+    prices = bulk_update_prices(symbols)
+    return {"profiles": len(profiles), **prices}
+
+
+if __name__ == "__main__":
+    # python -m utils.fmp_bulk [SYMBOL ...]   (default: every symbol in the price store)
+    from utils.price_store import list_symbols
+
+    universe = sys.argv[1:] or list_symbols()
+    print(f"📦 Bulk refresh of {len(universe)} symbols...")
+    print(bulk_refresh(universe))
@@ -0,0 +1,279 @@
+import os
+import time
+import codecs
+import hashlib
+import threading
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from dotenv import load_dotenv
+
+from utils.serialization import dumps_bytes, loads
+
+# Load environment variables from .env file
+load_dotenv()
+
+BASE_URL = "https://financialmodelingprep.com/api/v3"
+# Bulk downloads (e.g. batch-request-end-of-day-prices) live on the v4 API
+BULK_BASE_URL = "https://financialmodelingprep.com/api/v4"
+
+# Request hedging - off by default. When enabled, a request that has not answered after the
+# configured latency percentile of its endpoint gets a duplicate, and the first response wins.
+HEDGE_ENABLED = os.getenv("FMP_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("FMP_HEDGE_PERCENTILE", "95"))
+# Budget for extra upstream load: hedges may be at most this fraction of primary requests
+HEDGE_BUDGET = float(os.getenv("FMP_HEDGE_BUDGET", "0.05"))
+HEDGE_MAX_BURST = 5
+# Don't hedge until we have seen enough samples for the endpoint to trust its percentiles
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 500
+
+_latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+_latency_lock = threading.Lock()
+
+_hedge_tokens = float(HEDGE_MAX_BURST)
+_hedge_counts = {"requests": 0, "hedged": 0, "hedge_wins": 0}
+_hedge_lock = threading.Lock()
+
+# Response cache - identical requests inside the TTL are answered locally. Opt-in (off by default, so
+# statements, filing probes and prices are never served stale): deployments with the pre-market warmer
+# (cache_warmer.py) set FMP_CACHE_TTL and FMP_CACHE_DIR so requests at the open don't hit FMP.
+CACHE_TTL = float(os.getenv("FMP_CACHE_TTL", "0"))
+# Price endpoints change during the session, so they expire sooner
+PRICE_CACHE_TTL = float(os.getenv("FMP_PRICE_CACHE_TTL", "3600"))
+PRICE_ENDPOINTS = {"historical-price-full", "historical-chart", "quote", "batch-request-end-of-day-prices"}
+# Optional directory to share the cache between processes (e.g. a warmer cron job and the server)
+CACHE_DIR = os.getenv("FMP_CACHE_DIR", "")
+CACHE_MAX_ENTRIES = int(os.getenv("FMP_CACHE_MAX_ENTRIES", "5000"))
+
+_cache = OrderedDict()
+_cache_counts = {"hits": 0, "misses": 0}
+_cache_lock = threading.Lock()
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="fmp")
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    """One keep-alive session per thread (requests.Session is not thread-safe)"""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        _local.session = session
+    return session
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _record_latency(endpoint: str, seconds: float):
+    with _latency_lock:
+        _latencies[endpoint].append(seconds)
+
+
+def get_hedge_delay(endpoint: str):
+    """Returns the hedge delay (seconds) for an endpoint, or None if there is too little history"""
+    with _latency_lock:
+        samples = list(_latencies.get(endpoint, ()))
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    return _percentile(samples, HEDGE_PERCENTILE)
+
+
+def get_latency_stats() -> dict:
+    """Per-endpoint latency percentiles (milliseconds) plus hedging counters"""
+    with _latency_lock:
+        snapshot = {endpoint: list(samples) for endpoint, samples in _latencies.items()}
+
+    endpoints = {}
+    for endpoint, samples in snapshot.items():
+        if not samples:
+            continue
+        endpoints[endpoint] = {
+            "count": len(samples),
+            "p50_ms": round(_percentile(samples, 50) * 1000, 1),
+            "p90_ms": round(_percentile(samples, 90) * 1000, 1),
+            "p99_ms": round(_percentile(samples, 99) * 1000, 1),
+        }
+
+    with _hedge_lock:
+        hedging = dict(_hedge_counts)
+    with _cache_lock:
+        cache = {**_cache_counts, "entries": len(_cache)}
+    return {"endpoints": endpoints, "hedging": hedging, "cache": cache}
+
+
+def _cache_ttl(endpoint: str) -> float:
+    return min(CACHE_TTL, PRICE_CACHE_TTL) if endpoint in PRICE_ENDPOINTS else CACHE_TTL
+
+
+def _cache_key(endpoint: str, symbol: str, params: dict) -> str:
+    query = "&".join(f"{k}={params[k]}" for k in sorted(params) if k != "apikey")
+    return f"{endpoint}/{symbol.upper()}?{query}"
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f"{hashlib.sha1(key.encode()).hexdigest()}.json")
+
+
+def _cache_read(endpoint: str, key: str):
+    """Returns the cached raw response body, or None when missing or expired"""
+    ttl = _cache_ttl(endpoint)
+    now = time.time()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry and entry[0] > now:
+            _cache.move_to_end(key)
+            return entry[1]
+    if CACHE_DIR:
+        path = _cache_path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if stored_at + ttl > now:
+                with open(path, "rb") as f:
+                    content = f.read()
+                _cache_store(key, content, stored_at + ttl, persist=False)
+                return content
+        except OSError:
+            pass
+    return None
+
+
+def _cache_store(key: str, content: bytes, expires_at: float, persist: bool = True):
+    with _cache_lock:
+        _cache[key] = (expires_at, content)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    if persist and CACHE_DIR:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = _cache_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+def is_cached(endpoint: str, symbol: str = "", **params) -> bool:
+    """Checks whether fmp_get(endpoint, symbol, **params) would be answered from the cache"""
+    return CACHE_TTL > 0 and _cache_read(endpoint, _cache_key(endpoint, symbol, params)) is not None
+
+
+def _earn_hedge_token():
+    global _hedge_tokens
+    with _hedge_lock:
+        _hedge_counts["requests"] += 1
+        _hedge_tokens = min(HEDGE_MAX_BURST, _hedge_tokens + HEDGE_BUDGET)
+
+
+def _take_hedge_token() -> bool:
+    global _hedge_tokens
+    with _hedge_lock:
+        if _hedge_tokens < 1:
+            return False
+        _hedge_tokens -= 1
+        _hedge_counts["hedged"] += 1
+        return True
+
+
+def _fetch(endpoint: str, url: str, params: dict, timeout: float):
+    start = time.perf_counter()
+    response = _session().get(url, params=params, timeout=timeout)
+    _record_latency(endpoint, time.perf_counter() - start)
+    response.raise_for_status()
+    return response.content
+
+
+def _hedged_fetch(endpoint: str, url: str, params: dict, timeout: float, delay: float):
+    primary = _executor.submit(_fetch, endpoint, url, params, timeout)
+    done, _ = wait([primary], timeout=delay)
+    if done or not _take_hedge_token():
+        return primary.result()
+
+    hedge = _executor.submit(_fetch, endpoint, url, params, timeout)
+    pending = {primary, hedge}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    with _hedge_lock:
+                        _hedge_counts["hedge_wins"] += 1
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def fmp_get(endpoint: str, symbol: str = "", timeout: float = 10, **params):
+    """Calls a Financial Modeling Prep endpoint and returns the parsed JSON response
+
+    Args:
+        endpoint: the endpoint path, e.g. "income-statement" or "historical-price-full"
+        symbol: the ticker (or comma-separated tickers) appended to the path
+        timeout: per-attempt timeout in seconds
+        **params: query string parameters (the api key is added automatically)
+
+    Returns:
+        The decoded JSON payload (a fresh object, also when served from the response cache)
+
+    Raises:
+        requests.exceptions.RequestException on transport or HTTP errors
+        json.JSONDecodeError if the response body is not valid JSON
+    """
+    url = f"{BASE_URL}/{endpoint}/{symbol}" if symbol else f"{BASE_URL}/{endpoint}"
+    key = _cache_key(endpoint, symbol, params) if CACHE_TTL > 0 else None
+    if key:
+        content = _cache_read(endpoint, key)
+        with _cache_lock:
+            _cache_counts["hits" if content is not None else "misses"] += 1
+        if content is not None:
+            return loads(content)
+
+    params["apikey"] = os.getenv("FMP_API_KEY")
+    _earn_hedge_token()
+    delay = get_hedge_delay(endpoint) if HEDGE_ENABLED else None
+    if delay is None:
+        content = _fetch(endpoint, url, params, timeout)
+    else:
+        content = _hedged_fetch(endpoint, url, params, timeout, delay)
+
+    data = loads(content)
+    # FMP reports some failures (e.g. rate limits) as a 200 with an error message - don't cache those
+    if key and not (isinstance(data, dict) and "Error Message" in data):
+        _cache_store(key, content, time.time() + _cache_ttl(endpoint))
+    return data
+
+
+def fmp_stream(endpoint: str, symbol: str = "", timeout: float = 60, base_url: str = BASE_URL, **params):
+    """Streams a large Financial Modeling Prep response as decoded text chunks instead of buffering it
+
+    Bulk responses bypass the response cache - callers split them into per-symbol entries (see prime_cache).
+
+    Yields:
+        Text chunks of the response body, in order
+
+    Raises:
+        requests.exceptions.RequestException on transport or HTTP errors
+    """
+    url = f"{base_url}/{endpoint}/{symbol}" if symbol else f"{base_url}/{endpoint}"
+    params["apikey"] = os.getenv("FMP_API_KEY")
+    start = time.perf_counter()
+    with _session().get(url, params=params, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        for chunk in response.iter_content(chunk_size=1 << 16):
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+    _record_latency(endpoint, time.perf_counter() - start)
+
+
+def prime_cache(endpoint: str, symbol: str = "", data=None, **params):
+    """Stores data as the cached response of fmp_get(endpoint, symbol, **params), e.g. one symbol's
+    share of a bulk response"""
+    if CACHE_TTL > 0:
+        _cache_store(_cache_key(endpoint, symbol, params), dumps_bytes(data), time.time() + _cache_ttl(endpoint))
@@ -1,218 +1,233 @@
 import os
+import hashlib
 import requests
 import json
 from dotenv import load_dotenv
 from langchain_core.tools import tool
+from utils.fmp_client import fmp_get
+from utils.fundamentals_model import VALUATION_METRICS, build_periods, compute_metrics, history_trends, summarize_periods
+from utils.profile_store import fetch_profile
+from utils.sector_peer_index import get_peer_context, latest_metrics
+from utils.statement_store import append_statements, request_limit, stored_periods
+from utils.serialization import dumps, dumps_bytes
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Periods passed to the analyst. One extra annual period (and four extra quarters) are fetched so
+# the latest periods get growth rates - year-over-year for quarters.
+ANNUAL_PERIODS = 2
+QUARTERLY_PERIODS = 2
+QUARTERLY_GROWTH_LAG = 4
 
-def getFundamentalLongTermData(ticker: str) -> str:
-    """Gets yearly fundamental data for the last two years from Financial Modeling Prep API
 
-    Args:
-        ticker: the ticker to get fundamental data for
-    
+def statement_limits(ticker: str) -> tuple:
+    """(annual, quarterly) limits of the next statement requests - the full history while the local
+    statement store lacks it (see utils.statement_store)"""
+    return (request_limit(ticker, "annual", ANNUAL_PERIODS + 1),
+            request_limit(ticker, "quarter", QUARTERLY_PERIODS + QUARTERLY_GROWTH_LAG))
+
+
+def statement_history(ticker: str, annual_periods: list, quarterly_periods: list, limits: tuple) -> dict:
+    """Adds the fetched periods to the statement store and summarizes the stored history
+
     Returns:
-        JSON string containing yearly financial data for the last 2 years
+        utils.fundamentals_model.history_trends of the stored annual (and quarterly) history
     """
-    api_key = os.getenv("FMP_API_KEY")
-    if not api_key:
-        return json.dumps({"error": "FMP_API_KEY not found in environment variables"})
-    
-    base_url = "https://financialmodelingprep.com/api/v3"
-    
     try:
-        # Get unique annual financial datasets (company_profile moved to getFundamentalData to avoid duplication)
-        endpoints = {
-            "income_statement": f"{base_url}/income-statement/{ticker}?limit=2&apikey={api_key}",
-            "balance_sheet": f"{base_url}/balance-sheet-statement/{ticker}?limit=2&apikey={api_key}",
-            "cash_flow": f"{base_url}/cash-flow-statement/{ticker}?limit=2&apikey={api_key}",
-            "financial_ratios": f"{base_url}/ratios/{ticker}?limit=2&apikey={api_key}",
-            "key_metrics": f"{base_url}/key-metrics/{ticker}?limit=2&apikey={api_key}",
-            "enterprise_value": f"{base_url}/enterprise-values/{ticker}?limit=2&apikey={api_key}"
-        }
-        
-        fundamental_data = {}
-        
-        for data_type, url in endpoints.items():
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            if data:  # Check if data is not empty
-                fundamental_data[data_type] = data
-            else:
-                fundamental_data[data_type] = f"No {data_type} data available for {ticker}"
-        
-        # Note: ticker and data_source metadata will be added by getFundamentalData
-        
-        return json.dumps(fundamental_data, indent=2)
-        
-    except requests.exceptions.RequestException as e:
-        error_msg = {
-            "error": f"API request failed: {str(e)}",
-            "ticker": ticker,
-            "data_source": "Financial Modeling Prep"
-        }
-        return json.dumps(error_msg, indent=2)
-    
-    except json.JSONDecodeError as e:
-        error_msg = {
-            "error": f"Failed to parse API response: {str(e)}",
-            "ticker": ticker,
-            "data_source": "Financial Modeling Prep"
-        }
-        return json.dumps(error_msg, indent=2)
-    
+        for period, periods, limit in (("annual", annual_periods, limits[0]), ("quarter", quarterly_periods, limits[1])):
+            # Fewer periods than requested: FMP has no older data for this ticker
+            append_statements(ticker, period, periods, complete=len(periods) < limit)
+        annual_periods = stored_periods(ticker, "annual") or annual_periods
+        quarterly_periods = stored_periods(ticker, "quarter") or quarterly_periods
     except Exception as e:
-        error_msg = {
-            "error": f"Unexpected error: {str(e)}",
-            "ticker": ticker,
-            "data_source": "Financial Modeling Prep"
-        }
-        return json.dumps(error_msg, indent=2)
+        print(f"⚠️ Could not store statements for {ticker}: {e}")
+    return history_trends(annual_periods, quarterly_periods)
 
-def getFundamentalShortTermData(ticker: str) -> str:
-    """Gets quarterly fundamental data for the last two quarters from Financial Modeling Prep API
+
+def getStatements(ticker: str, period: str = "annual", limit: int = 2) -> dict:
+    """Gets the income statement, balance sheet and cash flow statement for a ticker
+
+    Ratios, key metrics, enterprise values and growth are derived locally from these
+    (see utils.fundamentals_model), so they are not downloaded separately.
 
     Args:
-        ticker: the ticker to get quarterly fundamental data for
-    
+        ticker: the ticker to get statements for
+        period: "annual" or "quarter"
+        limit: number of most recent periods
+
     Returns:
-        JSON string containing quarterly financial data for the last 2 quarters
+        Dict with "income_statement", "balance_sheet" and "cash_flow" lists
     """
-    api_key = os.getenv("FMP_API_KEY")
-    if not api_key:
-        return json.dumps({"error": "FMP_API_KEY not found in environment variables"})
-    
-    base_url = "https://financialmodelingprep.com/api/v3"
-    
-    try:
-        # Get unique quarterly financial datasets (company_profile moved to getFundamentalData to avoid duplication)
-        endpoints = {
-            "quarterly_income_statement": f"{base_url}/income-statement/{ticker}?period=quarter&limit=2&apikey={api_key}",
-            "quarterly_balance_sheet": f"{base_url}/balance-sheet-statement/{ticker}?period=quarter&limit=2&apikey={api_key}",
-            "quarterly_cash_flow": f"{base_url}/cash-flow-statement/{ticker}?period=quarter&limit=2&apikey={api_key}",
-            "quarterly_ratios": f"{base_url}/ratios/{ticker}?period=quarter&limit=2&apikey={api_key}",
-            "quarterly_key_metrics": f"{base_url}/key-metrics/{ticker}?period=quarter&limit=2&apikey={api_key}",
-            "quarterly_earnings": f"{base_url}/earnings/{ticker}?limit=2&apikey={api_key}",
-            "quarterly_financial_growth": f"{base_url}/financial-growth/{ticker}?period=quarter&limit=2&apikey={api_key}"
-        }
-        
-        quarterly_data = {}
-        
-        for data_type, url in endpoints.items():
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            if data:  # Check if data is not empty
-                quarterly_data[data_type] = data
-            else:
-                quarterly_data[data_type] = f"No {data_type} data available for {ticker}"
-        
-        # Note: ticker and data_source metadata will be added by getFundamentalData
-        
-        return json.dumps(quarterly_data, indent=2)
-        
-    except requests.exceptions.RequestException as e:
-        error_msg = {
-            "error": f"API request failed: {str(e)}",
-            "ticker": ticker,
-            "data_source": "Financial Modeling Prep",
-            "data_period": "Quarterly"
-        }
-        return json.dumps(error_msg, indent=2)
-    
-    except json.JSONDecodeError as e:
-        error_msg = {
-            "error": f"Failed to parse API response: {str(e)}",
-            "ticker": ticker,
-            "data_source": "Financial Modeling Prep",
-            "data_period": "Quarterly"
-        }
-        return json.dumps(error_msg, indent=2)
-    
-    except Exception as e:
-        error_msg = {
-            "error": f"Unexpected error: {str(e)}",
-            "ticker": ticker,
-            "data_source": "Financial Modeling Prep",
-            "data_period": "Quarterly"
-        }
-        return json.dumps(error_msg, indent=2)
+    params = {"limit": limit}
+    if period == "quarter":
+        params["period"] = "quarter"
 
+    return {
+        "income_statement": fmp_get("income-statement", ticker, **params),
+        "balance_sheet": fmp_get("balance-sheet-statement", ticker, **params),
+        "cash_flow": fmp_get("cash-flow-statement", ticker, **params),
+    }
 
 
+def probe_latest_filing(ticker: str) -> str:
+    """Filing date of the most recent quarterly statement - one small request instead of the full download
+
+    Returns:
+        The filing date (or period date when FMP has no filing date), None when nothing is available
+    """
+    latest = fmp_get("income-statement", ticker, limit=1, period="quarter")
+    if not isinstance(latest, list) or not latest:
+        return None
+    record = latest[0]
+    return record.get("fillingDate") or record.get("filingDate") or record.get("date")
+
+
+def data_fingerprint(fundamental_data: dict) -> dict:
+    """Identifies the data an analysis was based on: latest filing dates plus a hash of the filing-derived
+    part of the payload
+
+    The market cap, the valuation multiples computed from it, the peer percentiles and earnings estimates
+    move with the market every day and are left out of the hash on purpose - otherwise a stored report
+    would never match. A report therefore sees them as of the day it was written, for at most
+    FUNDAMENTAL_REPORT_MAX_AGE_DAYS (analysts/fundamental_agent.py).
+
+    Args:
+        fundamental_data: output of fetch_fundamental_data
+
+    Returns:
+        Dict with "annual_filing", "quarterly_filing" and "payload_hash"
+    """
+    def latest_filing(periods):
+        return periods[0].get("filing_date") or periods[0].get("date") if periods else None
+
+    def filed(periods):
+        return [{**period, "metrics": {name: value for name, value in period.get("metrics", {}).items()
+                                       if name not in VALUATION_METRICS}}
+                for period in periods or [] if isinstance(period, dict)]
+
+    earnings = fundamental_data.get("quarterly_earnings")
+    filed_data = {
+        **{key: value for key, value in fundamental_data.items() if key not in ("market_cap", "peer_comparison")},
+        "annual": filed(fundamental_data.get("annual")),
+        "quarterly": filed(fundamental_data.get("quarterly")),
+        # Reported figures only - estimates (and their update stamps) are revised between filings
+        "quarterly_earnings": [{key: row.get(key) for key in ("date", "epsActual", "revenueActual")}
+                               for row in earnings if isinstance(row, dict) and row.get("epsActual") is not None]
+                              if isinstance(earnings, list) else earnings,
+    }
+    return {
+        "annual_filing": latest_filing(fundamental_data.get("annual")),
+        "quarterly_filing": latest_filing(fundamental_data.get("quarterly")),
+        "payload_hash": hashlib.sha256(dumps_bytes(filed_data)).hexdigest()[:16],
+    }
+
+
+def _profile_record(company_profile) -> dict:
+    if isinstance(company_profile, list):
+        company_profile = company_profile[0] if company_profile else {}
+    return company_profile if isinstance(company_profile, dict) else {}
+
+
+def fetch_fundamental_data(ticker: str, company_profile=None) -> dict:
+    """Gets annual and quarterly fundamentals with locally computed metrics
 
-@tool   
-def get_fundamental_data(ticker: str) -> str:
-    """Gets both yearly and quarterly fundamental data for the last two years and two quarters from Financial Modeling Prep API
-    
-    This function combines unique data from both long-term and short-term functions. 
-    Company profile data is handled separately by the get_company_profile tool.
-    
     Args:
         ticker: the ticker to get fundamental data for
-    
+        company_profile: FMP profile record(s) if already fetched - used for market cap based
+            valuation multiples. The profile is downloaded when not provided.
+
     Returns:
-        JSON string containing comprehensive financial data (yearly + quarterly data only)
+        Dict with compact annual / quarterly periods (statement highlights + derived metrics)
+        and the latest quarterly earnings, or an "error" entry
     """
     api_key = os.getenv("FMP_API_KEY")
     if not api_key:
-        return json.dumps({"error": "FMP_API_KEY not found in environment variables"})
-    
-    base_url = "https://financialmodelingprep.com/api/v3"
-    
-    
+        return {"error": "FMP_API_KEY not found in environment variables"}
 
     try:
-        combined_data = {}
-        
-        # Get unique long-term data
-        long_term_data = getFundamentalLongTermData(ticker)
-        long_term_json = json.loads(long_term_data)
-        
-        # Get unique short-term data  
-        short_term_data = getFundamentalShortTermData(ticker)
-        short_term_json = json.loads(short_term_data)
-        
-        # Combine all data
-        if "error" not in long_term_json:
-            combined_data.update(long_term_json)
-        
-        if "error" not in short_term_json:
-            combined_data.update(short_term_json)
-        
-        # Add metadata
-        combined_data["ticker"] = ticker.upper()
-        combined_data["data_source"] = "Financial Modeling Prep"
-        combined_data["data_type"] = "Comprehensive (Annual + Quarterly)"
-        
-        return json.dumps(combined_data, indent=2)
-        
+        limits = statement_limits(ticker)
+        annual = getStatements(ticker, "annual", limits[0])
+        quarterly = getStatements(ticker, "quarter", limits[1])
+        earnings = fmp_get("earnings", ticker, limit=2)
+        if company_profile is None:
+            company_profile = fetch_profile(ticker)
+        profile = _profile_record(company_profile)
+        market_cap = profile.get("mktCap") or profile.get("marketCap")
+
+        annual_periods = build_periods(annual["income_statement"], annual["balance_sheet"], annual["cash_flow"])
+        quarterly_periods = build_periods(quarterly["income_statement"], quarterly["balance_sheet"], quarterly["cash_flow"])
+        if not annual_periods and not quarterly_periods:
+            return {"error": f"No financial statements available for {ticker}", "ticker": ticker.upper(),
+                    "data_source": "Financial Modeling Prep"}
+
+        # Valuation multiples only make sense against annual figures
+        annual_metrics = compute_metrics(annual_periods, growth_lag=1, market_cap=market_cap)
+        quarterly_metrics = compute_metrics(quarterly_periods, growth_lag=QUARTERLY_GROWTH_LAG)
+        history = statement_history(ticker, annual_periods, quarterly_periods, limits)
+
+        fundamental_data = {
+            "ticker": ticker.upper(),
+            "data_source": "Financial Modeling Prep",
+            "data_type": "Comprehensive (Annual + Quarterly) with derived metrics",
+            "market_cap": market_cap,
+            "annual": summarize_periods(annual_periods, annual_metrics, ANNUAL_PERIODS),
+            "quarterly": summarize_periods(quarterly_periods, quarterly_metrics, QUARTERLY_PERIODS),
+            # Long-run trends from the local statement history instead of raw statements
+            "history": history,
+            "quarterly_earnings": earnings or f"No quarterly_earnings data available for {ticker}",
+            "notes": "Growth is year-over-year (quarterly vs. same quarter last year). "
+                     "Valuation multiples use the current market cap against the latest fiscal year. "
+                     "History: CAGRs, growth volatility (std of annual growth) and streaks (consecutive "
+                     "latest years) over all stored fiscal years.",
+        }
+
+        # Rank the latest fiscal year against the precomputed sector / industry peers - optional, so a
+        # failing lookup only drops the peer block
+        try:
+            peer_comparison = get_peer_context(ticker, profile.get("sector"), profile.get("industry"),
+                                               latest_metrics(annual_metrics))
+        except Exception as e:
+            print(f"⚠️ Peer comparison unavailable for {ticker}: {e}")
+            peer_comparison = {"error": str(e)}
+        if "error" not in peer_comparison:
+            fundamental_data["peer_comparison"] = peer_comparison
+
+        return fundamental_data
+
     except requests.exceptions.RequestException as e:
-        error_msg = {
+        return {
             "error": f"API request failed: {str(e)}",
             "ticker": ticker,
             "data_source": "Financial Modeling Prep"
         }
-        return json.dumps(error_msg, indent=2)
-    
+
     except json.JSONDecodeError as e:
-        error_msg = {
+        return {
             "error": f"Failed to parse API response: {str(e)}",
             "ticker": ticker,
             "data_source": "Financial Modeling Prep"
         }
-        return json.dumps(error_msg, indent=2)
-    
+
     except Exception as e:
-        error_msg = {
+        return {
             "error": f"Unexpected error: {str(e)}",
             "ticker": ticker,
             "data_source": "Financial Modeling Prep"
         }
-        return json.dumps(error_msg, indent=2)
\ No newline at end of file
+
+
+@tool
+def get_fundamental_data(ticker: str) -> str:
+    """Gets both yearly and quarterly fundamental data for the last two years and two quarters from Financial Modeling Prep API
+
+    Statements are downloaded once and margins, growth, leverage, liquidity and valuation
+    metrics are computed locally from them.
+
+    Args:
+        ticker: the ticker to get fundamental data for
+
+    Returns:
+        JSON string containing comprehensive financial data (yearly + quarterly data with derived metrics)
+    """
+    return dumps(fetch_fundamental_data(ticker))
@@ -0,0 +1,316 @@
+import numpy as np
+
+# Compact, typed in-memory model of FMP financial statements plus a vectorized engine that derives
+# the ratios / key metrics / growth figures locally, instead of downloading the ratios, key-metrics,
+# enterprise-values and financial-growth endpoints separately.
+
+# Statement field -> FMP field name, per statement
+INCOME_FIELDS = {
+    "revenue": "revenue",
+    "cost_of_revenue": "costOfRevenue",
+    "gross_profit": "grossProfit",
+    "research_and_development": "researchAndDevelopmentExpenses",
+    "operating_income": "operatingIncome",
+    "ebitda": "ebitda",
+    "interest_expense": "interestExpense",
+    "income_before_tax": "incomeBeforeTax",
+    "income_tax_expense": "incomeTaxExpense",
+    "net_income": "netIncome",
+    "eps_diluted": "epsdiluted",
+    "shares_diluted": "weightedAverageShsOutDil",
+}
+BALANCE_FIELDS = {
+    "cash": "cashAndShortTermInvestments",
+    "receivables": "netReceivables",
+    "inventory": "inventory",
+    "current_assets": "totalCurrentAssets",
+    "total_assets": "totalAssets",
+    "current_liabilities": "totalCurrentLiabilities",
+    "total_liabilities": "totalLiabilities",
+    "total_debt": "totalDebt",
+    "net_debt": "netDebt",
+    "total_equity": "totalStockholdersEquity",
+}
+CASH_FLOW_FIELDS = {
+    "operating_cash_flow": "operatingCashFlow",
+    "capital_expenditure": "capitalExpenditure",
+    "free_cash_flow": "freeCashFlow",
+    "dividends_paid": "dividendsPaid",
+    "stock_repurchased": "commonStockRepurchased",
+}
+NUMERIC_FIELDS = tuple(INCOME_FIELDS) + tuple(BALANCE_FIELDS) + tuple(CASH_FLOW_FIELDS)
+
+
+class StatementPeriod:
+    """One reporting period (annual or quarterly) of income, balance sheet and cash flow data"""
+
+    __slots__ = ("date", "period", "filing_date") + NUMERIC_FIELDS
+
+    def __init__(self, date: str, period: str, filing_date: str = "", **values):
+        self.date = date
+        self.period = period
+        self.filing_date = filing_date
+        for field in NUMERIC_FIELDS:
+            value = values.get(field)
+            setattr(self, field, float(value) if value is not None else np.nan)
+
+    @classmethod
+    def from_fmp(cls, income: dict, balance: dict = None, cash_flow: dict = None):
+        """Builds a period from the matching FMP income / balance sheet / cash flow records"""
+        values = {}
+        for record, fields in ((income, INCOME_FIELDS), (balance or {}, BALANCE_FIELDS),
+                               (cash_flow or {}, CASH_FLOW_FIELDS)):
+            for field, fmp_field in fields.items():
+                values[field] = record.get(fmp_field)
+        return cls(income.get("date", ""), income.get("period", ""),
+                   income.get("fillingDate") or income.get("filingDate") or "", **values)
+
+    def to_dict(self) -> dict:
+        data = {"date": self.date, "period": self.period, "filing_date": self.filing_date}
+        for field in NUMERIC_FIELDS:
+            value = getattr(self, field)
+            data[field] = None if np.isnan(value) else value
+        return data
+
+
+def build_periods(income_statements, balance_sheets=None, cash_flows=None) -> list:
+    """Aligns FMP statement lists by period date and returns StatementPeriods, newest first"""
+    if not isinstance(income_statements, list):
+        return []
+    balance_by_date = {r.get("date"): r for r in balance_sheets or [] if isinstance(r, dict)}
+    cash_by_date = {r.get("date"): r for r in cash_flows or [] if isinstance(r, dict)}
+
+    periods = [
+        StatementPeriod.from_fmp(income, balance_by_date.get(income.get("date")), cash_by_date.get(income.get("date")))
+        for income in income_statements if isinstance(income, dict)
+    ]
+    periods.sort(key=lambda p: p.date, reverse=True)
+    return periods
+
+
+def _columns(periods) -> dict:
+    """Field -> 1-D float array across periods (newest first)"""
+    return {field: np.array([getattr(p, field) for p in periods], dtype=float) for field in NUMERIC_FIELDS}
+
+
+def _div(numerator, denominator):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.divide(numerator, denominator)
+    return np.where(np.isfinite(result), result, np.nan)
+
+
+def _growth(values, lag: int):
+    """Period-over-period growth for newest-first arrays, NaN where there is no earlier period"""
+    growth = np.full(values.shape, np.nan)
+    if len(values) > lag:
+        growth[:-lag] = _div(values[:-lag] - values[lag:], np.abs(values[lag:]))
+    return growth
+
+
+# Metrics computed from the current market cap rather than the filings (latest period only)
+VALUATION_METRICS = ("pe_ratio", "price_to_sales", "price_to_book", "price_to_fcf", "fcf_yield", "ev_to_ebitda",
+                     "ev_to_sales")
+
+
+def compute_metrics(periods, growth_lag: int = 1, market_cap: float = None) -> dict:
+    """Derives margins, growth, returns, leverage, liquidity and valuation multiples for all periods at once
+
+    Args:
+        periods: StatementPeriods, newest first
+        growth_lag: periods back to compare growth against (1 for annual, 4 for year-over-year quarterly)
+        market_cap: current market capitalization, enables valuation multiples for the latest period
+
+    Returns:
+        Dict of metric name -> NumPy array aligned with periods
+    """
+    c = _columns(periods)
+    revenue = c["revenue"]
+
+    metrics = {
+        # Margins
+        "gross_margin": _div(c["gross_profit"], revenue),
+        "operating_margin": _div(c["operating_income"], revenue),
+        "ebitda_margin": _div(c["ebitda"], revenue),
+        "net_margin": _div(c["net_income"], revenue),
+        "fcf_margin": _div(c["free_cash_flow"], revenue),
+        "rnd_to_revenue": _div(c["research_and_development"], revenue),
+        "effective_tax_rate": _div(c["income_tax_expense"], c["income_before_tax"]),
+        # Growth
+        "revenue_growth": _growth(revenue, growth_lag),
+        "operating_income_growth": _growth(c["operating_income"], growth_lag),
+        "net_income_growth": _growth(c["net_income"], growth_lag),
+        "eps_growth": _growth(c["eps_diluted"], growth_lag),
+        "fcf_growth": _growth(c["free_cash_flow"], growth_lag),
+        # Returns
+        "return_on_equity": _div(c["net_income"], c["total_equity"]),
+        "return_on_assets": _div(c["net_income"], c["total_assets"]),
+        "cash_conversion": _div(c["operating_cash_flow"], c["net_income"]),
+        # Leverage
+        "debt_to_equity": _div(c["total_debt"], c["total_equity"]),
+        "debt_to_assets": _div(c["total_debt"], c["total_assets"]),
+        "net_debt_to_ebitda": _div(c["net_debt"], c["ebitda"]),
+        "interest_coverage": _div(c["operating_income"], np.abs(c["interest_expense"])),
+        # Liquidity
+        "current_ratio": _div(c["current_assets"], c["current_liabilities"]),
+        "quick_ratio": _div(c["current_assets"] - np.nan_to_num(c["inventory"]), c["current_liabilities"]),
+        "cash_ratio": _div(c["cash"], c["current_liabilities"]),
+        # Shareholder returns
+        "payout_ratio": _div(-c["dividends_paid"], c["net_income"]),
+        "buyback_to_fcf": _div(-c["stock_repurchased"], c["free_cash_flow"]),
+    }
+
+    if market_cap and len(periods):
+        # Multiples use today's market cap, so they are only meaningful for the latest period
+        enterprise_value = market_cap + np.nan_to_num(c["net_debt"])
+        valuation = {
+            "pe_ratio": _div(market_cap, c["net_income"]),
+            "price_to_sales": _div(market_cap, revenue),
+            "price_to_book": _div(market_cap, c["total_equity"]),
+            "price_to_fcf": _div(market_cap, c["free_cash_flow"]),
+            "fcf_yield": _div(c["free_cash_flow"], market_cap),
+            "ev_to_ebitda": _div(enterprise_value, c["ebitda"]),
+            "ev_to_sales": _div(enterprise_value, revenue),
+        }
+        for name, values in valuation.items():
+            values[1:] = np.nan
+            metrics[name] = values
+
+    return metrics
+
+
+def _round(value):
+    if value is None or np.isnan(value):
+        return None
+    return round(float(value), 4) if abs(value) < 1000 else round(float(value))
+
+
+def summarize_periods(periods, metrics: dict, max_periods: int = 2) -> list:
+    """Compact per-period view (statement highlights + derived metrics) for the analyst prompt"""
+    summary = []
+    for index, period in enumerate(periods[:max_periods]):
+        entry = period.to_dict()
+        for field in NUMERIC_FIELDS:
+            entry[field] = _round(entry[field]) if entry[field] is not None else None
+        entry["metrics"] = {
+            name: _round(values[index]) for name, values in metrics.items() if not np.isnan(values[index])
+        }
+        summary.append({key: value for key, value in entry.items() if value is not None})
+    return summary
+
+
+# Long-history trend summary: one (fields x periods) matrix per group, every statistic computed for all
+# rows at once. Rows are newest first, like everything else in this module.
+TREND_FIELDS = {
+    "revenue": "revenue_growth",
+    "operating_income": "operating_income_growth",
+    "net_income": "net_income_growth",
+    "eps_diluted": "eps_growth",
+    "free_cash_flow": "fcf_growth",
+}
+TREND_MARGINS = ("gross_margin", "operating_margin", "net_margin", "fcf_margin", "return_on_equity")
+CAGR_YEARS = (3, 5, 10)
+
+
+def _cagr(values, years: int):
+    """Compound annual growth of every row over the last `years` periods - NaN unless both ends are positive"""
+    if values.shape[1] <= years:
+        return np.full(len(values), np.nan)
+    end, start = values[:, 0], values[:, years]
+    valid = (end > 0) & (start > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(valid, (end / start) ** (1 / years) - 1, np.nan)
+
+
+def _streaks(conditions):
+    """Number of consecutive True values from the newest period on, per row"""
+    return np.cumprod(conditions, axis=1).sum(axis=1)
+
+
+def _slopes(values):
+    """Least-squares slope per period of every row, ignoring NaN (positive = rising over time)"""
+    x = -np.arange(values.shape[1], dtype=float)
+    mask = np.isfinite(values)
+    count = mask.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_mean = (x * mask).sum(axis=1) / count
+        y_mean = np.where(mask, values, 0).sum(axis=1) / count
+        dx = np.where(mask, x - x_mean[:, None], 0)
+        dy = np.where(mask, values - y_mean[:, None], 0)
+        slope = (dx * dy).sum(axis=1) / (dx ** 2).sum(axis=1)
+    return np.where(count >= 3, slope, np.nan)
+
+
+def _window_mean(values, periods: int):
+    window = values[:, :periods]
+    counts = np.isfinite(window).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts >= min(periods, 3), np.nansum(window, axis=1) / counts, np.nan)
+
+
+def history_trends(annual_periods, quarterly_periods=None) -> dict:
+    """Compact trend summary of a long statement history for the analyst prompt
+
+    Args:
+        annual_periods: StatementPeriods of up to 10+ fiscal years, newest first
+        quarterly_periods: StatementPeriods of recent quarters, newest first (for year-over-year streaks)
+
+    Returns:
+        Dict with CAGRs (3 / 5 / 10 years), growth volatility and streaks of the key line items,
+        margin levels / averages / slopes, and quarterly year-over-year streaks
+    """
+    if len(annual_periods) < 2:
+        return {}
+    c = _columns(annual_periods)
+    metrics = compute_metrics(annual_periods, growth_lag=1)
+    fields = list(TREND_FIELDS)
+    values = np.vstack([c[field] for field in fields])
+    growth = np.vstack([metrics[TREND_FIELDS[field]] for field in fields])
+    margins = np.vstack([metrics[name] for name in TREND_MARGINS])
+
+    cagrs = {years: _cagr(values, years) for years in CAGR_YEARS}
+    growth_mean = _window_mean(growth, growth.shape[1])
+    growth_volatility = np.sqrt(_window_mean((growth - growth_mean[:, None]) ** 2, growth.shape[1]))
+    with np.errstate(invalid="ignore"):
+        growth_streaks = _streaks(growth > 0)
+        positive_streaks = _streaks(values > 0)
+    margin_slopes = _slopes(margins)
+    averages = {years: _window_mean(margins, years) for years in (5, 10)}
+
+    summary = {
+        "years": len(annual_periods),
+        "period_range": f"{annual_periods[-1].date} to {annual_periods[0].date}",
+        "line_items": {
+            field: {
+                **{f"cagr_{years}y": _round(cagrs[years][i]) for years in CAGR_YEARS if np.isfinite(cagrs[years][i])},
+                "growth_volatility": _round(growth_volatility[i]),
+                "growth_streak_years": int(growth_streaks[i]),
+                "positive_streak_years": int(positive_streaks[i]),
+            }
+            for i, field in enumerate(fields)
+        },
+        "margins": {
+            name: {
+                "latest": _round(margins[i, 0]),
+                "avg_5y": _round(averages[5][i]),
+                "avg_10y": _round(averages[10][i]) if len(annual_periods) >= 10 else None,
+                "slope_per_year": _round(margin_slopes[i]),
+                "min": _round(np.nanmin(margins[i])) if np.isfinite(margins[i]).any() else None,
+                "max": _round(np.nanmax(margins[i])) if np.isfinite(margins[i]).any() else None,
+            }
+            for i, name in enumerate(TREND_MARGINS)
+        },
+    }
+    for section in summary["line_items"].values():
+        if section["growth_volatility"] is None:
+            del section["growth_volatility"]
+    for section in summary["margins"].values():
+        for key in [key for key, value in section.items() if value is None]:
+            del section[key]
+
+    if quarterly_periods and len(quarterly_periods) > 4:
+        quarterly = compute_metrics(quarterly_periods, growth_lag=4)
+        yoy = np.vstack([quarterly["revenue_growth"], quarterly["eps_growth"]])
+        with np.errstate(invalid="ignore"):
+            streaks = _streaks(yoy > 0)
+        summary["quarterly_yoy_growth_streak"] = {"revenue": int(streaks[0]), "eps_diluted": int(streaks[1])}
+    return summary
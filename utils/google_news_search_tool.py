@@ -2,8 +2,8 @@ from langchain_core.tools import tool
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
-import json
 import time
+from utils.serialization import dumps
 
 def make_request(url, headers, retries=3, delay=2):
     """Helper function to make HTTP requests with retries."""
@@ -100,7 +100,7 @@ def google_news_search_tool(ticker: str, start_date: str, end_date: str, max_pag
             print(f"Failed after multiple retries: {e}")
             break
 
-    return json.dumps(news_results, indent=2, ensure_ascii=False)
+    return dumps(news_results)
 
 
 # Example usage
@@ -0,0 +1,145 @@
+import json
+
+from utils.serialization import loads
+
+# Incremental parser for a JSON object that arrives in chunks (a streamed LLM completion). Top-level
+# fields are returned as soon as their value is complete - a string at its closing quote, an object
+# or array at its closing bracket, a number or literal at the following delimiter - so a client can
+# show "final_recommendation" long before the completion ends. Text around the object (```json
+# fences, prose) is ignored.
+
+
+class IncrementalJSONParser:
+    """Feed text chunks with feed(); each call returns the (name, value) fields completed by that chunk"""
+
+    def __init__(self):
+        self.fields = {}
+        self._state = "start"
+        self._key = []
+        self._value = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, text: str) -> list:
+        completed = []
+        for ch in text:
+            if self._state == "done":
+                break
+            self._step(ch, completed)
+        return completed
+
+    def _complete(self, completed: list):
+        name = "".join(self._key)
+        try:
+            value = loads("".join(self._value).strip())
+        except ValueError:
+            value = None
+        else:
+            self.fields[name] = value
+            completed.append((name, value))
+        self._key, self._value = [], []
+
+    def _step(self, ch: str, completed: list):
+        state = self._state
+        if state == "start":
+            if ch == "{":
+                self._state = "before_key"
+        elif state == "before_key":
+            if ch == '"':
+                self._state = "in_key"
+            elif ch == "}":
+                self._state = "done"
+        elif state == "in_key":
+            if self._escape:
+                self._key.append(ch)
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._state = "after_key"
+            else:
+                self._key.append(ch)
+        elif state == "after_key":
+            if ch == ":":
+                self._state = "before_value"
+        elif state == "before_value":
+            if not ch.isspace():
+                self._value = [ch]
+                self._in_string = ch == '"'
+                self._depth = 1 if ch in "{[" else 0
+                self._state = "in_value"
+        elif state == "in_value":
+            self._value_char(ch, completed)
+        elif state == "after_value":
+            if ch == ",":
+                self._state = "before_key"
+            elif ch == "}":
+                self._state = "done"
+
+    def _value_char(self, ch: str, completed: list):
+        if self._in_string:
+            self._value.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    self._complete(completed)
+                    self._state = "after_value"
+            return
+
+        if self._depth == 0 and ch in ",}":
+            # End of a number / true / false / null
+            self._complete(completed)
+            self._state = "before_key" if ch == "," else "done"
+            return
+
+        self._value.append(ch)
+        if ch == '"':
+            self._in_string = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self._complete(completed)
+                self._state = "after_value"
+
+
+def parse_fields(text: str) -> dict:
+    """All top-level fields of the first JSON object in text (tolerates a truncated object)"""
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return parser.fields
+
+
+def iter_array_items(chunks):
+    """Yields the items of a JSON array of objects arriving in text chunks, each as soon as it is complete
+
+    Only the unparsed tail is buffered, so a large response (e.g. a bulk download) is never held in
+    memory as a whole. A non-array body (an error object) is yielded as a single item.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position = "", 0
+    for chunk in chunks:
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,[":
+                position += 1
+            if position >= len(buffer) or buffer[position] == "]":
+                break
+            try:
+                item, position_after = decoder.raw_decode(buffer, position)
+            except ValueError:
+                # Incomplete item - wait for the next chunk
+                break
+            position = position_after
+            yield item
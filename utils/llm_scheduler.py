@@ -0,0 +1,305 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+from utils.serialization import loads
+
+try:
+    import tiktoken
+except ImportError:  # optional - falls back to a characters / 4 estimate
+    tiktoken = None
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Central LLM scheduler. Every node sends its calls through schedule_invoke(), which estimates the
+# prompt tokens and waits for admission: a slot in the bounded in-flight pool plus room in the model's
+# token and request buckets (refilled continuously at the provider's per-minute limits). Interactive
+# calls are admitted before batch calls (pre-market warming, multi-ticker runs). Admitted calls run on
+# the caller's thread, so LangChain callbacks and tracing context are unaffected.
+INTERACTIVE = 0
+BATCH = 1
+
+# Per-model provider limits, override with LLM_RATE_LIMITS='{"gpt-4o": {"tpm": 800000, "rpm": 5000}}'
+DEFAULT_RATE_LIMITS = {
+    "gpt-4o": {"tpm": 30000, "rpm": 500},
+    "gpt-4o-mini": {"tpm": 200000, "rpm": 500},
+}
+RATE_LIMITS = {**DEFAULT_RATE_LIMITS, **loads(os.getenv("LLM_RATE_LIMITS", "{}"))}
+FALLBACK_RATE_LIMIT = {"tpm": 30000, "rpm": 500}
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+# Completion tokens reserved per call until the actual usage is known
+LLM_COMPLETION_TOKENS = int(os.getenv("LLM_COMPLETION_TOKENS", "1000"))
+# Re-admissions after a provider 429 (the model's token bucket is drained first so the burst stops)
+LLM_RATE_LIMIT_RETRIES = 3
+WAIT_WINDOW = 500
+
+_priority = ContextVar("llm_priority", default=INTERACTIVE)
+
+
+class _Bucket:
+    """Continuously refilled budget: per_minute units, refilled at per_minute / 60 per second"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available (0 if it is available now)"""
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+
+class _Ticket:
+    __slots__ = ("priority", "seq", "model", "tokens", "enqueued", "granted")
+
+    def __init__(self, priority, seq, model, tokens):
+        self.priority = priority
+        self.seq = seq
+        self.model = model
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.granted = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+_queue = []
+_seq = itertools.count()
+_buckets = {}
+_condition = threading.Condition()
+_in_flight = 0
+_waits = defaultdict(lambda: deque(maxlen=WAIT_WINDOW))
+_counts = defaultdict(int)
+
+
+def model_name(llm) -> str:
+    """Model name of a chat model or of a bound runnable (llm.bind_tools(...))"""
+    llm = getattr(llm, "bound", llm)
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or "default"
+
+
+def _buckets_for(model: str):
+    if model not in _buckets:
+        limits = RATE_LIMITS.get(model, FALLBACK_RATE_LIMIT)
+        _buckets[model] = (_Bucket(limits["tpm"]), _Bucket(limits["rpm"]))
+    return _buckets[model]
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    """The model's tiktoken encoding, None when tiktoken or its encoding files are unavailable"""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Encoding files are downloaded on first use - offline hosts fall back to the estimate
+        return None
+
+
+def estimate_tokens(messages, model: str = "gpt-4o") -> int:
+    """Estimated prompt tokens of a message list (tiktoken when available, characters / 4 otherwise)"""
+    texts = [str(getattr(m, "content", m)) for m in (messages if isinstance(messages, list) else [messages])]
+    encoding = _encoding(model)
+    if encoding is not None:
+        count = sum(len(encoding.encode(text, disallowed_special=())) for text in texts)
+    else:
+        count = sum(len(text) for text in texts) // 4
+    # Per-message overhead of the chat format
+    return count + 4 * len(texts)
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """Runs the enclosed LLM calls (in this thread / context) with the given priority"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _dispatch() -> float:
+    """Admits queued tickets in priority order while slots and budget allow (caller holds _condition)
+
+    Returns:
+        Seconds until the next blocked ticket could be admitted, None when nothing is waiting on budget
+    """
+    global _in_flight
+    blocked = set()
+    wait = None
+    for ticket in sorted(_queue):
+        if _in_flight >= LLM_MAX_IN_FLIGHT:
+            break
+        if ticket.model in blocked:
+            continue
+        tokens, calls = _buckets_for(ticket.model)
+        now = time.monotonic()
+        tokens.refill(now)
+        calls.refill(now)
+        delay = max(tokens.wait_time(ticket.tokens), calls.wait_time(1))
+        if delay > 0:
+            # Later tickets for the same model must not overtake this one
+            blocked.add(ticket.model)
+            wait = delay if wait is None else min(wait, delay)
+            continue
+        tokens.level -= min(ticket.tokens, tokens.capacity)
+        calls.level -= 1
+        _queue.remove(ticket)
+        ticket.granted = True
+        _in_flight += 1
+        _waits[ticket.priority].append(now - ticket.enqueued)
+    heapq.heapify(_queue)
+    _condition.notify_all()
+    return wait
+
+
+def _acquire(model: str, tokens: int, priority: int) -> _Ticket:
+    ticket = _Ticket(priority, next(_seq), model, tokens)
+    with _condition:
+        heapq.heappush(_queue, ticket)
+        _counts["submitted"] += 1
+        while True:
+            wait = _dispatch()
+            if ticket.granted:
+                return ticket
+            _condition.wait(timeout=wait)
+
+
+def _release(ticket: _Ticket, used_tokens: int = None, rate_limited: bool = False):
+    global _in_flight
+    with _condition:
+        _in_flight -= 1
+        tokens = _buckets_for(ticket.model)[0]
+        if rate_limited:
+            # The provider disagrees with our budget: drain it so the burst stops
+            tokens.level = 0
+        elif used_tokens:
+            # Settle the reservation against the actual usage
+            tokens.level += min(ticket.tokens, tokens.capacity) - used_tokens
+        _dispatch()
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+@contextmanager
+def llm_slot(llm, messages, priority: int = None):
+    """Holds an admitted slot for one call made inside the block (e.g. llm.stream(messages))
+
+    Yields a dict; set "total_tokens" in it when the usage is known so the reservation is settled.
+    """
+    model = model_name(llm)
+    priority = _priority.get() if priority is None else priority
+    ticket = _acquire(model, estimate_tokens(messages, model) + LLM_COMPLETION_TOKENS, priority)
+    usage = {}
+    try:
+        yield usage
+    except Exception as e:
+        _release(ticket, rate_limited=_is_rate_limit(e))
+        with _condition:
+            _counts["rate_limited" if _is_rate_limit(e) else "failed"] += 1
+        raise
+    _release(ticket, usage.get("total_tokens"))
+    with _condition:
+        _counts["completed"] += 1
+
+
+def schedule_invoke(llm, messages, priority: int = None, **kwargs):
+    """Invokes a chat model through the scheduler and returns its response
+
+    Args:
+        llm: chat model or bound runnable (e.g. llm.bind_tools(tools))
+        messages: the input passed to llm.invoke
+        priority: INTERACTIVE or BATCH (defaults to the llm_priority() context, INTERACTIVE otherwise)
+        **kwargs: passed on to llm.invoke
+
+    Returns:
+        The model response, exactly as llm.invoke returns it
+    """
+    for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+        try:
+            with llm_slot(llm, messages, priority) as usage:
+                response = llm.invoke(messages, **kwargs)
+                usage.update(getattr(response, "usage_metadata", None) or {})
+            return response
+        except Exception as e:
+            # A 429 drained the budget - wait for admission again instead of hammering the provider
+            if not _is_rate_limit(e) or attempt == LLM_RATE_LIMIT_RETRIES:
+                raise
+
+
+def schedule_stream(llm, messages, on_chunk=None, priority: int = None, **kwargs):
+    """Streams a chat model completion through the scheduler
+
+    Args:
+        llm: chat model or bound runnable
+        messages: the input passed to llm.stream
+        on_chunk: optional callable(text) receiving each content chunk as it arrives
+        priority: INTERACTIVE or BATCH (see schedule_invoke)
+        **kwargs: passed on to llm.stream
+
+    Returns:
+        The aggregated response message (content, tool calls and usage of all chunks)
+    """
+    for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+        try:
+            with llm_slot(llm, messages, priority) as usage:
+                response = None
+                for chunk in llm.stream(messages, **kwargs):
+                    response = chunk if response is None else response + chunk
+                    if on_chunk is not None and chunk.content:
+                        on_chunk(chunk.content)
+                usage.update(getattr(response, "usage_metadata", None) or {})
+            return response
+        except Exception as e:
+            # Rate limits are reported before the first chunk, so nothing has been emitted yet
+            if not _is_rate_limit(e) or attempt == LLM_RATE_LIMIT_RETRIES:
+                raise
+
+
+def get_scheduler_stats() -> dict:
+    """Queue depth per priority, in-flight calls, wait-time percentiles (ms) and call counters"""
+    with _condition:
+        depth = defaultdict(int)
+        for ticket in _queue:
+            depth[ticket.priority] += 1
+        waits = {priority: sorted(samples) for priority, samples in _waits.items()}
+        stats = {
+            "queue_depth": {"interactive": depth[INTERACTIVE], "batch": depth[BATCH]},
+            "in_flight": _in_flight,
+            "counts": dict(_counts),
+            "buckets": {model: {"tokens_available": round(t.level), "requests_available": round(r.level)}
+                        for model, (t, r) in _buckets.items()},
+        }
+
+    names = {INTERACTIVE: "interactive", BATCH: "batch"}
+    stats["wait_ms"] = {
+        names.get(priority, str(priority)): {
+            "count": len(samples),
+            "p50": round(samples[len(samples) // 2] * 1000, 1),
+            "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1),
+        }
+        for priority, samples in waits.items() if samples
+    }
+    return stats
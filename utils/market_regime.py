@@ -0,0 +1,264 @@
+import os
+import time
+import warnings
+import threading
+from datetime import date
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.price_store import aligned_closes, list_symbols, update_prices
+from utils.serialization import dumps, loads
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Daily market-regime snapshot: index and sector ETF trends, breadth and realized volatility, built
+# once per day from the local price store and shared read-only by every analysis.
+MARKET_REGIME_DIR = os.getenv("MARKET_REGIME_DIR", os.path.join(".cache", "market_regime"))
+
+INDEX_ETFS = {"SPY": "S&P 500", "QQQ": "Nasdaq 100", "IWM": "Russell 2000", "DIA": "Dow Jones"}
+SECTOR_ETFS = {
+    "XLK": "Technology",
+    "SMH": "Semiconductors",
+    "XLF": "Financial Services",
+    "XLV": "Healthcare",
+    "XLE": "Energy",
+    "XLI": "Industrials",
+    "XLY": "Consumer Cyclical",
+    "XLP": "Consumer Defensive",
+    "XLU": "Utilities",
+    "XLRE": "Real Estate",
+    "XLB": "Basic Materials",
+    "XLC": "Communication Services",
+}
+LOOKBACK = 260
+TRADING_DAYS = 252
+# A snapshot built while the ETF refresh failed is kept in memory only and rebuilt after this many seconds
+MARKET_REGIME_RETRY_SECONDS = float(os.getenv("MARKET_REGIME_RETRY_SECONDS", "300"))
+
+_snapshot = {"date": None, "text": None, "retry_at": 0.0}
+_lock = threading.Lock()
+
+
+def _sma_last(closes, window: int):
+    """Last value of the simple moving average for every row (NaN if the row is too short)"""
+    tail = closes[:, -window:]
+    valid = np.sum(np.isfinite(tail), axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.nansum(tail, axis=1) / valid
+    return np.where(valid >= window * 0.9, means, np.nan)
+
+
+def _last_valid(closes):
+    """Last non-NaN value of every row"""
+    mask = np.isfinite(closes)
+    last_index = closes.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+    values = closes[np.arange(len(closes)), last_index]
+    return np.where(mask.any(axis=1), values, np.nan)
+
+
+def _value_ago(closes, days: int):
+    if closes.shape[1] <= days:
+        return np.full(len(closes), np.nan)
+    return _last_valid(closes[:, :-days])
+
+
+def _realized_vol(closes, window: int):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(np.log(closes[:, -(window + 1):]), axis=1)
+    return np.nanstd(returns, axis=1) * np.sqrt(TRADING_DAYS) if returns.shape[1] else np.full(len(closes), np.nan)
+
+
+def trend_table(closes) -> dict:
+    """Vectorized trend statistics for every row of an aligned close matrix"""
+    last = _last_valid(closes)
+    sma_50 = _sma_last(closes, 50)
+    sma_200 = _sma_last(closes, 200)
+    sma_50_prev = _sma_last(closes[:, :-20], 50) if closes.shape[1] > 20 else np.full(len(closes), np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "last": last,
+            "return_1m": last / _value_ago(closes, 21) - 1,
+            "return_3m": last / _value_ago(closes, 63) - 1,
+            "return_12m": last / _value_ago(closes, 250) - 1,
+            # 1.0 / 0.0, NaN when the history is too short for the average
+            "above_sma_50": np.where(np.isfinite(sma_50), last > sma_50, np.nan),
+            "above_sma_200": np.where(np.isfinite(sma_200), last > sma_200, np.nan),
+            "sma_50_slope_1m": sma_50 / sma_50_prev - 1,
+            "realized_vol_20d": _realized_vol(closes, 20),
+        }
+
+
+def _classify_trend(row: dict) -> str:
+    # The 200-day average only counts once there is enough history for it (None otherwise)
+    slope = row["sma_50_slope_1m"] or 0
+    if row["above_sma_50"] is True and row["above_sma_200"] is not False and slope > 0:
+        return "uptrend"
+    if row["above_sma_50"] is False and row["above_sma_200"] is not True and slope < 0:
+        return "downtrend"
+    return "sideways"
+
+
+def _rows(symbols, names, table) -> dict:
+    rows = {}
+    for i, symbol in enumerate(symbols):
+        row = {key: values[i] for key, values in table.items()}
+        if not np.isfinite(row["last"]):
+            continue
+        clean = {}
+        for key, value in row.items():
+            if not np.isfinite(value):
+                clean[key] = None
+            elif key.startswith("above_"):
+                clean[key] = bool(value)
+            else:
+                clean[key] = round(float(value), 4)
+        clean["trend"] = _classify_trend(clean)
+        clean["name"] = names.get(symbol, symbol)
+        rows[symbol] = clean
+    return rows
+
+
+def build_market_regime(refresh_prices: bool = True) -> dict:
+    """Computes the market-regime snapshot from the local price store
+
+    Args:
+        refresh_prices: bring index / sector ETF histories up to date first (one small request each
+            per day; the rest of the universe is read as stored)
+
+    Returns:
+        Snapshot dict with "indices", "sectors", "breadth", "volatility" and an overall "regime", plus
+        "refresh_failed" (the ETFs that could not be refreshed) when the refresh was incomplete
+    """
+    with warnings.catch_warnings():
+        # All-NaN rows (symbols with short histories) are expected and come out as NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return _build_market_regime(refresh_prices)
+
+
+def _build_market_regime(refresh_prices: bool) -> dict:
+    etfs = {**INDEX_ETFS, **SECTOR_ETFS}
+    refresh_failed = []
+    if refresh_prices:
+        for symbol in etfs:
+            try:
+                update_prices(symbol)
+            except Exception as e:
+                refresh_failed.append(symbol)
+                print(f"⚠️ Could not refresh {symbol}: {e}")
+
+    dates, symbols, closes = aligned_closes(list(etfs), lookback=LOOKBACK)
+    table = trend_table(closes) if len(symbols) else {}
+    rows = _rows(symbols, etfs, table) if table else {}
+    indices = {s: r for s, r in rows.items() if s in INDEX_ETFS}
+    sectors = {s: r for s, r in rows.items() if s in SECTOR_ETFS}
+
+    # Breadth over every single stock in the local store (ETFs excluded)
+    universe = [s for s in list_symbols() if s not in etfs]
+    _, breadth_symbols, universe_closes = aligned_closes(universe, lookback=LOOKBACK)
+    breadth = {"universe_size": len(breadth_symbols)}
+    if breadth_symbols:
+        universe_table = trend_table(universe_closes)
+        last = universe_table["last"]
+        previous = _value_ago(universe_closes, 1)
+        has_price = np.isfinite(last)
+        breadth.update({
+            "pct_above_sma_50": round(float(np.nanmean(universe_table["above_sma_50"][has_price]) * 100), 1),
+            "pct_above_sma_200": round(float(np.nanmean(universe_table["above_sma_200"][has_price]) * 100), 1),
+            "advancers_pct_1d": round(float(np.nanmean((last > previous)[has_price]) * 100), 1),
+        })
+    if sectors:
+        breadth["sectors_in_uptrend"] = sum(1 for r in sectors.values() if r["trend"] == "uptrend")
+        breadth["sectors_in_downtrend"] = sum(1 for r in sectors.values() if r["trend"] == "downtrend")
+
+    volatility = {}
+    spy = indices.get("SPY")
+    if spy and len(symbols):
+        spy_closes = closes[symbols.index("SPY"):symbols.index("SPY") + 1]
+        vol_20 = spy["realized_vol_20d"]
+        vol_1y = float(_realized_vol(spy_closes, LOOKBACK - 1)[0])
+        volatility = {"spy_realized_vol_20d": vol_20, "spy_realized_vol_1y": round(vol_1y, 4)}
+        if vol_20 is not None and np.isfinite(vol_1y):
+            volatility["vol_regime"] = "high" if vol_20 > 1.3 * vol_1y else "low" if vol_20 < 0.7 * vol_1y else "normal"
+
+    regime = "unknown"
+    if spy:
+        risk_on = spy["trend"] == "uptrend" and volatility.get("vol_regime") != "high"
+        risk_off = spy["trend"] == "downtrend" or (volatility.get("vol_regime") == "high" and
+                                                  breadth.get("pct_above_sma_50", 50) < 40)
+        regime = "risk_on" if risk_on else "risk_off" if risk_off else "neutral"
+
+    snapshot = {
+        "as_of": str(dates[-1]) if len(dates) else None,
+        "regime": regime,
+        "indices": indices,
+        "sectors": sectors,
+        "breadth": breadth,
+        "volatility": volatility,
+    }
+    if refresh_failed:
+        snapshot["refresh_failed"] = refresh_failed
+    return snapshot
+
+
+def _snapshot_path(day: str) -> str:
+    return os.path.join(MARKET_REGIME_DIR, f"{day}.json")
+
+
+def get_market_regime_text() -> str:
+    """Today's snapshot as compact JSON text, ready to be placed in a prompt
+
+    The snapshot is computed at most once per day: the first caller builds it (other threads wait
+    on the lock), it is persisted for other processes, and everyone else reads the shared text.
+    A snapshot built while the ETF refresh failed (e.g. an FMP outage) is not persisted - it is
+    served from memory and rebuilt after MARKET_REGIME_RETRY_SECONDS.
+    """
+    today = date.today().isoformat()
+    if _snapshot["date"] == today and time.monotonic() < _snapshot["retry_at"]:
+        return _snapshot["text"]
+
+    with _lock:
+        if _snapshot["date"] != today or time.monotonic() >= _snapshot["retry_at"]:
+            path = _snapshot_path(today)
+            retry_at = float("inf")
+            try:
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as f:
+                        text = f.read()
+                else:
+                    print("🌐 Building today's market regime snapshot...")
+                    snapshot = build_market_regime()
+                    text = dumps(snapshot)
+                    if snapshot.get("refresh_failed") or snapshot["regime"] == "unknown":
+                        retry_at = time.monotonic() + MARKET_REGIME_RETRY_SECONDS
+                    else:
+                        os.makedirs(MARKET_REGIME_DIR, exist_ok=True)
+                        tmp_path = f"{path}.{os.getpid()}.tmp"
+                        with open(tmp_path, "w", encoding="utf-8") as f:
+                            f.write(text)
+                        os.replace(tmp_path, path)
+            except Exception as e:
+                # Don't cache failures - the next request tries again
+                return dumps({"error": f"Market regime unavailable: {str(e)}"})
+            _snapshot.update(date=today, text=text, retry_at=retry_at)
+    return _snapshot["text"]
+
+
+def get_market_regime() -> dict:
+    """Today's snapshot as a fresh dict - a copy, so callers can't alter the shared snapshot"""
+    return loads(get_market_regime_text())
+
+
+def sector_regime(sector: str) -> dict:
+    """The snapshot entry of the ETF tracking a company's sector (None when not tracked)"""
+    snapshot = get_market_regime()
+    for symbol, row in snapshot.get("sectors", {}).items():
+        if row.get("name") == sector:
+            return {"etf": symbol, **row}
+    return None
+
+
+if __name__ == "__main__":
+    print(get_market_regime_text())
@@ -0,0 +1,304 @@
+import os
+import re
+import time
+import threading
+from collections import defaultdict
+
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+from openai import ContentFilterFinishReasonError, LengthFinishReasonError
+from pydantic import ValidationError
+
+from utils.llm_scheduler import estimate_tokens, schedule_invoke, schedule_stream
+from utils.serialization import dumps, loads
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Model tiering: every node names its stage and the router picks the model tier from configurable
+# rules - the stage's default tier, prompt size and completeness of the input data. When a small-tier
+# answer fails the stage's validation, the call is repeated once on the large tier.
+TIER_MODELS = {
+    "small": os.getenv("SMALL_MODEL", "gpt-4o-mini"),
+    "large": os.getenv("LARGE_MODEL", "gpt-4o"),
+}
+# USD per 1M input / output tokens, for the per-tier cost report
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+# Input tokens read from the provider's prompt cache are billed at this fraction of the input price
+CACHED_INPUT_PRICE_FACTOR = 0.5
+
+# Default tier per stage, override with MODEL_ROUTING='{"technical_analyst": "small"}'
+STAGE_TIERS = {
+    "ticker_extractor": "small",
+    "news_analyst_manager": "small",
+    "news_analyst": "large",
+    "fundamental_analyst": "large",
+    "technical_analyst": "large",
+    "analyst_manager": "large",
+    "comparison_manager": "large",
+    "bull_analyst": "large",
+    "bear_analyst": "large",
+    "portfolio_manager": "large",
+    "sector_manager": "large",
+}
+STAGE_TIERS.update(loads(os.getenv("MODEL_ROUTING", "{}")))
+# Prompts above this size go to the large tier regardless of the stage
+SMALL_TIER_MAX_PROMPT_TOKENS = int(os.getenv("SMALL_TIER_MAX_PROMPT_TOKENS", "6000"))
+# Provider-enforced structured output (json_schema response format). Disable for providers / models
+# without it - answers are then validated against the schema after the fact.
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "true").lower() == "true"
+
+REPAIR_PROMPT = """You repair JSON outputs that failed schema validation.
+Return only the corrected JSON object matching the schema. Keep the original assessment, wording and
+values; only fix the structure, missing fields and invalid values named in the validation error."""
+
+_models = {}
+_bound = {}
+_models_lock = threading.Lock()
+_stats = defaultdict(lambda: defaultdict(float))
+_stats_lock = threading.Lock()
+
+
+def get_model(tier: str, tools: list = None, response_format=None):
+    """Shared chat model of a tier, optionally with tools and/or a structured-output schema bound
+    (cached per tier, tool set and schema)"""
+    with _models_lock:
+        if tier not in _models:
+            # stream_usage: streamed completions report token usage too
+            _models[tier] = ChatOpenAI(model=TIER_MODELS[tier], stream_usage=True)
+        if not tools and response_format is None:
+            return _models[tier]
+        key = (tier, tuple(getattr(t, "name", str(t)) for t in tools or ()), response_format)
+        if key not in _bound:
+            if tools:
+                _bound[key] = _models[tier].bind_tools(tools, response_format=response_format)
+            else:
+                _bound[key] = _models[tier].bind(response_format=response_format)
+        return _bound[key]
+
+
+def choose_tier(stage: str, messages, complete: bool = True) -> str:
+    """Applies the routing rules
+
+    Args:
+        stage: the calling node
+        messages: the prompt, for the size rule
+        complete: False when the stage's input data has gaps or errors - the model then has to reason
+            around missing data, which goes to the large tier
+    """
+    tier = STAGE_TIERS.get(stage, "large")
+    if tier == "small":
+        if not complete:
+            return "large"
+        if estimate_tokens(messages, TIER_MODELS["small"]) > SMALL_TIER_MAX_PROMPT_TOKENS:
+            return "large"
+    return tier
+
+
+def _record(tier: str, stage: str, seconds: float, response):
+    usage = getattr(response, "usage_metadata", None) or {}
+    # Prompt tokens served from the provider's prefix cache (billed at a discount)
+    cache_read = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    input_price, output_price = MODEL_PRICES.get(TIER_MODELS[tier], (0.0, 0.0))
+    billed_input = usage.get("input_tokens", 0) - cache_read * (1 - CACHED_INPUT_PRICE_FACTOR)
+    cost = (billed_input * input_price + usage.get("output_tokens", 0) * output_price) / 1e6
+    with _stats_lock:
+        stats = _stats[tier]
+        stats["calls"] += 1
+        stats["latency_s"] += seconds
+        stats["input_tokens"] += usage.get("input_tokens", 0)
+        stats["cache_read_tokens"] += cache_read
+        stats["output_tokens"] += usage.get("output_tokens", 0)
+        stats["cost_usd"] += cost
+        stage_stats = _stats[f"stage:{stage}"]
+        stage_stats[f"{tier}_calls"] += 1
+        stage_stats["input_tokens"] += usage.get("input_tokens", 0)
+        stage_stats["cache_read_tokens"] += cache_read
+
+
+def routed_invoke(stage: str, messages, validate=None, complete: bool = True, tools: list = None):
+    """Invokes the model tier chosen for a stage, escalating to the large tier when validation fails
+
+    Args:
+        stage: the calling node, e.g. "ticker_extractor"
+        messages: the prompt messages
+        validate: optional callable(response) -> bool checking the answer
+        complete: whether the stage's input data is complete (see choose_tier)
+        tools: tools to bind to the model
+
+    Returns:
+        The model response
+    """
+    tier = choose_tier(stage, messages, complete)
+    start = time.perf_counter()
+    response = schedule_invoke(get_model(tier, tools), messages)
+    _record(tier, stage, time.perf_counter() - start, response)
+
+    if validate is not None and tier != "large" and not validate(response):
+        with _stats_lock:
+            _stats[f"stage:{stage}"]["escalations"] += 1
+        start = time.perf_counter()
+        response = schedule_invoke(get_model("large", tools), messages)
+        _record("large", stage, time.perf_counter() - start, response)
+    return response
+
+
+def routed_stream(stage: str, messages, on_chunk=None, validate=None, complete: bool = True, tools: list = None):
+    """Streaming variant of routed_invoke - on_chunk(text) receives the completion as it is produced
+
+    An escalation after a failed validation is not streamed; the large tier's answer is returned whole.
+    """
+    tier = choose_tier(stage, messages, complete)
+    start = time.perf_counter()
+    response = schedule_stream(get_model(tier, tools), messages, on_chunk=on_chunk)
+    _record(tier, stage, time.perf_counter() - start, response)
+
+    if validate is not None and tier != "large" and not validate(response):
+        with _stats_lock:
+            _stats[f"stage:{stage}"]["escalations"] += 1
+        start = time.perf_counter()
+        response = schedule_invoke(get_model("large", tools), messages)
+        _record("large", stage, time.perf_counter() - start, response)
+    return response
+
+
+def parse_structured(response, schema):
+    """Validates a response against a pydantic schema
+
+    Returns:
+        (report dict, None) or (None, error message)
+    """
+    refusal = response.additional_kwargs.get("refusal")
+    if refusal:
+        return None, f"refusal: {refusal}"
+    content = response.content or ""
+    try:
+        return schema.model_validate_json(content).model_dump(), None
+    except ValidationError as e:
+        error = str(e)
+    # Not provider-enforced: the object may be wrapped in ```json fences or prose
+    match = re.search(r'\{.*\}', content, re.DOTALL)
+    if match and match.group() != content:
+        try:
+            return schema.model_validate_json(match.group()).model_dump(), None
+        except ValidationError as e:
+            error = str(e)
+    return None, error
+
+
+def _count(stage: str, key: str):
+    with _stats_lock:
+        _stats[f"stage:{stage}"][key] += 1
+
+
+def _call_structured(tier: str, stage: str, messages, schema, on_chunk=None, **kwargs):
+    """One structured call; a completion cut off by the length limit or the content filter is
+    reported as a failed output rather than raised"""
+    model = get_model(tier, response_format=schema if STRUCTURED_OUTPUT else None)
+    start = time.perf_counter()
+    try:
+        if on_chunk is None:
+            response = schedule_invoke(model, messages, **kwargs)
+        else:
+            response = schedule_stream(model, messages, on_chunk=on_chunk, **kwargs)
+    except (LengthFinishReasonError, ContentFilterFinishReasonError) as e:
+        return None, None, f"{type(e).__name__}: {e}"
+    _record(tier, stage, time.perf_counter() - start, response)
+    report, error = parse_structured(response, schema)
+    return response, report, error
+
+
+def routed_structured(stage: str, messages, schema, complete: bool = True, on_chunk=None, **kwargs):
+    """Calls the routed tier with a typed output schema
+
+    The schema is enforced by the provider where available. An answer that still fails validation gets
+    a single targeted repair call on the large tier - the invalid output and the validation error only,
+    never the stage's full prompt again.
+
+    Args:
+        stage: the calling node, e.g. "fundamental_analyst"
+        messages: the prompt messages
+        schema: pydantic model of the expected answer (see analyst_schemas.py)
+        complete: whether the stage's input data is complete (see choose_tier)
+        on_chunk: stream the completion to on_chunk(text); the repair call is not streamed
+        **kwargs: passed on to the model call (not the repair), e.g. prompt_cache_key
+
+    Returns:
+        (report dict or None when the repair failed too, last model response or None)
+    """
+    _count(stage, "structured_answers")
+    tier = choose_tier(stage, messages, complete)
+    response, report, error = _call_structured(tier, stage, messages, schema, on_chunk, **kwargs)
+    if report is not None:
+        _count(stage, "structured_ok")
+        return report, response
+    if response is None or not response.content or error.startswith("refusal"):
+        # Nothing to repair
+        _count(stage, "structured_failed")
+        print(f"⚠️ {stage}: no valid output ({error})")
+        return None, response
+
+    _count(stage, "repairs")
+    repair_messages = [
+        SystemMessage(content=REPAIR_PROMPT),
+        HumanMessage(content=f"Schema:\n{dumps(schema.model_json_schema())}\n\n"
+                             f"Validation error:\n{error}\n\nOutput to repair:\n{response.content}"),
+    ]
+    repaired, report, repair_error = _call_structured("large", stage, repair_messages, schema)
+    if report is not None:
+        _count(stage, "repaired_ok")
+        return report, repaired
+    _count(stage, "structured_failed")
+    print(f"⚠️ {stage}: output failed validation after repair ({repair_error})")
+    return None, repaired or response
+
+
+def json_validator(*required_keys):
+    """Validation for stages that must answer with a JSON object containing required_keys"""
+    def validate(response) -> bool:
+        match = re.search(r'\{.*\}', response.content or "", re.DOTALL)
+        if not match:
+            return False
+        try:
+            data = loads(match.group())
+        except ValueError:
+            return False
+        return isinstance(data, dict) and all(key in data for key in required_keys)
+    return validate
+
+
+def get_router_stats() -> dict:
+    """Per-tier calls, average latency, tokens, prefix-cache hit rate and cost, plus per-stage tier counts,
+    escalations, cache hit rates and structured-output results (repair_rate / failure_rate per structured
+    answer)"""
+    with _stats_lock:
+        snapshot = {name: dict(values) for name, values in _stats.items()}
+    tiers, stages = {}, {}
+    for name, values in snapshot.items():
+        if name.startswith("stage:"):
+            stage = {key: int(value) for key, value in values.items()}
+            answers = stage.get("structured_answers", 0)
+            if answers:
+                stage["repair_rate"] = round(stage.get("repairs", 0) / answers, 4)
+                stage["failure_rate"] = round(stage.get("structured_failed", 0) / answers, 4)
+            if stage.get("input_tokens"):
+                stage["cache_hit_rate"] = round(stage.get("cache_read_tokens", 0) / stage["input_tokens"], 4)
+            stages[name[len("stage:"):]] = stage
+            continue
+        calls = int(values["calls"])
+        tiers[name] = {
+            "model": TIER_MODELS[name],
+            "calls": calls,
+            "avg_latency_s": round(values["latency_s"] / calls, 3) if calls else None,
+            "input_tokens": int(values["input_tokens"]),
+            "cache_read_tokens": int(values["cache_read_tokens"]),
+            "cache_hit_rate": round(values["cache_read_tokens"] / values["input_tokens"], 4)
+            if values["input_tokens"] else None,
+            "output_tokens": int(values["output_tokens"]),
+            "cost_usd": round(values["cost_usd"], 4),
+        }
+    return {"tiers": tiers, "stages": stages}
@@ -0,0 +1,310 @@
+import hashlib
+import os
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # not on Windows - writers are then only serialized within one process
+    fcntl = None
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.serialization import dumps_bytes, loads
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Local retrieval index over news / filing text, one persistent index per ticker. Articles are split
+# into overlapping word chunks and embedded as hashed TF-IDF vectors (unigrams + bigrams hashed into a
+# fixed feature space - no model, no vocabulary to maintain). The news analyst gets only the top-k
+# chunks for its questions, so its prompt stays bounded while the corpus grows.
+NEWS_INDEX_DIR = os.getenv("NEWS_INDEX_DIR", os.path.join(".cache", "news_index"))
+NEWS_HASH_BITS = 20
+NEWS_CHUNK_WORDS = int(os.getenv("NEWS_CHUNK_WORDS", "120"))
+NEWS_CHUNK_OVERLAP = 30
+# Chunks handed to the news analyst per search, whatever the size of the stored corpus
+NEWS_PROMPT_CHUNKS = int(os.getenv("NEWS_PROMPT_CHUNKS", "12"))
+# Only chunks indexed within this many days reach the analyst's "recent news" prompt
+NEWS_PROMPT_MAX_AGE_DAYS = int(os.getenv("NEWS_PROMPT_MAX_AGE_DAYS", "14"))
+# Default questions for the analyst's prompt when it did not ask for anything specific
+NEWS_TOPICS = (
+    "earnings results revenue guidance outlook forecast",
+    "analyst upgrade downgrade price target rating",
+    "supply chain demand production shortage",
+    "product launch partnership acquisition deal",
+    "lawsuit regulation investigation risk",
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'.-]*[a-z0-9]|[a-z0-9]")
+_STOPWORDS = frozenset("""a an and are as at be by for from has have in is it its of on or that the this to was
+were will with after before said says stock stocks shares share company inc""".split())
+
+_locks = {}
+_locks_guard = threading.Lock()
+# ticker -> (file mtime, loaded NewsIndex) - searches reuse the loaded index and its IDF weights
+_loaded = {}
+
+
+def _lock_for(ticker: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(ticker, threading.Lock())
+
+
+@contextmanager
+def _writer_lock(ticker: str):
+    """Serializes the writers of one ticker's index across threads and, where available, processes"""
+    with _lock_for(ticker):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(NEWS_INDEX_DIR, exist_ok=True)
+        with open(os.path.join(NEWS_INDEX_DIR, f"{ticker}.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _path(ticker: str) -> str:
+    return os.path.join(NEWS_INDEX_DIR, f"{ticker.upper()}.npz")
+
+
+def tokenize(text: str) -> list:
+    words = [word for word in _TOKEN_RE.findall((text or "").lower()) if word not in _STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def hash_terms(text: str):
+    """Hashed term counts of a text: (sorted unique feature ids, counts)"""
+    mask = (1 << NEWS_HASH_BITS) - 1
+    ids = np.fromiter((zlib.crc32(term.encode("utf-8")) & mask for term in tokenize(text)), dtype=np.uint32)
+    return np.unique(ids, return_counts=True)
+
+
+def chunk_text(text: str, words: int = NEWS_CHUNK_WORDS, overlap: int = NEWS_CHUNK_OVERLAP) -> list:
+    tokens = (text or "").split()
+    if not tokens:
+        return []
+    step = max(1, words - overlap)
+    return [" ".join(tokens[start:start + words]) for start in range(0, max(len(tokens) - overlap, 1), step)]
+
+
+def normalize_article(article: dict) -> dict:
+    """Maps the news tools' result shapes (Google scraper, Tavily, DuckDuckGo) onto one record"""
+    text = article.get("content") or article.get("text") or article.get("snippet") or article.get("body") or ""
+    return {
+        "title": (article.get("title") or "").strip(),
+        "date": article.get("date") or article.get("published_date"),
+        "source": article.get("source"),
+        "link": article.get("link") or article.get("url"),
+        "text": text.strip(),
+    }
+
+
+def article_key(article: dict) -> str:
+    """Identity of a normalized article: its link, or title + text when it has none"""
+    return hashlib.sha256((article["link"] or article["title"] + article["text"]).encode("utf-8")).hexdigest()[:16]
+
+
+class NewsIndex:
+    """Chunks and their hashed TF-IDF vectors for one ticker (CSR layout: indptr / ids / counts)"""
+
+    def __init__(self, ticker: str, chunks: list = None, indptr=None, ids=None, counts=None, articles: list = None):
+        self.ticker = ticker.upper()
+        self.chunks = chunks or []          # [{"article", "title", "date", "source", "link", "text", "added"}]
+        self.articles = set(articles or [])
+        self.indptr = np.zeros(1, np.int64) if indptr is None else indptr
+        self.ids = np.zeros(0, np.uint32) if ids is None else ids
+        self.counts = np.zeros(0, np.float32) if counts is None else counts
+        self._weights = None
+
+    def add_articles(self, articles: list) -> int:
+        """Chunks and indexes articles not seen before (deduplicated by link, or title + text)
+
+        Returns:
+            The number of chunks added
+        """
+        new_ids, new_counts, new_lengths = [], [], []
+        added_at = datetime.now().isoformat(timespec="seconds")
+        for raw in articles:
+            article = normalize_article(raw)
+            if not article["text"] and not article["title"]:
+                continue
+            key = article_key(article)
+            if key in self.articles:
+                continue
+            self.articles.add(key)
+            for text in chunk_text(article["text"]) or [""]:
+                # The title travels with every chunk - it names what the chunk is about
+                ids, counts = hash_terms(f"{article['title']} {text}")
+                if not len(ids):
+                    continue
+                new_ids.append(ids)
+                new_counts.append(counts)
+                new_lengths.append(len(ids))
+                self.chunks.append({"article": key, "title": article["title"], "date": article["date"],
+                                    "source": article["source"], "link": article["link"], "text": text,
+                                    "added": added_at})
+        if not new_ids:
+            return 0
+        self.ids = np.concatenate([self.ids] + new_ids).astype(np.uint32)
+        self.counts = np.concatenate([self.counts] + new_counts).astype(np.float32)
+        self.indptr = np.concatenate([self.indptr, self.indptr[-1] + np.cumsum(new_lengths)])
+        self._weights = None
+        return len(new_ids)
+
+    def _prepare(self):
+        """IDF per feature and the TF-IDF weights / norms of every chunk (recomputed after additions)"""
+        if self._weights is not None:
+            return
+        n = len(self.chunks)
+        features, inverse, df = np.unique(self.ids, return_inverse=True, return_counts=True)
+        idf = np.log((1 + n) / (1 + df)) + 1
+        weights = (1 + np.log(self.counts)) * idf[inverse]
+        rows = np.repeat(np.arange(n), np.diff(self.indptr))
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n))
+        self._features, self._idf, self._rows, self._inverse = features, idf, rows, inverse
+        self._weights = weights / np.where(norms > 0, norms, 1.0)[rows]
+
+    def search(self, query: str, k: int = 5, max_age_days: int = None) -> list:
+        """Top-k chunks by cosine similarity of hashed TF-IDF vectors
+
+        Args:
+            query: free-text question, e.g. "guidance changes"
+            k: number of chunks
+            max_age_days: only chunks indexed within this many days
+
+        Returns:
+            List of chunk records with a "score", best first
+        """
+        if not self.chunks:
+            return []
+        self._prepare()
+        query_ids, query_counts = hash_terms(query)
+        positions = np.searchsorted(self._features, query_ids)
+        known = (positions < len(self._features)) & (self._features[np.minimum(positions, len(self._features) - 1)] == query_ids)
+        if not known.any():
+            return []
+        query_weights = np.zeros(len(self._features))
+        query_weights[positions[known]] = (1 + np.log(query_counts[known])) * self._idf[positions[known]]
+
+        scores = np.bincount(self._rows, weights=self._weights * query_weights[self._inverse], minlength=len(self.chunks))
+        scores /= np.linalg.norm(query_weights)
+        if max_age_days is not None:
+            cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+            scores[[chunk["added"] < cutoff for chunk in self.chunks]] = 0
+        top = np.argsort(-scores)[:k]
+        return [{**self.chunks[i], "score": round(float(scores[i]), 4)} for i in top if scores[i] > 0]
+
+    def copy(self):
+        """A copy that can take new articles while readers keep using this one"""
+        return NewsIndex(self.ticker, list(self.chunks), self.indptr, self.ids, self.counts, self.articles)
+
+    def save(self):
+        """Writes arrays and metadata as one file, replaced atomically - readers never see a mix of two writes"""
+        os.makedirs(NEWS_INDEX_DIR, exist_ok=True)
+        path = _path(self.ticker)
+        meta = dumps_bytes({"chunks": self.chunks, "articles": sorted(self.articles)})
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez_compressed(tmp_path, indptr=self.indptr, ids=self.ids, counts=self.counts,
+                            meta=np.frombuffer(meta, dtype=np.uint8))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, ticker: str):
+        """The stored index (empty when nothing is stored yet)
+
+        Raises:
+            ValueError: the stored arrays and metadata do not line up
+        """
+        path = _path(ticker)
+        if not os.path.exists(path):
+            return cls(ticker)
+        with np.load(path) as stored:
+            if "meta" in stored.files:
+                meta = loads(stored["meta"].tobytes())
+            else:
+                # Written before the metadata moved into the npz - the next save converts it
+                with open(f"{path[:-4]}.json", "rb") as f:
+                    meta = loads(f.read())
+            index = cls(ticker, meta["chunks"], stored["indptr"], stored["ids"], stored["counts"], meta["articles"])
+        if len(index.indptr) != len(index.chunks) + 1:
+            raise ValueError(f"News index of {ticker.upper()} is inconsistent ({path}) - delete it to start over")
+        return index
+
+
+def load_news_index(ticker: str) -> NewsIndex:
+    """The ticker's index, loaded again only when its file changed - treat it as read-only"""
+    ticker = ticker.upper()
+    try:
+        mtime = os.stat(_path(ticker)).st_mtime_ns
+    except OSError:
+        return NewsIndex(ticker)
+    with _locks_guard:
+        cached = _loaded.get(ticker)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    index = NewsIndex.load(ticker)
+    with _locks_guard:
+        _loaded[ticker] = (mtime, index)
+    return index
+
+
+def add_news(ticker: str, articles: list) -> int:
+    """Adds articles to the ticker's persistent index, returns the number of new chunks"""
+    ticker = ticker.upper()
+    with _writer_lock(ticker):
+        index = load_news_index(ticker).copy()
+        added = index.add_articles(articles)
+        if added:
+            index.save()
+        return added
+
+
+def search_news(ticker: str, query: str, k: int = 5, max_age_days: int = None) -> list:
+    """Top-k relevant chunks of the ticker's stored news for a query"""
+    return load_news_index(ticker).search(query, k, max_age_days)
+
+
+def retrieve_context(ticker: str, queries: list = None, k: int = NEWS_PROMPT_CHUNKS, per_query: int = 4,
+                     max_age_days: int = None, include_articles: list = None) -> list:
+    """The chunks for an analyst prompt: the best chunks of several questions, deduplicated, at most k
+
+    Args:
+        ticker: the ticker whose index is searched
+        queries: questions to cover (default: NEWS_TOPICS)
+        k: total chunk budget of the prompt
+        per_query: chunks taken per question
+        max_age_days: only chunks indexed within this many days
+        include_articles: article keys (see article_key) that get at least one chunk whatever their score,
+            e.g. the results of the search that just ran - in order, at most half of k
+    """
+    index = load_news_index(ticker)
+    seen, selected = set(), []
+    for query in queries or NEWS_TOPICS:
+        for chunk in index.search(query, per_query, max_age_days):
+            key = (chunk["article"], chunk["text"][:80])
+            if key not in seen:
+                seen.add(key)
+                selected.append({"query": query, **chunk})
+    selected.sort(key=lambda chunk: -chunk["score"])
+
+    pinned = []
+    if include_articles:
+        # The article's best matching chunk, else its first one (the lead, with the title)
+        best = {}
+        for chunk in selected:
+            best.setdefault(chunk["article"], chunk)
+        for chunk in index.chunks:
+            best.setdefault(chunk["article"], {"query": "latest search", **chunk, "score": 0.0})
+        pinned = [best[key] for key in dict.fromkeys(include_articles) if key in best][:k // 2]
+    pinned_keys = {(chunk["article"], chunk["text"][:80]) for chunk in pinned}
+    rest = [chunk for chunk in selected if (chunk["article"], chunk["text"][:80]) not in pinned_keys]
+    return [{key: chunk[key] for key in ("query", "title", "date", "source", "link", "text", "score")}
+            for chunk in (pinned + rest)[:k]]
@@ -0,0 +1,26 @@
+from langchain_core.tools import tool
+
+from utils.news_index import retrieve_context
+from utils.serialization import dumps
+
+
+@tool
+def news_retrieval_tool(ticker: str, query: str, k: int = 6) -> str:
+    """Searches the locally stored news and filing text of a stock ticker for a specific question.
+
+    Every article fetched by the news search tools is kept in a local index, so this reaches far more
+    articles than a single search returns - use it for targeted questions such as "guidance changes",
+    "supply chain issues" or "analyst downgrades".
+
+    Args:
+        ticker: The stock ticker symbol (e.g., "AAPL", "TSLA", "GOOGL")
+        query: What to look for in the stored articles
+        k: Number of text chunks to return
+
+    Returns:
+        JSON string with the most relevant text chunks (title, date, source, link, text, score)
+    """
+    chunks = retrieve_context(ticker.upper(), [query], k=k, per_query=k)
+    if not chunks:
+        return dumps({"error": f"No stored news for {ticker} matches '{query}' - use a news search tool first"})
+    return dumps({"ticker": ticker.upper(), "query": query, "chunks": chunks})
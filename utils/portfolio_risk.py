@@ -0,0 +1,164 @@
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.fmp_bulk import bulk_update_prices
+from utils.price_store import aligned_closes, last_completed_session, load_prices
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Portfolio risk from one aligned (holdings x days) returns matrix out of the local price store: the
+# covariance matrix, portfolio volatility, marginal / component risk contributions and drawdowns are
+# matrix operations over all holdings at once, so a 500-name portfolio costs a few matrix products
+# instead of 500 single-ticker runs.
+PORTFOLIO_LOOKBACK_DAYS = int(os.getenv("PORTFOLIO_LOOKBACK_DAYS", "252"))
+# Holdings with fewer returns than this share of the window are left out of the risk model
+PORTFOLIO_MIN_COVERAGE = float(os.getenv("PORTFOLIO_MIN_COVERAGE", "0.8"))
+TRADING_DAYS = 252
+
+
+def refresh_prices(symbols: list, lookback_days: int = 400) -> list:
+    """Updates the stored history of symbols whose last bar is older than the last completed session
+
+    Returns:
+        The symbols that were refreshed
+    """
+    expected = np.datetime64(last_completed_session())
+    stale = []
+    for symbol in symbols:
+        bars = load_prices(symbol)
+        if bars is None or not len(bars["date"]) or bars["date"][-1] < expected:
+            stale.append(symbol)
+    if stale:
+        # One bulk end-of-day request per missing session, per-symbol downloads only for new symbols
+        bulk_update_prices(stale, history_days=lookback_days)
+    return stale
+
+
+def normalize_weights(holdings: dict) -> dict:
+    """Weights (or position values) per symbol scaled to sum to 1 in gross exposure"""
+    weights = {symbol.upper(): float(weight) for symbol, weight in holdings.items() if weight}
+    gross = sum(abs(weight) for weight in weights.values())
+    return {symbol: weight / gross for symbol, weight in weights.items()} if gross else {}
+
+
+def returns_matrix(symbols: list, lookback: int = PORTFOLIO_LOOKBACK_DAYS):
+    """Aligned daily simple returns of the stored prices
+
+    Returns:
+        (dates, symbols, returns) with returns of shape (len(symbols), lookback) and NaN where a
+        symbol has no return for a date
+    """
+    dates, symbols, close = aligned_closes(symbols, lookback + 1)
+    if not symbols:
+        return dates, symbols, np.empty((0, 0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = close[:, 1:] / close[:, :-1] - 1
+    return dates[1:], symbols, returns
+
+
+def max_drawdowns(returns: np.ndarray):
+    """Maximum and current drawdown of every row of a daily returns matrix"""
+    equity = np.cumprod(1 + np.nan_to_num(returns), axis=1)
+    drawdown = equity / np.maximum.accumulate(equity, axis=1) - 1
+    return drawdown.min(axis=1), drawdown[:, -1]
+
+
+def _round(value, digits: int = 4):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def portfolio_risk(holdings: dict, lookback: int = PORTFOLIO_LOOKBACK_DAYS, top: int = 10) -> dict:
+    """Risk model of a portfolio from locally stored daily prices
+
+    Args:
+        holdings: {symbol: weight or position value}; negative values are short positions
+        lookback: trading days of history
+        top: number of holdings / pairs listed in the summary sections
+
+    Returns:
+        Compact risk summary: portfolio volatility, VaR / CVaR, drawdowns, concentration, the largest
+        risk contributors and the most correlated pairs
+    """
+    weights = normalize_weights(holdings)
+    dates, symbols, returns = returns_matrix(list(weights), lookback)
+    missing = sorted(set(weights) - set(symbols))
+    if not symbols:
+        return {"error": "No stored price history for the holdings", "missing": missing}
+
+    coverage = (~np.isnan(returns)).mean(axis=1)
+    keep = coverage >= PORTFOLIO_MIN_COVERAGE
+    missing += [symbol for symbol, kept in zip(symbols, keep) if not kept]
+    symbols = [symbol for symbol, kept in zip(symbols, keep) if kept]
+    if not symbols:
+        return {"error": "Not enough stored price history for any holding", "missing": missing}
+    returns = returns[keep]
+    w = np.array([weights[symbol] for symbol in symbols])
+
+    # Demeaned returns with gaps treated as "no information" (zero deviation)
+    means = np.nanmean(returns, axis=1, keepdims=True)
+    centered = np.nan_to_num(returns - means)
+    cov = centered @ centered.T / (returns.shape[1] - 1) * TRADING_DAYS
+    vols = np.sqrt(np.diag(cov))
+
+    portfolio_var = w @ cov @ w
+    portfolio_vol = np.sqrt(portfolio_var)
+    marginal = cov @ w / portfolio_vol              # d(vol) / d(weight)
+    component = w * marginal                        # sums to portfolio_vol
+    share = component / portfolio_vol
+    betas = cov @ w / portfolio_var                 # holding beta to the portfolio
+
+    daily = w @ np.nan_to_num(returns)
+    holding_dd, _ = max_drawdowns(returns)
+    portfolio_dd, current_dd = max_drawdowns(daily[None, :])
+    var_95 = -np.percentile(daily, 5)
+    cvar_95 = -daily[daily <= -var_95].mean()
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / np.outer(vols, vols)
+    upper = np.triu_indices(len(symbols), k=1)
+    pair_corr = corr[upper]
+    pairs = np.argsort(-np.nan_to_num(pair_corr, nan=-2.0))[:top]
+    contributors = np.argsort(-component)[:top]
+    diversifiers = np.argsort(component)[:min(top, len(symbols))]
+
+    return {
+        "period": {"start": str(dates[0]), "end": str(dates[-1]), "days": len(dates)},
+        "holdings": len(symbols),
+        "missing": missing,
+        "gross_exposure_modeled": _round(np.abs(w).sum()),
+        "net_exposure_modeled": _round(w.sum()),
+        "portfolio": {
+            "annualized_volatility": _round(portfolio_vol),
+            "annualized_return": _round(daily.mean() * TRADING_DAYS),
+            "daily_var_95": _round(var_95),
+            "daily_cvar_95": _round(cvar_95),
+            "max_drawdown": _round(portfolio_dd[0]),
+            "current_drawdown": _round(current_dd[0]),
+            "worst_day": _round(daily.min()),
+            "diversification_ratio": _round(np.abs(w) @ vols / portfolio_vol),
+        },
+        "concentration": {
+            "largest_weight": _round(np.abs(w).max()),
+            "effective_holdings": _round(1 / np.sum(w ** 2), 1),
+            "top_10_risk_share": _round(np.sort(share)[::-1][:10].sum()),
+            "average_pair_correlation": _round(np.nanmean(pair_corr)) if len(pair_corr) else None,
+        },
+        "top_risk_contributors": [
+            {"symbol": symbols[i], "weight": _round(w[i]), "volatility": _round(vols[i]),
+             "beta_to_portfolio": _round(betas[i]), "risk_share": _round(share[i]),
+             "max_drawdown": _round(holding_dd[i])}
+            for i in contributors
+        ],
+        "top_diversifiers": [
+            {"symbol": symbols[i], "weight": _round(w[i]), "risk_share": _round(share[i])}
+            for i in diversifiers if share[i] < w[i]
+        ],
+        "most_correlated_pairs": [
+            {"pair": [symbols[upper[0][i]], symbols[upper[1][i]]], "correlation": _round(pair_corr[i], 3)}
+            for i in pairs
+        ],
+    }
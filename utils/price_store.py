@@ -0,0 +1,205 @@
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.fmp_client import fmp_get
+from utils.shared_cache import shared_aligned, shared_prices
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Local daily price history, one compressed .npz file per symbol. Downstream stages (market regime,
+# backtests, portfolio risk, ...) read from here instead of calling historical-price-full again.
+PRICE_STORE_DIR = os.getenv("PRICE_STORE_DIR", os.path.join(".cache", "prices"))
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(symbol: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(symbol, threading.Lock())
+
+
+def _path(symbol: str) -> str:
+    return os.path.join(PRICE_STORE_DIR, f"{symbol.upper()}.npz")
+
+
+def bars_from_fmp(historical: list) -> dict:
+    """Converts FMP historical-price-full records into column arrays sorted by date (oldest first)"""
+    records = sorted((r for r in historical or [] if r.get("date")), key=lambda r: r["date"])
+    bars = {"date": np.array([r["date"][:10] for r in records], dtype="datetime64[D]")}
+    for field in PRICE_FIELDS:
+        bars[field] = np.array([r.get(field) if r.get(field) is not None else np.nan for r in records], dtype=float)
+    return bars
+
+
+def load_prices(symbol: str) -> dict:
+    """Returns the stored bars for a symbol as column arrays (plus the "complete" flag), or None if nothing
+    is stored
+
+    While the host's shared snapshot (utils.shared_cache) holds the current file, the arrays are read-only
+    views of it instead of a private copy.
+    """
+    path = _path(symbol)
+    shared = shared_prices(symbol, path)
+    if shared is not None:
+        return shared
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as stored:
+        return {key: stored[key] for key in stored.files}
+
+
+def save_prices(symbol: str, bars: dict):
+    os.makedirs(PRICE_STORE_DIR, exist_ok=True)
+    tmp_path = f"{_path(symbol)}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp_path, **bars)
+    os.replace(tmp_path, _path(symbol))
+
+
+def append_prices(symbol: str, new_bars: dict, complete: bool = False) -> dict:
+    """Merges new bars into the stored history (new values win on duplicate dates)
+
+    Only bars of completed sessions are persisted - today's bar is still forming. The file is left
+    untouched when the merge changes nothing, so its mtime (and the shared snapshot built from it) stays
+    valid across repeated requests.
+
+    Args:
+        symbol: the symbol the bars belong to
+        new_bars: column arrays (bars_from_fmp)
+        complete: the bars came from a request reaching back to the start of the long technical window,
+            so the store holds everything FMP has for that window even when it starts later (recent listing)
+
+    Returns:
+        The merged columns, including bars of the current session, with the "complete" flag
+    """
+    with _lock_for(symbol.upper()):
+        stored = load_prices(symbol)
+        if stored is not None and len(stored["date"]):
+            keep = ~np.isin(stored["date"], new_bars["date"])
+            merged = {key: np.concatenate([stored[key][keep], new_bars[key]]) for key in ("date",) + PRICE_FIELDS}
+            complete = complete or bool(stored.get("complete", False))
+        else:
+            merged = {key: new_bars[key] for key in ("date",) + PRICE_FIELDS}
+        order = np.argsort(merged["date"], kind="stable")
+        merged = {key: values[order] for key, values in merged.items()}
+        merged["complete"] = np.array(complete)
+
+        settled = merged["date"] <= np.datetime64(last_completed_session())
+        persisted = {key: merged[key][settled] for key in ("date",) + PRICE_FIELDS}
+        persisted["complete"] = merged["complete"]
+        if not _unchanged(stored, persisted):
+            save_prices(symbol, persisted)
+        return merged
+
+
+def _unchanged(stored: dict, bars: dict) -> bool:
+    """Whether writing bars would leave the stored history as it is"""
+    if stored is None or bool(stored.get("complete", False)) != bool(bars["complete"]):
+        return False
+    if not np.array_equal(stored["date"], bars["date"]):
+        return False
+    return all(np.array_equal(stored[field], bars[field], equal_nan=True) for field in PRICE_FIELDS)
+
+
+def last_completed_session(today: date = None) -> date:
+    """The most recent weekday before today - the latest bar a daily refresh can expect (holidays aside)"""
+    day = (today or date.today()) - timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+def update_prices(symbol: str, lookback_days: int = 400) -> dict:
+    """Brings the stored history up to date, only requesting days after the last stored bar
+
+    Args:
+        symbol: the ticker to update
+        lookback_days: history to download when nothing is stored yet
+
+    Returns:
+        The full stored history after the update
+    """
+    stored = load_prices(symbol)
+    today = date.today()
+    if stored is not None and len(stored["date"]):
+        last = stored["date"][-1].astype(object)
+        if last >= last_completed_session(today):
+            return stored
+        start = last + timedelta(days=1)
+    else:
+        start = today - timedelta(days=lookback_days)
+
+    data = fmp_get("historical-price-full", symbol, **{"from": start.isoformat(), "to": today.isoformat()})
+    historical = data.get("historical", []) if isinstance(data, dict) else []
+    if not historical:
+        return stored
+    return append_prices(symbol, bars_from_fmp(historical))
+
+
+def backfill_prices(symbol: str, history_days: int) -> dict:
+    """Extends the stored history back to history_days ago (e.g. years of bars for backtests) and
+    brings it up to date
+
+    Returns:
+        The full stored history after the backfill
+    """
+    stored = update_prices(symbol, history_days)
+    target = date.today() - timedelta(days=history_days)
+    if stored is None or not len(stored["date"]) or stored["date"][0].astype(object) <= target + timedelta(days=7):
+        return stored
+
+    end = stored["date"][0].astype(object) - timedelta(days=1)
+    data = fmp_get("historical-price-full", symbol, **{"from": target.isoformat(), "to": end.isoformat()})
+    historical = data.get("historical", []) if isinstance(data, dict) else []
+    if not historical:
+        return stored
+    return append_prices(symbol, bars_from_fmp(historical))
+
+
+def list_symbols() -> list:
+    """All symbols that have stored history"""
+    if not os.path.isdir(PRICE_STORE_DIR):
+        return []
+    return sorted(name[:-4] for name in os.listdir(PRICE_STORE_DIR) if name.endswith(".npz") and ".tmp" not in name)
+
+
+def aligned_closes(symbols: list, lookback: int = None, field: str = "close"):
+    """Aligns stored prices of many symbols onto a common date axis
+
+    Args:
+        symbols: tickers to align (symbols without stored history are skipped)
+        lookback: keep only the most recent N dates
+        field: price field to align
+
+    Returns:
+        (dates, symbols, matrix) where matrix has shape (len(symbols), len(dates)) and NaN where a
+        symbol has no bar for a date
+    """
+    shared = shared_aligned(symbols, [_path(symbol) for symbol in symbols], lookback, field)
+    if shared is not None:
+        return shared
+
+    histories = {}
+    for symbol in symbols:
+        bars = load_prices(symbol)
+        if bars is not None and len(bars["date"]):
+            histories[symbol] = bars
+    if not histories:
+        return np.array([], dtype="datetime64[D]"), [], np.empty((0, 0))
+
+    dates = np.unique(np.concatenate([bars["date"] for bars in histories.values()]))
+    if lookback:
+        dates = dates[-lookback:]
+
+    matrix = np.full((len(histories), len(dates)), np.nan)
+    for row, bars in enumerate(histories.values()):
+        positions = np.searchsorted(dates, bars["date"])
+        valid = (positions < len(dates)) & (dates[np.minimum(positions, len(dates) - 1)] == bars["date"])
+        matrix[row, positions[valid]] = bars[field][valid]
+    return dates, list(histories), matrix
@@ -0,0 +1,57 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+from utils.fmp_client import fmp_get
+from utils.serialization import dumps, loads
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Company profiles, one JSON file per symbol. Written by the bulk profile refresh and by single-ticker
+# fetches, read by the profile and fundamental tools before they call FMP - independent of the opt-in
+# FMP response cache, so a bulk refresh always saves the per-ticker profile requests.
+PROFILE_STORE_DIR = os.getenv("PROFILE_STORE_DIR", os.path.join(".cache", "profiles"))
+# Seconds a stored profile is reused (its price and market cap are as of the fetch), 0 disables reuse
+PROFILE_TTL = float(os.getenv("PROFILE_TTL", str(12 * 3600)))
+
+
+def _path(symbol: str) -> str:
+    return os.path.join(PROFILE_STORE_DIR, f"{symbol.upper()}.json")
+
+
+def put_profile(symbol: str, record: dict):
+    """Stores the profile record of a symbol (one item of FMP's "profile" response)"""
+    path = _path(symbol)
+    os.makedirs(PROFILE_STORE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(dumps(record))
+    os.replace(tmp_path, path)
+
+
+def get_profile(symbol: str) -> list:
+    """The stored profile in the shape of FMP's "profile" response ([record]), or None when missing
+    or older than PROFILE_TTL"""
+    if PROFILE_TTL <= 0:
+        return None
+    path = _path(symbol)
+    try:
+        if time.time() - os.path.getmtime(path) > PROFILE_TTL:
+            return None
+        with open(path, "rb") as f:
+            return [loads(f.read())]
+    except (OSError, ValueError):
+        return None
+
+
+def fetch_profile(symbol: str) -> list:
+    """The company profile from the store, else from FMP (and stored for the next request)"""
+    data = get_profile(symbol)
+    if data is not None:
+        return data
+    data = fmp_get("profile", symbol)
+    if isinstance(data, list) and data and isinstance(data[0], dict) and data[0].get("symbol"):
+        put_profile(symbol, data[0])
+    return data
@@ -0,0 +1,75 @@
+import numbers
+
+# Structured diff of analyst reports. Reports are nested dicts produced by an LLM, so free-text
+# fields differ on every run even when the assessment is the same. Only changes in the fields below
+# count as material; text changes are still listed so the LLM sees them alongside material ones.
+
+# Categorical fields: any change is material
+MATERIAL_CATEGORIES = {
+    "technical_analysis.recommendation",
+    "technical_analysis.confidence",
+    "technical_analysis.risk_level",
+    "technical_analysis.price_target",
+    "market_regime",
+}
+# Numeric fields: material once they move by at least this much
+MATERIAL_THRESHOLDS = {
+    "fundamental_analysis.growth_score.score": 1,
+    "fundamental_analysis.risk_score.score": 1,
+}
+
+
+def flatten(report, prefix: str = "") -> dict:
+    """Nested dict -> {"dotted.path": leaf value}"""
+    if not isinstance(report, dict):
+        return {prefix: report}
+    flat = {}
+    for key, value in report.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict) and value:
+            flat.update(flatten(value, path))
+        else:
+            flat[path] = value
+    return flat
+
+
+def _is_material(path: str, before, after) -> bool:
+    if path in MATERIAL_CATEGORIES:
+        return True
+    threshold = MATERIAL_THRESHOLDS.get(path)
+    if threshold is None:
+        return False
+    if isinstance(before, numbers.Number) and isinstance(after, numbers.Number):
+        return abs(after - before) >= threshold
+    return True
+
+
+def diff_reports(previous: dict, current: dict) -> dict:
+    """Field-by-field changes between two report sets
+
+    Args:
+        previous: the inputs of the last synthesis, e.g. {"fundamental_analysis": {...}, "technical_analysis": {...}}
+        current: the same structure for this run
+
+    Returns:
+        {"dotted.path": {"before", "after", "material"}} for every changed field. List fields report
+        "added" / "removed" items instead of before / after.
+    """
+    before_flat = flatten(previous or {})
+    after_flat = flatten(current or {})
+    changes = {}
+    for path in sorted(before_flat.keys() | after_flat.keys()):
+        before, after = before_flat.get(path), after_flat.get(path)
+        if before == after:
+            continue
+        if isinstance(before, list) and isinstance(after, list):
+            change = {"added": [i for i in after if i not in before], "removed": [i for i in before if i not in after]}
+        else:
+            change = {"before": before, "after": after}
+        change["material"] = _is_material(path, before, after)
+        changes[path] = change
+    return changes
+
+
+def has_material_changes(changes: dict) -> bool:
+    return any(change["material"] for change in changes.values())
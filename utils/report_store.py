@@ -0,0 +1,79 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+from utils.serialization import dumps, loads
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Finished analyst reports, keyed by (stage, ticker). Each entry carries a validity key - today's
+# date, or a data fingerprint - and is only reused while that key still matches and the entry is
+# younger than REPORT_TTL. Filled by interactive runs and by the pre-market warmer.
+REPORT_STORE_DIR = os.getenv("REPORT_STORE_DIR", os.path.join(".cache", "reports"))
+# Seconds a report may be reused, 0 disables reuse
+REPORT_TTL = float(os.getenv("REPORT_TTL", str(18 * 3600)))
+
+# (stage, ticker) -> (file mtime, entry)
+_reports = {}
+_lock = threading.Lock()
+
+
+def _path(stage: str, ticker: str) -> str:
+    return os.path.join(REPORT_STORE_DIR, stage, f"{ticker.upper()}.json")
+
+
+def put_report(stage: str, ticker: str, report, key: str = ""):
+    """Stores the latest report of a stage for a ticker
+
+    Args:
+        stage: the producing stage, e.g. "technical_analyst"
+        ticker: the analyzed ticker
+        report: JSON-serializable report
+        key: validity key the report was produced under (date, data fingerprint, ...)
+    """
+    entry = {"created_at": time.time(), "key": key, "report": report}
+    path = _path(stage, ticker)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(dumps(entry))
+    os.replace(tmp_path, path)
+
+
+def _entry(stage: str, ticker: str) -> dict:
+    # The file is the source of truth - the in-memory copy is reused only while the file has not been
+    # replaced since (e.g. by the warmer or another worker process)
+    path = _path(stage, ticker)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _lock:
+        cached = _reports.get((stage, ticker.upper()))
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, "rb") as f:
+            entry = loads(f.read())
+    except (OSError, ValueError):
+        return None
+    with _lock:
+        _reports[(stage, ticker.upper())] = (mtime, entry)
+    return entry
+
+
+def get_report(stage: str, ticker: str, key: str = ""):
+    """Returns the stored report when it was produced under the same key and is still fresh, else None"""
+    if REPORT_TTL <= 0:
+        return None
+    entry = _entry(stage, ticker)
+    if not entry or entry.get("key") != key or time.time() - entry.get("created_at", 0) > REPORT_TTL:
+        return None
+    return entry["report"]
+
+
+def get_report_entry(stage: str, ticker: str) -> dict:
+    """The raw stored entry ({"created_at", "key", "report"}) regardless of freshness, or None"""
+    return _entry(stage, ticker)
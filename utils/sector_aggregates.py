@@ -0,0 +1,194 @@
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.blob_store import get_blob
+from utils.fmp_bulk import bulk_profiles
+from utils.market_regime import sector_regime
+from utils.portfolio_risk import max_drawdowns, refresh_prices, returns_matrix
+from utils.sector_peer_index import PEER_METRICS, load_peer_index
+from utils.serialization import dumps
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Shared context of a sector report: constituents are resolved from the peer index (sector / industry
+# and market cap of the screener profiles), their data is fetched in a few bulk requests, and the sector
+# aggregates - group medians, equal-weight sector returns, breadth, dispersion and correlation - are
+# computed once over one aligned returns matrix. Every per-ticker branch receives the same context.
+SECTOR_MAX_TICKERS = int(os.getenv("SECTOR_MAX_TICKERS", "8"))
+SECTOR_LOOKBACK_DAYS = 126
+WINDOWS = {"1m": 21, "3m": 63, "6m": 126}
+
+
+def resolve_group(name: str, index: dict = None):
+    """Matches a sector or industry name against the peer index ("semiconductor" -> Semiconductors)
+
+    Returns:
+        ("sector" | "industry", exact group name), or (None, None) when nothing matches
+    """
+    index = index or load_peer_index()
+    if not index or not name:
+        return None, None
+    groups = {}
+    for record in index["symbols"].values():
+        for kind in ("industry", "sector"):
+            if record.get(kind):
+                groups.setdefault((kind, record[kind]), None)
+    wanted = name.strip().casefold()
+    # Exact names first, then partial matches - industries before sectors, they are the narrower group
+    for match in (lambda group: group.casefold() == wanted,
+                  lambda group: wanted in group.casefold() or group.casefold().rstrip("s") in wanted):
+        for kind in ("industry", "sector"):
+            for group_kind, group in groups:
+                if group_kind == kind and match(group):
+                    return kind, group
+    return None, None
+
+
+def sector_constituents(kind: str, group: str, max_tickers: int = SECTOR_MAX_TICKERS, index: dict = None) -> list:
+    """The group's members in the peer index, largest market cap first"""
+    index = index or load_peer_index()
+    members = [(symbol, record.get("market_cap") or 0) for symbol, record in index["symbols"].items()
+               if record.get(kind) == group]
+    members.sort(key=lambda member: (-member[1], member[0]))
+    return [symbol for symbol, _ in members[:max_tickers]]
+
+
+def prefetch_constituents(symbols: list) -> dict:
+    """Fetches the constituents' profiles and price history in bulk requests (fills the FMP cache and
+    the price store for the per-ticker branches)
+
+    Returns:
+        {symbol: profile record} for the symbols with a profile
+    """
+    try:
+        profiles = bulk_profiles(symbols)
+    except Exception as e:
+        print(f"⚠️ Could not prefetch profiles: {e}")
+        profiles = {}
+    refresh_prices(symbols)
+    return profiles
+
+
+def _round(value, digits: int = 4):
+    value = float(value)
+    return None if not np.isfinite(value) else round(value, digits)
+
+
+def _group_medians(kind: str, group: str, index: dict) -> dict:
+    medians = {}
+    for metric in PEER_METRICS:
+        values = index["arrays"].get(f"{kind}:{group}|{metric}")
+        if values is not None and len(values):
+            medians[metric] = {"median": _round(values[len(values) // 2]), "peers": int(len(values))}
+    return medians
+
+
+def price_aggregates(symbols: list, lookback: int = SECTOR_LOOKBACK_DAYS) -> dict:
+    """Equal-weight sector returns and each constituent's performance relative to them
+
+    All statistics come from one aligned (constituents x days) returns matrix.
+    """
+    dates, symbols, returns = returns_matrix(symbols, lookback)
+    if not symbols or not returns.shape[1]:
+        return {"error": "No stored price history for the constituents"}
+
+    filled = np.nan_to_num(returns)
+    sector_daily = np.nan_to_num(np.nanmean(returns, axis=0))
+    stock_returns, sector_returns = {}, {}
+    for label, days in WINDOWS.items():
+        days = min(days, returns.shape[1])
+        stock_returns[label] = np.prod(1 + filled[:, -days:], axis=1) - 1
+        sector_returns[label] = float(np.prod(1 + sector_daily[-days:]) - 1)
+
+    equity = np.cumprod(1 + filled, axis=1)
+    above_sma_50 = equity[:, -1] > equity[:, -50:].mean(axis=1)
+    vols = filled[:, -63:].std(axis=1) * np.sqrt(252)
+    drawdowns, current_drawdowns = max_drawdowns(returns)
+
+    centered = filled - filled.mean(axis=1, keepdims=True)
+    cov = centered @ centered.T
+    norms = np.sqrt(np.diag(cov))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / np.outer(norms, norms)
+    upper = np.triu_indices(len(symbols), k=1)
+
+    return {
+        "period": {"start": str(dates[0]), "end": str(dates[-1]), "days": len(dates)},
+        "equal_weight_return": {label: _round(value) for label, value in sector_returns.items()},
+        "breadth_above_sma_50": _round(above_sma_50.mean(), 2),
+        "dispersion_3m": _round(np.std(stock_returns["3m"])),
+        "average_pair_correlation": _round(np.nanmean(corr[upper])) if len(upper[0]) else None,
+        "constituents": {
+            symbol: {
+                **{f"return_{label}": _round(values[i]) for label, values in stock_returns.items()},
+                **{f"relative_{label}": _round(values[i] - sector_returns[label]) for label, values in stock_returns.items()},
+                "above_sma_50": bool(above_sma_50[i]),
+                "volatility_3m": _round(vols[i]),
+                "max_drawdown": _round(drawdowns[i]),
+                "current_drawdown": _round(current_drawdowns[i]),
+            }
+            for i, symbol in enumerate(symbols)
+        },
+    }
+
+
+def build_sector_context(name: str, max_tickers: int = SECTOR_MAX_TICKERS, prefetch: bool = True) -> dict:
+    """Resolves a sector / industry and computes its shared aggregates once
+
+    Args:
+        name: sector or industry name, e.g. "Semiconductors" or "technology"
+        max_tickers: number of constituents analyzed (largest market caps)
+        prefetch: fetch the constituents' profiles and prices first
+
+    Returns:
+        Sector context dict (kind, group, constituents, fundamentals, prices, regime), or an error dict
+    """
+    index = load_peer_index()
+    if not index:
+        return {"error": "Sector peer index has not been built - run python -m utils.sector_peer_index"}
+    kind, group = resolve_group(name, index)
+    if not group:
+        return {"error": f"No sector or industry matches '{name}'"}
+    symbols = sector_constituents(kind, group, max_tickers, index)
+    profiles = prefetch_constituents(symbols) if prefetch else {}
+
+    sectors = {index["symbols"][symbol].get("sector") for symbol in symbols}
+    regime = sector_regime(group if kind == "sector" else next(iter(sectors))) if len(sectors) == 1 else None
+    return {
+        "kind": kind,
+        "group": group,
+        "constituents": symbols,
+        "members_in_index": sum(1 for record in index["symbols"].values() if record.get(kind) == group),
+        "names": {symbol: profiles[symbol].get("companyName") for symbol in symbols if symbol in profiles},
+        "fundamental_medians": _group_medians(kind, group, index),
+        "constituent_metrics": {symbol: index["symbols"][symbol].get("metrics", {}) for symbol in symbols},
+        "prices": price_aggregates(symbols),
+        "sector_etf": regime,
+    }
+
+
+def sector_context_text(ref: str, ticker: str) -> str:
+    """The shared sector context as a prompt block for one constituent: the sector aggregates plus the
+    constituent's own rows (the other constituents' rows are left out). Empty without a sector context."""
+    context = get_blob(ref) if ref else None
+    if not isinstance(context, dict) or "error" in context:
+        return ""
+    prices = context.get("prices", {})
+    data = dumps({
+        "group": f"{context['kind']} ({context['group']})",
+        "constituents": context["constituents"],
+        "fundamental_medians": context["fundamental_medians"],
+        "sector_prices": {key: value for key, value in prices.items() if key != "constituents"},
+        "sector_etf": context.get("sector_etf"),
+        "this_stock": {
+            "metrics": context["constituent_metrics"].get(ticker, {}),
+            "prices": prices.get("constituents", {}).get(ticker),
+        },
+    })
+    return f"""
+    Sector context (shared by all analyzed constituents - judge the stock relative to its sector):
+    {data}
+    """
@@ -0,0 +1,222 @@
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.fmp_client import fmp_get
+from utils.fundamentals_model import build_periods, compute_metrics
+from utils.serialization import dumps_bytes, loads
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Precomputed sector / industry peer index. Built in bulk by an offline job, persisted, and used by
+# the fundamental analyst to place a ticker among its peers without fetching the peers per request.
+# Each (group, metric) pair is a sorted array, so a percentile rank is one binary search.
+PEER_INDEX_PATH = os.getenv("PEER_INDEX_PATH", os.path.join(".cache", "peer_index.npz"))
+
+PEER_METRICS = (
+    "pe_ratio",
+    "ev_to_ebitda",
+    "price_to_sales",
+    "gross_margin",
+    "operating_margin",
+    "net_margin",
+    "revenue_growth",
+    "eps_growth",
+    "return_on_equity",
+    "debt_to_equity",
+)
+# Valuation multiples are only meaningful when positive (a negative P/E is a loss, not a cheap stock) -
+# non-positive values are left out of the peer arrays and not ranked
+VALUATION_MULTIPLES = ("pe_ratio", "ev_to_ebitda", "price_to_sales")
+# Industry groups smaller than this fall back to the sector comparison only
+MIN_PEERS = 5
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def _group_key(kind: str, name: str) -> str:
+    return f"{kind}:{name}"
+
+
+def build_peer_index(universe: list) -> dict:
+    """Builds the peer index from per-ticker records
+
+    Args:
+        universe: list of {"symbol", "sector", "industry", "market_cap", "metrics": {metric: value}} records
+
+    Returns:
+        Dict with "arrays" ({group|metric: sorted array}), "symbols" (per-ticker records) and "built_at"
+    """
+    grouped = defaultdict(list)
+    symbols = {}
+    for record in universe:
+        symbol = record.get("symbol")
+        metrics = record.get("metrics") or {}
+        if not symbol:
+            continue
+        symbols[symbol] = {"sector": record.get("sector"), "industry": record.get("industry"),
+                           "market_cap": record.get("market_cap"),
+                           "metrics": {m: metrics.get(m) for m in PEER_METRICS if metrics.get(m) is not None}}
+        for kind in ("sector", "industry"):
+            if record.get(kind):
+                grouped[_group_key(kind, record[kind])].append(metrics)
+
+    arrays = {}
+    for group, members in grouped.items():
+        for metric in PEER_METRICS:
+            values = np.array([m.get(metric) for m in members if m.get(metric) is not None], dtype=float)
+            values = values[np.isfinite(values)]
+            if metric in VALUATION_MULTIPLES:
+                values = values[values > 0]
+            if len(values):
+                arrays[f"{group}|{metric}"] = np.sort(values)
+
+    return {"arrays": arrays, "symbols": symbols, "built_at": datetime.now().isoformat(timespec="seconds")}
+
+
+def save_peer_index(index: dict, path: str = PEER_INDEX_PATH):
+    """Persists the index as one .npz file (sorted arrays plus the ticker records as JSON bytes), written
+    to a temp file and swapped in, so a running server never reads a half-written rebuild"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    meta = dumps_bytes({"symbols": index["symbols"], "built_at": index["built_at"]})
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp_path, **index["arrays"], _meta=np.frombuffer(meta, dtype=np.uint8))
+    os.replace(tmp_path, path)
+
+
+def load_peer_index(path: str = PEER_INDEX_PATH) -> dict:
+    """Loads the persisted index, again whenever a rebuild replaced the files (None when it has not
+    been built yet)"""
+    global _index, _index_version
+    with _index_lock:
+        try:
+            version = os.stat(path).st_mtime_ns
+        except OSError:
+            return _index
+        if version != _index_version:
+            with np.load(path) as stored:
+                if "_meta" in stored.files:
+                    meta = loads(stored["_meta"].tobytes())
+                else:
+                    # Built before the ticker records moved into the .npz
+                    with open(f"{path}.json", "rb") as f:
+                        meta = loads(f.read())
+                _index = {"arrays": {key: stored[key] for key in stored.files if key != "_meta"}, **meta}
+            _index_version = version
+        return _index
+
+
+def percentile_rank(sorted_values, value: float) -> float:
+    """Percentile (0-100) of value within sorted_values - mid-rank for ties, O(log n)"""
+    n = len(sorted_values)
+    if not n:
+        return None
+    below = np.searchsorted(sorted_values, value, side="left")
+    at_or_below = np.searchsorted(sorted_values, value, side="right")
+    return round(float((below + at_or_below) / 2 / n * 100), 1)
+
+
+def get_peer_context(ticker: str, sector: str = None, industry: str = None, metrics: dict = None,
+                     index: dict = None) -> dict:
+    """Ranks a ticker's metrics among its sector and industry peers
+
+    Args:
+        ticker: the ticker to rank
+        sector / industry: the ticker's groups (looked up in the index when omitted)
+        metrics: the ticker's metric values (looked up in the index when omitted)
+        index: a loaded peer index (defaults to the persisted one)
+
+    Returns:
+        Compact dict {group: {metric: {"value", "percentile", "peer_median", "peers"}}}, or an
+        "error" entry when no index or no peer data is available
+    """
+    index = index or load_peer_index()
+    if not index:
+        return {"error": "Sector peer index has not been built"}
+
+    known = index["symbols"].get(ticker.upper(), {})
+    sector = sector or known.get("sector")
+    industry = industry or known.get("industry")
+    metrics = metrics or known.get("metrics") or {}
+
+    context = {}
+    for kind, name in (("industry", industry), ("sector", sector)):
+        if not name:
+            continue
+        ranks = {}
+        for metric in PEER_METRICS:
+            value = metrics.get(metric)
+            peers = index["arrays"].get(f"{_group_key(kind, name)}|{metric}")
+            if value is None or peers is None or len(peers) < MIN_PEERS or not np.isfinite(value):
+                continue
+            if metric in VALUATION_MULTIPLES and value <= 0:
+                continue
+            ranks[metric] = {
+                "value": round(float(value), 4),
+                "percentile": percentile_rank(peers, value),
+                "peer_median": round(float(peers[len(peers) // 2]), 4),
+                "peers": int(len(peers)),
+            }
+        if ranks:
+            context[f"{kind} ({name})"] = ranks
+
+    if not context:
+        return {"error": f"No peer data for {ticker} (sector: {sector}, industry: {industry})"}
+    context["index_built_at"] = index.get("built_at")
+    return context
+
+
+def latest_metrics(periods_metrics: dict) -> dict:
+    """Latest-period values of the peer metrics from utils.fundamentals_model.compute_metrics output"""
+    latest = {}
+    for metric in PEER_METRICS:
+        values = periods_metrics.get(metric)
+        if values is not None and len(values) and np.isfinite(values[0]):
+            latest[metric] = float(values[0])
+    return latest
+
+
+def fetch_universe(min_market_cap: float = 2e9, limit: int = 3000) -> list:
+    """Lists the index universe with sector / industry / market cap from one screener request"""
+    rows = fmp_get("stock-screener", marketCapMoreThan=int(min_market_cap), isActivelyTrading="true",
+                   isEtf="false", limit=limit)
+    return [row for row in rows or [] if row.get("sector") and row.get("symbol")]
+
+
+def collect_universe_metrics(universe: list) -> list:
+    """Computes the peer metrics for every ticker in the universe from its annual statements"""
+    records = []
+    for number, row in enumerate(universe, start=1):
+        symbol = row["symbol"]
+        try:
+            statements = [fmp_get(endpoint, symbol, limit=2) for endpoint in
+                          ("income-statement", "balance-sheet-statement", "cash-flow-statement")]
+            periods = build_periods(*statements)
+            metrics = latest_metrics(compute_metrics(periods, market_cap=row.get("marketCap")))
+        except Exception as e:
+            print(f"⚠️ Skipping {symbol}: {e}")
+            continue
+        records.append({"symbol": symbol, "sector": row.get("sector"), "industry": row.get("industry"),
+                        "market_cap": row.get("marketCap"), "metrics": metrics})
+        if number % 100 == 0:
+            print(f"📊 {number}/{len(universe)} tickers processed")
+    return records
+
+
+if __name__ == "__main__":
+    # Offline build: python -m utils.sector_peer_index [min_market_cap]
+    import sys
+
+    min_cap = float(sys.argv[1]) if len(sys.argv) > 1 else 2e9
+    universe = fetch_universe(min_cap)
+    print(f"🔍 Building peer index for {len(universe)} tickers...")
+    index = build_peer_index(collect_universe_metrics(universe))
+    save_peer_index(index)
+    print(f"✅ Saved {len(index['arrays'])} peer arrays for {len(index['symbols'])} tickers to {PEER_INDEX_PATH}")
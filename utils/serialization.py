@@ -0,0 +1,96 @@
+import os
+import json
+import math
+import datetime
+from decimal import Decimal
+
+# Fast native JSON backend with a stdlib fallback. Every tool and analyst node serializes through
+# here so payloads are compact by default and the backend can be switched in one place.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:  # numpy comes with pandas, but keep the layer standalone
+    np = None
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson" if orjson else "stdlib")
+if JSON_BACKEND == "orjson" and orjson is None:
+    JSON_BACKEND = "stdlib"
+
+
+def _default(obj):
+    """Converts NumPy / pandas values that neither backend handles natively"""
+    if np is not None:
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+    # pandas missing values (NaT is a datetime subclass, so check before dates)
+    if type(obj).__name__ in ("NaTType", "NAType"):
+        return None
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if JSON_BACKEND == "orjson":
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj, pretty: bool = False) -> bytes:
+        options = _ORJSON_OPTIONS | orjson.OPT_INDENT_2 if pretty else _ORJSON_OPTIONS
+        return orjson.dumps(obj, default=_default, option=options)
+
+    def loads(data):
+        return orjson.loads(data)
+
+else:
+    def _finite(obj):
+        """Copy of obj with NaN / infinity replaced by None - the json module would write them as the
+        invalid tokens NaN / Infinity, orjson writes null"""
+        if isinstance(obj, float):
+            return obj if math.isfinite(obj) else None
+        if isinstance(obj, dict):
+            return {key: _finite(value) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [_finite(value) for value in obj]
+        if np is not None and isinstance(obj, (np.generic, np.ndarray)):
+            return _finite(_default(obj))
+        return obj
+
+    def _json_dumps(obj, pretty: bool) -> str:
+        if pretty:
+            return json.dumps(obj, indent=2, ensure_ascii=False, default=_default, allow_nan=False)
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_default, allow_nan=False)
+
+    def dumps_bytes(obj, pretty: bool = False) -> bytes:
+        try:
+            text = _json_dumps(obj, pretty)
+        except ValueError as e:
+            # Non-finite floats are rare - only then walk the payload to null them
+            if "out of range float" not in str(e).lower():
+                raise
+            text = _json_dumps(_finite(obj), pretty)
+        return text.encode("utf-8")
+
+    def loads(data):
+        return json.loads(data)
+
+
+loads.__doc__ = """Parses JSON from str or bytes (raises json.JSONDecodeError on invalid input)"""
+dumps_bytes.__doc__ = """Serializes obj to UTF-8 JSON bytes - compact unless pretty=True"""
+
+
+def dumps(obj, pretty: bool = False) -> str:
+    """Serializes obj to a JSON string - compact unless pretty=True
+
+    NumPy arrays/scalars, dates and pandas scalars are converted automatically; NaN and infinity are
+    written as null on both backends.
+    """
+    return dumps_bytes(obj, pretty).decode("utf-8")
@@ -0,0 +1,404 @@
+import os
+import signal
+import struct
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.serialization import dumps_bytes, loads
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Host-wide, read-only snapshot of the price store and the statement store in shared memory. One loader
+# process (python -m utils.shared_cache) packs every stored symbol into a single segment - the price
+# fields as (symbol x date) matrices on one common date axis, the statement histories as column blocks -
+# with a small index, and republishes it whenever a store file changes. Worker processes map the segment,
+# and load_prices / load_statements / aligned_closes return views of it instead of decompressing their
+# own copies: one copy per host, and a newly started worker is warm from its first request.
+# An entry is only used while its store file is unchanged, so a worker never reads older data than the
+# file it would otherwise load.
+SHARED_CACHE_NAME = os.getenv("SHARED_CACHE_NAME", "stocker_cache")  # empty disables the shared cache
+SHARED_CACHE_REFRESH_SECONDS = float(os.getenv("SHARED_CACHE_REFRESH_SECONDS", "60"))
+# Symbols with a longer stored history stay file-only - they would widen every row of the matrices
+SHARED_CACHE_MAX_DAYS = int(os.getenv("SHARED_CACHE_MAX_DAYS", "3660"))
+# Seconds a worker waits before looking for a loader again after finding none
+SHARED_CACHE_RETRY_SECONDS = 30
+_ALIGN = 64
+# Segment header: offset and length of the JSON index (written after the arrays)
+_HEADER = struct.Struct("<QQ")
+# Pointer segment: the generation of the current snapshot (0 = none published)
+_POINTER = struct.Struct("<q")
+
+_state = {"pointer": None, "retry_at": 0.0, "generation": 0, "snapshot": None}
+_state_lock = threading.Lock()
+# Replaced segments, unmapped once no views of them are left
+_retired = []
+
+
+def _open_segment(name: str, size: int = 0, track: bool = False) -> shared_memory.SharedMemory:
+    """Creates (size > 0) or attaches a segment; untracked segments outlive the process that opened them"""
+    try:
+        return shared_memory.SharedMemory(name=name, create=size > 0, size=size, track=track)
+    except TypeError:
+        # Before Python 3.13 every process that opens a segment registers it and unlinks it on exit
+        segment = shared_memory.SharedMemory(name=name, create=size > 0, size=size)
+        if not track:
+            resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+
+def _segment_name(generation: int) -> str:
+    return f"{SHARED_CACHE_NAME}_{generation}"
+
+
+def _read_snapshot(segment: shared_memory.SharedMemory) -> dict:
+    """Index and read-only array views of a mapped segment"""
+    index_offset, index_length = _HEADER.unpack_from(segment.buf, 0)
+    index = loads(bytes(segment.buf[index_offset:index_offset + index_length]))
+    arrays = {}
+    for name, (offset, dtype, shape) in index["arrays"].items():
+        array = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=segment.buf, offset=offset)
+        array.flags.writeable = False
+        arrays[name] = array
+    return {"segment": segment, "index": index, "arrays": arrays}
+
+
+def _swap(generation: int):
+    """Maps the given generation (nothing for 0) and unmaps replaced segments nobody reads any more"""
+    snapshot = None
+    if generation:
+        try:
+            snapshot = _read_snapshot(_open_segment(_segment_name(generation)))
+        except FileNotFoundError:
+            # Replaced while attaching (the next read follows the pointer to the newer one) or left
+            # behind by a loader that died
+            snapshot = None
+    old = _state["snapshot"]
+    _state.update(generation=generation, snapshot=snapshot)
+    if old is not None:
+        # Other threads may still read the old snapshot - it is unmapped once their views are gone
+        _retired.append(old["segment"])
+        del old
+    for segment in list(_retired):
+        try:
+            segment.close()
+            _retired.remove(segment)
+        except BufferError:
+            pass
+
+
+def _snapshot():
+    """The current snapshot mapped into this process, or None when no loader has published one"""
+    if not SHARED_CACHE_NAME:
+        return None
+    pointer = _state["pointer"]
+    if pointer is None:
+        if time.monotonic() < _state["retry_at"]:
+            return None
+        with _state_lock:
+            if _state["pointer"] is None:
+                try:
+                    _state["pointer"] = _open_segment(SHARED_CACHE_NAME)
+                except FileNotFoundError:
+                    _state["retry_at"] = time.monotonic() + SHARED_CACHE_RETRY_SECONDS
+                    return None
+            pointer = _state["pointer"]
+    generation = _POINTER.unpack_from(pointer.buf, 0)[0]
+    if generation != _state["generation"]:
+        with _state_lock:
+            if generation != _state["generation"]:
+                _swap(generation)
+    return _state["snapshot"]
+
+
+def _fresh(mtime_ns: int, path: str) -> bool:
+    try:
+        return os.stat(path).st_mtime_ns == mtime_ns
+    except OSError:
+        return False
+
+
+def shared_prices(symbol: str, path: str) -> dict:
+    """Stored bars of a symbol as read-only views of the shared snapshot
+
+    Args:
+        symbol: the symbol
+        path: its price store file (the entry is only used while the file is unchanged)
+
+    Returns:
+        Column arrays in the price_store layout, or None when the snapshot does not hold the current file
+    """
+    snapshot = _snapshot()
+    entry = snapshot["index"]["prices"].get(symbol.upper()) if snapshot else None
+    if not entry or not _fresh(entry[4], path):
+        return None
+    row, first, last, dense, _, complete = entry
+    arrays, columns = snapshot["arrays"], slice(first, last + 1)
+    bars = {"date": arrays["price_date"][columns]}
+    for field in snapshot["index"]["price_fields"]:
+        bars[field] = arrays[f"price_{field}"][row, columns]
+    if not dense:
+        # Dates of the common axis the symbol has no bar for (listed later, halted, ...)
+        present = arrays["price_present"][row, columns]
+        bars = {key: values[present] for key, values in bars.items()}
+    if complete is not None:
+        bars["complete"] = np.array(complete)
+    return bars
+
+
+def shared_aligned(symbols: list, paths: list, lookback: int = None, field: str = "close"):
+    """utils.price_store.aligned_closes straight from the shared matrices
+
+    Returns:
+        (dates, symbols, matrix) like aligned_closes, or None unless every symbol is in the snapshot with
+        its current file
+    """
+    snapshot = _snapshot()
+    if snapshot is None or field not in snapshot["index"]["price_fields"]:
+        return None
+    entries, rows = snapshot["index"]["prices"], {}
+    for symbol, path in zip(symbols, paths):
+        entry = entries.get(symbol.upper())
+        if not entry or not _fresh(entry[4], path):
+            return None
+        rows[symbol] = entry[0]
+    if not rows:
+        return None
+    arrays = snapshot["arrays"]
+    rows_index = list(rows.values())
+    used = np.flatnonzero(arrays["price_present"][rows_index].any(axis=0))
+    if lookback:
+        used = used[-lookback:]
+    return arrays["price_date"][used], list(rows), arrays[f"price_{field}"][np.ix_(rows_index, used)]
+
+
+def shared_statements(ticker: str, period: str, path: str) -> dict:
+    """Stored statement columns of a ticker as read-only views of the shared snapshot
+
+    Returns:
+        Columns in the statement_store layout, or None when the snapshot does not hold the current file
+    """
+    snapshot = _snapshot()
+    entry = snapshot["index"]["statements"].get(f"{ticker.upper()}_{period}") if snapshot else None
+    if not entry or not _fresh(entry[3], path):
+        return None
+    start, stop, complete, _ = entry
+    index, arrays, rows = snapshot["index"], snapshot["arrays"], slice(start, stop)
+    columns = {"date": arrays["statement_date"][rows]}
+    for field in index["statement_text_fields"]:
+        columns[field] = arrays[f"statement_{field}"][rows]
+    for position, field in enumerate(index["statement_fields"]):
+        columns[field] = arrays["statement_values"][position, rows]
+    if complete is not None:
+        columns["complete"] = np.array(complete)
+    return columns
+
+
+def _layout(specs: dict):
+    """{name: (dtype, shape)} -> ({name: [offset, dtype, shape]}, end offset), every array 64-byte aligned"""
+    layout, offset = {}, _ALIGN
+    for name, (dtype, shape) in specs.items():
+        dtype = np.dtype(dtype)
+        layout[name] = [offset, dtype.str, [int(n) for n in shape]]
+        size = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        offset += -(-size // _ALIGN) * _ALIGN
+    return layout, offset
+
+
+def publish_snapshot(prices: dict, statements: dict, pointer: shared_memory.SharedMemory) -> shared_memory.SharedMemory:
+    """Packs the stores into a new segment and points the workers at it
+
+    Args:
+        prices: {symbol: (bars, store file mtime_ns)} in the price_store layout
+        statements: {"TICKER_period": (columns, store file mtime_ns)} in the statement_store layout
+        pointer: the pointer segment
+
+    Returns:
+        The new segment - the caller keeps it open and unlinks it once a newer one is published
+    """
+    symbols = sorted(prices)
+    bars_list = [prices[symbol][0] for symbol in symbols]
+    axis = np.unique(np.concatenate([bars["date"] for bars in bars_list])) if bars_list else np.array([], "datetime64[D]")
+    price_fields = [key for key, values in bars_list[0].items() if key != "date" and values.ndim == 1] if bars_list else []
+    price_entries, positions = {}, []
+    for row, symbol in enumerate(symbols):
+        dates = prices[symbol][0]["date"]
+        position = np.searchsorted(axis, dates)
+        first, last = int(position[0]), int(position[-1])
+        positions.append(position)
+        complete = bool(prices[symbol][0]["complete"]) if "complete" in prices[symbol][0] else None
+        price_entries[symbol] = [row, first, last, last - first + 1 == len(dates), prices[symbol][1], complete]
+
+    keys = sorted(statements)
+    blocks = [statements[key][0] for key in keys]
+    text_fields = [key for key, values in blocks[0].items() if values.dtype.kind == "U"] if blocks else []
+    numeric_fields = [key for key, values in blocks[0].items() if values.ndim == 1 and values.dtype.kind == "f"] if blocks else []
+    statement_entries, start = {}, 0
+    for key, columns in zip(keys, blocks):
+        stop = start + len(columns["date"])
+        complete = bool(columns["complete"]) if "complete" in columns else None
+        statement_entries[key] = [start, stop, complete, statements[key][1]]
+        start = stop
+
+    def stacked(field, empty):
+        return np.concatenate([columns.get(field, np.full(len(columns["date"]), empty)) for columns in blocks]) \
+            if blocks else np.array([], dtype=float if empty is np.nan else str)
+
+    statement_columns = {"date": np.concatenate([columns["date"] for columns in blocks]) if blocks else np.array([], "datetime64[D]")}
+    statement_columns.update({field: stacked(field, "") for field in text_fields})
+
+    shape = (len(symbols), len(axis))
+    specs = {"price_date": (axis.dtype, axis.shape), "price_present": (bool, shape)}
+    specs.update({f"price_{field}": (np.float64, shape) for field in price_fields})
+    specs.update({f"statement_{field}": (values.dtype, values.shape) for field, values in statement_columns.items()})
+    specs["statement_values"] = (np.float64, (len(numeric_fields), start))
+    layout, end = _layout(specs)
+
+    generation = time.time_ns() // 1_000_000
+    index = dumps_bytes({
+        "generation": generation,
+        "arrays": layout,
+        "price_fields": price_fields,
+        "prices": price_entries,
+        "statement_text_fields": text_fields,
+        "statement_fields": numeric_fields,
+        "statements": statement_entries,
+    })
+    segment = _open_segment(_segment_name(generation), end + len(index), track=True)
+    _HEADER.pack_into(segment.buf, 0, end, len(index))
+    segment.buf[end:end + len(index)] = index
+
+    views = {name: np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=segment.buf, offset=offset)
+             for name, (offset, dtype, shape) in layout.items()}
+    views["price_date"][:] = axis
+    views["price_present"][:] = False
+    for field in price_fields:
+        views[f"price_{field}"][:] = np.nan
+    for row, (bars, position) in enumerate(zip(bars_list, positions)):
+        views["price_present"][row, position] = True
+        for field in price_fields:
+            views[f"price_{field}"][row, position] = bars[field]
+    for field, values in statement_columns.items():
+        views[f"statement_{field}"][:] = values
+    for position, field in enumerate(numeric_fields):
+        views["statement_values"][position] = stacked(field, np.nan)
+    # No views may outlive this call, or the segment could not be closed when it is replaced
+    del views
+
+    _POINTER.pack_into(pointer.buf, 0, generation)
+    return segment
+
+
+def store_versions() -> dict:
+    """{store file path: mtime_ns} of the price and statement stores - a change triggers a republish"""
+    from utils.price_store import PRICE_STORE_DIR
+    from utils.statement_store import STATEMENT_STORE_DIR
+
+    versions = {}
+    for directory in (PRICE_STORE_DIR, STATEMENT_STORE_DIR):
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            if name.endswith(".npz") and ".tmp" not in name:
+                path = os.path.join(directory, name)
+                try:
+                    versions[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    pass
+    return versions
+
+
+def _load_file(path: str) -> dict:
+    # The store files themselves - load_prices / load_statements would return the loader's own snapshot
+    with np.load(path) as stored:
+        return {key: stored[key] for key in stored.files}
+
+
+def collect_stores(versions: dict):
+    """Reads the store files listed in versions -> (prices, statements) for publish_snapshot"""
+    from utils.price_store import PRICE_STORE_DIR
+
+    oldest = np.datetime64(date.today() - timedelta(days=SHARED_CACHE_MAX_DAYS))
+    prices, statements = {}, {}
+    for path, mtime_ns in versions.items():
+        name = os.path.basename(path)[:-4]
+        try:
+            columns = _load_file(path)
+            if not len(columns["date"]):
+                continue
+            if os.path.dirname(path) == PRICE_STORE_DIR.rstrip(os.sep):
+                if columns["date"][0] >= oldest:
+                    prices[name] = (columns, mtime_ns)
+            else:
+                statements[name] = (columns, mtime_ns)
+        except Exception as e:
+            print(f"⚠️ Could not read {path}: {e}")
+    return prices, statements
+
+
+def run_loader(refresh_seconds: float = SHARED_CACHE_REFRESH_SECONDS):
+    """Publishes the stores and republishes them whenever a store file changes, until stopped
+
+    The pointer segment is left in place when the loader stops (set to 0), so workers that already
+    mapped it pick up the next loader.
+    """
+    try:
+        pointer = _open_segment(SHARED_CACHE_NAME)
+    except FileNotFoundError:
+        pointer = _open_segment(SHARED_CACHE_NAME, _POINTER.size)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    current, published = None, None
+    try:
+        while True:
+            versions = store_versions()
+            if versions != published:
+                started = time.perf_counter()
+                prices, statements = collect_stores(versions)
+                segment = publish_snapshot(prices, statements, pointer)
+                del prices, statements
+                if current is not None:
+                    current.close()
+                    current.unlink()
+                current, published = segment, versions
+                print(f"🧠 Shared cache {segment.name}: {len(current.buf) / 1e6:.1f} MB "
+                      f"({time.perf_counter() - started:.1f}s)")
+            time.sleep(refresh_seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _POINTER.pack_into(pointer.buf, 0, 0)
+        if current is not None:
+            current.close()
+            current.unlink()
+        pointer.close()
+
+
+def shared_cache_status() -> dict:
+    """What the current snapshot holds, as seen from this process"""
+    snapshot = _snapshot()
+    if snapshot is None:
+        return {"published": False}
+    index = snapshot["index"]
+    return {
+        "published": True,
+        "segment": snapshot["segment"].name,
+        "size_mb": round(len(snapshot["segment"].buf) / 1e6, 1),
+        "symbols": len(index["prices"]),
+        "dates": len(snapshot["arrays"]["price_date"]),
+        "statement_histories": len(index["statements"]),
+    }
+
+
+if __name__ == "__main__":
+    # python -m utils.shared_cache            run the loader (one per host)
+    # python -m utils.shared_cache --status   show the published snapshot
+    if "--status" in sys.argv:
+        print(shared_cache_status())
+    else:
+        run_loader()
@@ -0,0 +1,365 @@
+import os
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.price_store import aligned_closes, last_completed_session, list_symbols, load_prices
+from utils.sector_peer_index import PEER_METRICS, load_peer_index
+
+# Load environment variables from .env file
+load_dotenv()
+
+# "What else looks like NVDA?" - every ticker is a unit feature vector of its recent daily returns
+# (z-normalized, so the dot product of two return blocks is their correlation) and its fundamental
+# ratios from the sector peer index (robust z-scores across the universe). Cosine similarity is one
+# matrix-vector product. Small universes are searched exactly; large ones through an inverted-file
+# (IVF) index: a spherical k-means coarse quantizer whose nprobe closest lists are re-ranked exactly.
+SIMILARITY_INDEX_PATH = os.getenv("SIMILARITY_INDEX_PATH", os.path.join(".cache", "similarity_index.npz"))
+SIM_RETURN_WINDOW = int(os.getenv("SIM_RETURN_WINDOW", "126"))
+# Share of the similarity coming from fundamentals (the rest from the return series)
+SIM_FUNDAMENTAL_WEIGHT = float(os.getenv("SIM_FUNDAMENTAL_WEIGHT", "0.4"))
+# Universes from this size on are searched approximately
+SIM_APPROX_MIN_SIZE = int(os.getenv("SIM_APPROX_MIN_SIZE", "2000"))
+SIM_NPROBE = int(os.getenv("SIM_NPROBE", "8"))
+# While the index is behind the last completed session, the price store is checked for new bars at most
+# this often (the bars may not be there yet, e.g. on holidays)
+SIM_UPDATE_CHECK_SECONDS = float(os.getenv("SIM_UPDATE_CHECK_SECONDS", "300"))
+# A completed session is rolled in once at least this share of the universe has its bar in the store.
+# Tickers still missing it get a gap that is filled from the store when their bar lands.
+SIM_SESSION_MIN_COVERAGE = float(os.getenv("SIM_SESSION_MIN_COVERAGE", "0.8"))
+
+_index = None
+_index_lock = threading.Lock()
+_next_update_check = 0.0
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def standardize_fundamentals(symbols: list, peer_symbols: dict) -> np.ndarray:
+    """Robust z-scores (median / IQR, clipped at +-3) of the peer metrics; missing values score 0"""
+    raw = np.array([[(peer_symbols.get(symbol) or {}).get("metrics", {}).get(metric, np.nan)
+                     for metric in PEER_METRICS] for symbol in symbols], dtype=float).reshape(len(symbols), -1)
+    raw[~np.isfinite(raw)] = np.nan
+    scores = np.zeros_like(raw)
+    for column in range(raw.shape[1]):
+        values = raw[:, column]
+        known = ~np.isnan(values)
+        if known.sum() < 2:
+            continue
+        q1, median, q3 = np.percentile(values[known], [25, 50, 75])
+        scale = (q3 - q1) / 1.349 or np.std(values[known]) or 1.0
+        scores[known, column] = np.clip((values[known] - median) / scale, -3, 3)
+    return scores
+
+
+class SimilarityIndex:
+    """Feature vectors of a ticker universe with exact and IVF top-k search
+
+    The raw return windows are kept, so new daily bars roll into the vectors without a rebuild.
+    """
+
+    def __init__(self, symbols: list, returns: np.ndarray, fundamentals: np.ndarray, last_close: np.ndarray,
+                 dates: np.ndarray, centroids: np.ndarray = None, gaps: dict = None):
+        self.symbols = list(symbols)
+        self.rows = {symbol: row for row, symbol in enumerate(self.symbols)}
+        self.returns = returns.astype(np.float32)            # (tickers, window) raw daily returns
+        self.fundamentals = fundamentals.astype(np.float32)  # (tickers, metrics) robust z-scores
+        self.last_close = last_close.astype(float)
+        self.dates = np.asarray(dates, dtype="datetime64[D]")  # (window + 1) sessions of the closes
+        self.as_of = self.dates[-1]
+        # {symbol: rolled-in sessions its bar was missing for} - repaired from the store when the bar lands
+        self.gaps = gaps or {}
+        self.vectors = self._embed(self.returns, self.fundamentals)
+        self.centroids = centroids
+        self._lists = None
+        if centroids is not None:
+            self._assign()
+
+    @staticmethod
+    def _embed(returns: np.ndarray, fundamentals: np.ndarray) -> np.ndarray:
+        centered = returns - returns.mean(axis=1, keepdims=True)
+        blocks = [np.sqrt(1 - SIM_FUNDAMENTAL_WEIGHT) * _unit_rows(centered)]
+        if fundamentals.shape[1]:
+            blocks.append(np.sqrt(SIM_FUNDAMENTAL_WEIGHT) * _unit_rows(fundamentals))
+        return _unit_rows(np.hstack(blocks)).astype(np.float32)
+
+    # Approximate search -------------------------------------------------------------------------
+
+    def train(self, nlist: int = None, iterations: int = 10, seed: int = 0):
+        """Trains the IVF coarse quantizer (spherical k-means, about sqrt(N) lists)"""
+        n = len(self.symbols)
+        nlist = min(nlist or max(1, int(np.sqrt(n))), n)
+        rng = np.random.default_rng(seed)
+        centroids = self.vectors[rng.choice(n, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(self.vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, self.vectors)
+            empty = np.linalg.norm(sums, axis=1) == 0
+            sums[empty] = self.vectors[rng.choice(n, int(empty.sum()), replace=False)]
+            centroids = _unit_rows(sums)
+        self.centroids = centroids
+        self._assign()
+
+    def _assign(self):
+        """(Re)builds the inverted lists: rows grouped by nearest centroid, CSR-style"""
+        assignment = np.argmax(self.vectors @ self.centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[order], np.arange(len(self.centroids) + 1))
+        self._lists = (order, offsets)
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        order, offsets = self._lists
+        probes = np.argsort(-(self.centroids @ query))[:nprobe]
+        return np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes])
+
+    # Search ---------------------------------------------------------------------------------------
+
+    def search(self, query, k: int = 10, exact: bool = None, nprobe: int = SIM_NPROBE) -> list:
+        """Top-k most similar tickers
+
+        Args:
+            query: a symbol in the index or a feature vector
+            k: number of neighbors
+            exact: force brute-force (True) or IVF (False) search; by default IVF from SIM_APPROX_MIN_SIZE on
+            nprobe: inverted lists scanned by the approximate search
+
+        Returns:
+            List of {"symbol", "similarity"} sorted by similarity, excluding the query symbol itself
+        """
+        exclude = None
+        if isinstance(query, str):
+            exclude = self.rows.get(query.upper())
+            if exclude is None:
+                return []
+            query = self.vectors[exclude]
+        if exact is None:
+            exact = len(self.symbols) < SIM_APPROX_MIN_SIZE
+        if not exact and self.centroids is None:
+            self.train()
+
+        rows = np.arange(len(self.symbols)) if exact else self._candidates(query, nprobe)
+        if exclude is not None:
+            rows = rows[rows != exclude]
+        scores = self.vectors[rows] @ query
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [{"symbol": self.symbols[rows[i]], "similarity": round(float(scores[i]), 4)} for i in top]
+
+    # Incremental updates --------------------------------------------------------------------------
+
+    def add_bar(self, day, closes: dict):
+        """Rolls one new daily bar into every return window
+
+        Args:
+            day: date of the bar (bars at or before the index date are ignored)
+            closes: {symbol: close}; symbols without a close get a zero return for the day and a gap
+        """
+        day = np.datetime64(day, "D")
+        if day <= self.as_of:
+            return
+        new_close = self.last_close.copy()
+        present = np.zeros(len(self.symbols), dtype=bool)
+        for symbol, close in closes.items():
+            row = self.rows.get(symbol.upper())
+            if row is not None and close and np.isfinite(close):
+                new_close[row] = close
+                present[row] = True
+        with np.errstate(invalid="ignore", divide="ignore"):
+            day_returns = np.nan_to_num(new_close / self.last_close - 1, nan=0.0, posinf=0.0, neginf=0.0)
+        self.returns = np.hstack([self.returns[:, 1:], day_returns[:, None].astype(np.float32)])
+        self.last_close = new_close
+        self.dates = np.append(self.dates[1:], day)
+        self.as_of = day
+        for row in np.flatnonzero(~present):
+            self.gaps.setdefault(self.symbols[row], set()).add(day)
+        self._prune_gaps()
+        self.vectors = self._embed(self.returns, self.fundamentals)
+        if self.centroids is not None:
+            # Keep the quantizer, only move tickers between lists
+            self._assign()
+
+    def _prune_gaps(self):
+        """Drops gap sessions that have left the window"""
+        for symbol in list(self.gaps):
+            self.gaps[symbol] = {day for day in self.gaps[symbol] if day > self.dates[0]}
+            if not self.gaps[symbol]:
+                del self.gaps[symbol]
+
+    def _recompute_row(self, symbol: str, bars: dict):
+        """Rebuilds one ticker's return window from its stored bars on the index's session axis"""
+        row = self.rows[symbol]
+        positions = np.minimum(np.searchsorted(bars["date"], self.dates), len(bars["date"]) - 1)
+        found = bars["date"][positions] == self.dates
+        close = np.where(found, bars["close"][positions], np.nan)
+        close[~np.isfinite(close) | (close <= 0)] = np.nan
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.returns[row] = np.nan_to_num(close[1:] / close[:-1] - 1, nan=0.0, posinf=0.0, neginf=0.0)
+        valid = np.flatnonzero(~np.isnan(close))
+        if len(valid):
+            self.last_close[row] = close[valid[-1]]
+        missing = {day for day, known in zip(self.dates[1:], found[1:] & ~np.isnan(close[1:])) if not known}
+        rolled = self.gaps.pop(symbol, set())
+        # Only sessions that were rolled in without the bar stay gaps - history the ticker never had does not
+        if missing & rolled:
+            self.gaps[symbol] = missing & rolled
+
+    def update_from_store(self) -> int:
+        """Rolls in the completed sessions stored in the price store since the index date and fills the
+        gaps of tickers whose bars arrived after their session was rolled in
+
+        A session is only rolled in once it is no later than the last completed session and at least
+        SIM_SESSION_MIN_COVERAGE of the universe has a bar for it - a single ticker's fresh bar does not
+        move the index date for everyone.
+
+        Returns:
+            (sessions rolled in, tickers repaired from the store)
+        """
+        target = np.datetime64(last_completed_session())
+        histories = {}
+        new_bars = {}
+        for symbol in self.symbols:
+            if self.as_of >= target and symbol not in self.gaps:
+                continue
+            bars = load_prices(symbol)
+            if bars is None or not len(bars["date"]):
+                continue
+            histories[symbol] = bars
+            newer = (bars["date"] > self.as_of) & (bars["date"] <= target)
+            for day, close in zip(bars["date"][newer], bars["close"][newer]):
+                if close and np.isfinite(close):
+                    new_bars.setdefault(day, {})[symbol] = close
+
+        added = 0
+        for day in sorted(new_bars):
+            if len(new_bars[day]) < SIM_SESSION_MIN_COVERAGE * len(self.symbols):
+                break
+            self.add_bar(day, new_bars[day])
+            added += 1
+
+        repaired = 0
+        for symbol in list(self.gaps):
+            bars = histories.get(symbol)
+            if bars is not None and np.isin(np.array(sorted(self.gaps[symbol])), bars["date"]).any():
+                self._recompute_row(symbol, bars)
+                repaired += 1
+        if repaired:
+            self.vectors = self._embed(self.returns, self.fundamentals)
+            if self.centroids is not None:
+                self._assign()
+        return added, repaired
+
+    def upsert(self, symbol: str, returns: np.ndarray, fundamentals: np.ndarray, last_close: float):
+        """Adds or replaces one ticker (returns over the index window ending at the index date)"""
+        symbol = symbol.upper()
+        row = self.rows.get(symbol)
+        if row is None:
+            self.symbols.append(symbol)
+            row = self.rows[symbol] = len(self.symbols) - 1
+            self.returns = np.vstack([self.returns, np.zeros((1, self.returns.shape[1]), np.float32)])
+            self.fundamentals = np.vstack([self.fundamentals, np.zeros((1, self.fundamentals.shape[1]), np.float32)])
+            self.last_close = np.append(self.last_close, np.nan)
+            self.vectors = np.vstack([self.vectors, np.zeros((1, self.vectors.shape[1]), np.float32)])
+        self.returns[row] = returns
+        self.fundamentals[row] = fundamentals
+        self.last_close[row] = last_close
+        self.gaps.pop(symbol, None)
+        self.vectors[row] = self._embed(self.returns[row:row + 1], self.fundamentals[row:row + 1])[0]
+        if self.centroids is not None:
+            self._assign()
+
+    # Persistence ----------------------------------------------------------------------------------
+
+    def save(self, path: str = SIMILARITY_INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        gap_pairs = [(symbol, day) for symbol, days in self.gaps.items() for day in sorted(days)]
+        arrays = {"symbols": np.array(self.symbols), "returns": self.returns, "fundamentals": self.fundamentals,
+                  "last_close": self.last_close, "dates": self.dates,
+                  "gap_symbols": np.array([symbol for symbol, _ in gap_pairs], dtype=str),
+                  "gap_days": np.array([day for _, day in gap_pairs], dtype="datetime64[D]")}
+        if self.centroids is not None:
+            arrays["centroids"] = self.centroids
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = SIMILARITY_INDEX_PATH):
+        """The persisted index, None when it predates the stored session axis (rebuild it)"""
+        with np.load(path) as stored:
+            if "dates" not in stored.files:
+                return None
+            gaps = {}
+            for symbol, day in zip(stored["gap_symbols"].tolist(), stored["gap_days"]):
+                gaps.setdefault(symbol, set()).add(day)
+            return cls(stored["symbols"].tolist(), stored["returns"], stored["fundamentals"], stored["last_close"],
+                       stored["dates"], stored["centroids"] if "centroids" in stored.files else None, gaps)
+
+
+def build_similarity_index(symbols: list = None, window: int = SIM_RETURN_WINDOW) -> SimilarityIndex:
+    """Builds the index from the price store and the sector peer index
+
+    Args:
+        symbols: universe (default: every symbol in the price store)
+        window: daily returns per vector
+    """
+    dates, symbols, close = aligned_closes(symbols or list_symbols(), window + 1)
+    if not symbols:
+        raise ValueError("No stored price history to index")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.nan_to_num(close[:, 1:] / close[:, :-1] - 1, nan=0.0, posinf=0.0, neginf=0.0)
+    last_valid = np.where(~np.isnan(close), np.arange(close.shape[1]), 0).max(axis=1)
+    last_close = close[np.arange(len(symbols)), last_valid]
+
+    peer_index = load_peer_index()
+    fundamentals = standardize_fundamentals(symbols, peer_index["symbols"] if peer_index else {})
+    index = SimilarityIndex(symbols, returns, fundamentals, last_close, dates)
+    if len(symbols) >= SIM_APPROX_MIN_SIZE:
+        index.train()
+    return index
+
+
+def get_similarity_index() -> SimilarityIndex:
+    """The persisted index, loaded once per process and rolled forward to the latest stored bars whenever it
+    is behind the last completed session or has gaps waiting for late bars"""
+    global _index, _next_update_check
+    with _index_lock:
+        if _index is None:
+            if not os.path.exists(SIMILARITY_INDEX_PATH):
+                return None
+            _index = SimilarityIndex.load()
+            if _index is None:
+                print("⚠️ The similarity index predates the session axis - rebuild it (python -m utils.similarity_index)")
+                return None
+            _next_update_check = 0.0
+        behind = _index.as_of < np.datetime64(last_completed_session())
+        if (behind or _index.gaps) and time.monotonic() >= _next_update_check:
+            _next_update_check = time.monotonic() + SIM_UPDATE_CHECK_SECONDS
+            if any(_index.update_from_store()):
+                _index.save()
+        return _index
+
+
+def find_similar(ticker: str, k: int = 5, exact: bool = None) -> list:
+    """The k stocks most similar to ticker - [{"symbol", "similarity"}], empty when not indexed"""
+    index = get_similarity_index()
+    if index is None:
+        return []
+    return index.search(ticker, k, exact)
+
+
+if __name__ == "__main__":
+    # Offline build over the price store universe: python -m utils.similarity_index [TICKER]
+    import sys
+
+    index = build_similarity_index()
+    index.save()
+    print(f"✅ Indexed {len(index.symbols)} tickers as of {index.as_of} to {SIMILARITY_INDEX_PATH}")
+    if len(sys.argv) > 1:
+        for neighbor in index.search(sys.argv[1], 10):
+            print(f"  {neighbor['symbol']:<6} {neighbor['similarity']:.3f}")
@@ -0,0 +1,135 @@
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.fundamentals_model import NUMERIC_FIELDS, StatementPeriod
+from utils.shared_cache import shared_statements
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Local statement history, one compressed .npz file per ticker and period type (annual / quarter) in the
+# columnar layout of utils.fundamentals_model. The first fetch of a ticker asks FMP for the full history
+# instead of the usual few periods; afterwards the usual small requests only append the periods the
+# store has not seen, so long-history trends cost no extra payload per request.
+STATEMENT_STORE_DIR = os.getenv("STATEMENT_STORE_DIR", os.path.join(".cache", "statements"))
+STATEMENT_HISTORY_YEARS = int(os.getenv("STATEMENT_HISTORY_YEARS", "12"))
+PERIODS_PER_YEAR = {"annual": 1, "quarter": 4}
+PERIOD_DAYS = {"annual": 366, "quarter": 92}
+TEXT_FIELDS = ("period", "filing_date")
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(key: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def _path(ticker: str, period: str) -> str:
+    return os.path.join(STATEMENT_STORE_DIR, f"{ticker.upper()}_{period}.npz")
+
+
+def periods_to_columns(periods) -> dict:
+    """StatementPeriods -> column arrays sorted by date (oldest first)"""
+    ordered = sorted(periods, key=lambda p: p.date)
+    columns = {"date": np.array([p.date[:10] for p in ordered], dtype="datetime64[D]")}
+    for field in TEXT_FIELDS:
+        columns[field] = np.array([getattr(p, field) or "" for p in ordered], dtype=str)
+    for field in NUMERIC_FIELDS:
+        columns[field] = np.array([getattr(p, field) for p in ordered], dtype=float)
+    return columns
+
+
+def columns_to_periods(columns: dict, limit: int = None) -> list:
+    """Column arrays -> StatementPeriods, newest first"""
+    count = len(columns["date"])
+    rows = range(count - 1, max(count - limit, 0) - 1 if limit else -1, -1)
+    return [
+        StatementPeriod(str(columns["date"][i]), str(columns["period"][i]), str(columns["filing_date"][i]),
+                        **{field: None if np.isnan(columns[field][i]) else columns[field][i] for field in NUMERIC_FIELDS})
+        for i in rows
+    ]
+
+
+def load_statements(ticker: str, period: str = "annual") -> dict:
+    """Returns the stored columns of a ticker (plus the "complete" flag), or None if nothing is stored
+
+    Read-only views of the shared snapshot (utils.shared_cache) while it holds the current file.
+    """
+    path = _path(ticker, period)
+    shared = shared_statements(ticker, period, path)
+    if shared is not None:
+        return shared
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as stored:
+        return {key: stored[key] for key in stored.files}
+
+
+def save_statements(ticker: str, period: str, columns: dict):
+    os.makedirs(STATEMENT_STORE_DIR, exist_ok=True)
+    tmp_path = f"{_path(ticker, period)}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp_path, **columns)
+    os.replace(tmp_path, _path(ticker, period))
+
+
+def append_statements(ticker: str, period: str, periods, complete: bool = False) -> dict:
+    """Merges periods into the stored history - unseen periods are appended, a stored period is only
+    replaced when it comes with a different filing date (a restatement)
+
+    Args:
+        ticker: the ticker the statements belong to
+        period: "annual" or "quarter"
+        periods: StatementPeriods from utils.fundamentals_model.build_periods
+        complete: the request returned the ticker's whole available history
+
+    Returns:
+        The merged columns
+    """
+    new = periods_to_columns(periods)
+    with _lock_for(f"{ticker.upper()}_{period}"):
+        stored = load_statements(ticker, period)
+        if stored is not None and len(stored["date"]):
+            # Rows of the new batch that are not stored as they are
+            stored_keys = set(zip(stored["date"].tolist(), stored["filing_date"].tolist()))
+            fresh = np.array([(d, f) not in stored_keys for d, f in zip(new["date"].tolist(), new["filing_date"].tolist())],
+                             dtype=bool)
+            if not fresh.any() and (not complete or bool(stored["complete"])):
+                return stored
+            keep = ~np.isin(stored["date"], new["date"][fresh])
+            merged = {key: np.concatenate([stored[key][keep], new[key][fresh]]) for key in new}
+            complete = complete or bool(stored["complete"])
+        else:
+            merged = new
+        order = np.argsort(merged["date"], kind="stable")
+        merged = {key: values[order] for key, values in merged.items()}
+        merged["complete"] = np.array(complete)
+        save_statements(ticker, period, merged)
+        return merged
+
+
+def history_limit(period: str) -> int:
+    return STATEMENT_HISTORY_YEARS * PERIODS_PER_YEAR[period]
+
+
+def request_limit(ticker: str, period: str, usual: int) -> int:
+    """Periods to request: the usual few when the store holds the history and is recent enough for the
+    usual request to connect to it, otherwise the full history (one request either way)"""
+    stored = load_statements(ticker, period)
+    if stored is None or not len(stored["date"]):
+        return max(usual, history_limit(period))
+    deep = len(stored["date"]) >= history_limit(period) or bool(stored["complete"])
+    # The usual request reaches back about `usual` periods - older stored data would leave a gap
+    connected = stored["date"][-1] >= np.datetime64(date.today() - timedelta(days=PERIOD_DAYS[period] * usual))
+    return usual if deep and connected else max(usual, history_limit(period))
+
+
+def stored_periods(ticker: str, period: str = "annual", limit: int = None) -> list:
+    """The stored history as StatementPeriods, newest first (empty when nothing is stored)"""
+    stored = load_statements(ticker, period)
+    return columns_to_periods(stored, limit) if stored is not None else []
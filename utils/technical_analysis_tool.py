@@ -1,11 +1,13 @@
 import pandas as pd
 import numpy as np
-import json
 import requests
 from datetime import datetime, timedelta
 from stockstats import wrap
 from dotenv import load_dotenv
 from langchain_core.tools import tool
+from utils.fmp_client import fmp_get, is_cached
+from utils.price_store import PRICE_FIELDS, append_prices, bars_from_fmp, load_prices
+from utils.serialization import dumps, loads
 import os
 import tempfile
 import sys
@@ -13,6 +15,159 @@ import sys
 # Load environment variables from .env file
 load_dotenv()
 
+PRICE_HISTORY_DAYS = 90
+# Weekly and monthly bars are resampled from one long daily series (monthly SMA 50 needs ~4 years).
+# The long window is fetched once per ticker; afterwards the price store holds it and the usual
+# 90-day request tops it up.
+TECHNICAL_HISTORY_DAYS = int(os.getenv("TECHNICAL_HISTORY_DAYS", "1830"))
+# Timeframe: (resampling unit, label of the price change period, bars in that period)
+TIMEFRAMES = {
+    "weekly": ("W", "52w", 52),
+    "monthly": ("M", "36m", 36),
+}
+
+
+def price_window(days: int = PRICE_HISTORY_DAYS):
+    """(from, to) dates of the price request, e.g. to check whether it is already cached"""
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+    return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+
+
+def history_request_days(ticker: str, stored: dict = None) -> int:
+    """Days to request: the usual window when the price store already holds the long history up to
+    the start of that window, otherwise the long window (one request either way)"""
+    stored = stored if stored is not None else load_prices(ticker)
+    if stored is None or not len(stored["date"]):
+        return TECHNICAL_HISTORY_DAYS
+    from_date, _ = price_window()
+    long_from, _ = price_window(TECHNICAL_HISTORY_DAYS)
+    # Bars older than the long window's start (minus a holiday margin) - or a long-window response already
+    # stored, for tickers listed within the window - and no gap before the new window
+    covers = stored["date"][0] <= np.datetime64(long_from) + np.timedelta64(7, "D") or bool(stored.get("complete", False))
+    contiguous = stored["date"][-1] >= np.datetime64(from_date)
+    return PRICE_HISTORY_DAYS if covers and contiguous else TECHNICAL_HISTORY_DAYS
+
+
+def price_request_window(ticker: str, stored: dict = None):
+    """(from, to) dates of the tool's next price request - the long window while it is cached
+
+    Args:
+        ticker: the ticker
+        stored: its stored bars when already loaded
+    """
+    long_window = price_window(TECHNICAL_HISTORY_DAYS)
+    if is_cached("historical-price-full", ticker, **{"from": long_window[0], "to": long_window[1]}):
+        return long_window
+    return price_window(history_request_days(ticker, stored))
+
+
+def _period_keys(days, unit: str):
+    if unit == "W":
+        # Day 0 (1970-01-01) is a Thursday - shifting by 3 makes weeks start on Monday
+        return (days.astype("datetime64[D]").astype(np.int64) + 3) // 7
+    return days.astype("datetime64[M]").astype(np.int64)
+
+
+def resample_bars(bars: dict, unit: str) -> dict:
+    """Daily bars grouped into weekly ("W", Monday-start) or monthly ("M") bars without a Python loop
+
+    Args:
+        bars: column arrays sorted by date (price_store layout)
+        unit: "W" or "M"
+
+    Returns:
+        Column arrays with one bar per period, dated at the period's last trading day
+    """
+    days = bars["date"].astype("datetime64[D]")
+    if not len(days):
+        return {key: bars[key][:0] for key in ("date",) + PRICE_FIELDS}
+    keys = _period_keys(days, unit)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1])
+    ends = np.concatenate([starts[1:], [len(keys)]]) - 1
+    return {
+        "date": days[ends],
+        "open": bars["open"][starts],
+        "high": np.fmax.reduceat(bars["high"], starts),
+        "low": np.fmin.reduceat(bars["low"], starts),
+        "close": bars["close"][ends],
+        "volume": np.add.reduceat(np.nan_to_num(bars["volume"]), starts),
+    }
+
+
+def _bars_frame(bars: dict) -> pd.DataFrame:
+    df = pd.DataFrame({field: bars[field] for field in ("open", "high", "low", "close", "volume")},
+                      index=pd.DatetimeIndex(bars["date"], name="date"))
+    return df.dropna(subset=["close"])
+
+
+def _recent(bars: dict, days: int) -> dict:
+    keep = bars["date"] >= np.datetime64(price_window(days)[0])
+    return {key: bars[key][keep] for key in ("date",) + PRICE_FIELDS}
+
+
+def _round_value(value, digits: int = 2):
+    return round(float(value), digits) if value is not None and not pd.isna(value) else None
+
+
+def indicator_values(df: pd.DataFrame) -> dict:
+    """The indicator set of the technical analysis (SMA 20/50, RSI 14, MACD, Bollinger Bands) on the
+    last bar of a frame - None where the frame is too short"""
+    stock_df = wrap(df.copy())
+    n = len(df)
+    try:
+        return {
+            "sma_20": _round_value(stock_df['close_20_sma'].iloc[-1]) if n >= 20 else None,
+            "sma_50": _round_value(stock_df['close_50_sma'].iloc[-1]) if n >= 50 else None,
+            "rsi_14": _round_value(stock_df['rsi_14'].iloc[-1]) if n >= 14 else None,
+            "macd": _round_value(stock_df['macd'].iloc[-1], 4) if n >= 26 else None,
+            "bollinger_upper": _round_value(stock_df['boll_ub'].iloc[-1]) if n >= 20 else None,
+            "bollinger_lower": _round_value(stock_df['boll_lb'].iloc[-1]) if n >= 20 else None,
+        }
+    except (KeyError, IndexError):
+        return dict.fromkeys(("sma_20", "sma_50", "rsi_14", "macd", "bollinger_upper", "bollinger_lower"))
+
+
+def _trend(close: float, indicators: dict) -> str:
+    sma_20, sma_50, macd = indicators["sma_20"], indicators["sma_50"], indicators["macd"]
+    if sma_20 is None or macd is None:
+        return "unknown"
+    if close > sma_20 and (sma_50 is None or sma_20 > sma_50) and macd > 0:
+        return "uptrend"
+    if close < sma_20 and (sma_50 is None or sma_20 < sma_50) and macd < 0:
+        return "downtrend"
+    return "sideways"
+
+
+def multi_timeframe_summary(bars: dict, daily_indicators: dict) -> dict:
+    """Weekly and monthly indicators resampled from the daily series, plus the trend on every timeframe"""
+    summary = {}
+    trends = {"daily": _trend(bars["close"][-1], daily_indicators)}
+    today = np.array([datetime.now().date()], dtype="datetime64[D]")
+    for timeframe, (unit, change_label, change_bars) in TIMEFRAMES.items():
+        resampled = resample_bars(bars, unit)
+        df = _bars_frame(resampled)
+        if len(df) < 2:
+            continue
+        indicators = indicator_values(df)
+        close = df["close"].to_numpy()
+        reference = close[-change_bars - 1] if len(close) > change_bars else close[0]
+        trends[timeframe] = _trend(close[-1], indicators)
+        summary[timeframe] = {
+            "bars": len(df),
+            # The current week / month is still in progress
+            "last_bar": str(resampled["date"][-1])
+                        + (" (partial)" if _period_keys(resampled["date"][-1:], unit)[0] == _period_keys(today, unit)[0] else ""),
+            **indicators,
+            f"price_change_{change_label}": round((close[-1] / reference - 1) * 100, 2),
+            "trend": trends[timeframe],
+        }
+    known = {trend for trend in trends.values() if trend != "unknown"}
+    summary["trend_alignment"] = f"all {known.pop()}" if len(known) == 1 and len(trends) > 1 else "mixed"
+    summary["trends"] = trends
+    return summary
+
+
 @tool
 def get_technical_analysis(ticker: str) -> str:
     """Get technical analysis data for a stock ticker.
@@ -21,33 +176,23 @@ def get_technical_analysis(ticker: str) -> str:
         ticker: The stock ticker symbol (e.g., 'AAPL', 'GOOGL', 'TSLA')
         
     Returns:
-        JSON string with technical indicators, price data, and market analysis for the last 3 months
+        JSON string with technical indicators, price data, and market analysis for the last 3 months,
+        plus the same indicators on weekly and monthly bars (multi_timeframe)
     """
     api_key = os.getenv("FMP_API_KEY")
     if not api_key:
-        return json.dumps({"error": "FMP_API_KEY not found in environment variables"})
-    
-    base_url = "https://financialmodelingprep.com/api/v3"
+        return dumps({"error": "FMP_API_KEY not found in environment variables"})
     
     try:
-        # Calculate date range for last 3 months
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=90)  # Approximately 3 months
-        
-        # Format dates for API call
-        from_date = start_date.strftime('%Y-%m-%d')
-        to_date = end_date.strftime('%Y-%m-%d')
-        
-        # FMP historical price endpoint
-        url = f"{base_url}/historical-price-full/{ticker}?from={from_date}&to={to_date}&apikey={api_key}"
-        
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
+        # Date range for the last 3 months, formatted for the API call
+        from_date, to_date = price_window()
         
-        api_data = response.json()
+        # FMP historical price endpoint - one request, for the long window only while the store lacks it
+        request_from, _ = price_request_window(ticker)
+        api_data = fmp_get("historical-price-full", ticker, **{"from": request_from, "to": to_date})
         
         if not api_data or 'historical' not in api_data:
-            return json.dumps({"error": f"No historical data available for {ticker}"})
+            return dumps({"error": f"No historical data available for {ticker}"})
         
         # Process and format the data
         data = []
@@ -55,8 +200,19 @@ def get_technical_analysis(ticker: str) -> str:
         
         # Sort by date (oldest first) for technical analysis
         historical_data.sort(key=lambda x: x['date'])
+
+        # Keep the bars in the local price store - the market regime and backtests read from there, and
+        # it holds the long daily series the weekly / monthly bars are resampled from
+        try:
+            history = append_prices(ticker, bars_from_fmp(historical_data),
+                                    complete=request_from <= price_window(TECHNICAL_HISTORY_DAYS)[0])
+        except Exception as e:
+            print(f"⚠️ Could not store prices for {ticker}: {e}")
+            history = bars_from_fmp(historical_data)
         
         for day_data in historical_data:
+            if day_data['date'][:10] < from_date:
+                continue
             date = datetime.strptime(day_data['date'], '%Y-%m-%d')
             
             data.append({
@@ -77,19 +233,7 @@ def get_technical_analysis(ticker: str) -> str:
         df.columns = [col.lower() for col in df.columns]
         
         # Apply technical indicators using stockstats
-        stock_df = wrap(df)
-        
-        # Calculate technical indicators
-        try:
-            # Force calculation of indicators
-            sma_20 = stock_df['close_20_sma'].iloc[-1] if len(df) >= 20 else None
-            sma_50 = stock_df['close_50_sma'].iloc[-1] if len(df) >= 50 else None
-            rsi_14 = stock_df['rsi_14'].iloc[-1] if len(df) >= 14 else None
-            macd = stock_df['macd'].iloc[-1] if len(df) >= 26 else None
-            boll_ub = stock_df['boll_ub'].iloc[-1] if len(df) >= 20 else None
-            boll_lb = stock_df['boll_lb'].iloc[-1] if len(df) >= 20 else None
-        except (KeyError, IndexError):
-            sma_20 = sma_50 = rsi_14 = macd = boll_ub = boll_lb = None
+        daily_indicators = indicator_values(df)
         
         # TODO: add more technical indicators 
         # Removed raw data from the returned object to save tokens and keep the object concise
@@ -108,19 +252,15 @@ def get_technical_analysis(ticker: str) -> str:
                 "volume": data[-1]['Volume']
             },
             "technical_indicators": {
-                "sma_20": round(float(sma_20), 2) if sma_20 and not pd.isna(sma_20) else None,
-                "sma_50": round(float(sma_50), 2) if sma_50 and not pd.isna(sma_50) else None,
-                "rsi_14": round(float(rsi_14), 2) if rsi_14 and not pd.isna(rsi_14) else None,
-                "macd": round(float(macd), 4) if macd and not pd.isna(macd) else None,
-                "bollinger_upper": round(float(boll_ub), 2) if boll_ub and not pd.isna(boll_ub) else None,
-                "bollinger_lower": round(float(boll_lb), 2) if boll_lb and not pd.isna(boll_lb) else None,
+                **daily_indicators,
                 "price_change_3m": round(((data[-1]['Close'] - data[0]['Close']) / data[0]['Close']) * 100, 2),
                 "avg_volume": round(sum([d['Volume'] for d in data]) / len(data)),
                 "volatility_3m": round(df['close'].std(), 2)
-            }
+            },
+            "multi_timeframe": multi_timeframe_summary(_recent(history, TECHNICAL_HISTORY_DAYS), daily_indicators),
         }
         
-        return json.dumps(technical_data, indent=2, default=str)
+        return dumps(technical_data)
         
     except requests.exceptions.RequestException as e:
         error_msg = {
@@ -128,7 +268,7 @@ def get_technical_analysis(ticker: str) -> str:
             "ticker": ticker,
             "data_source": "Financial Modeling Prep"
         }
-        return json.dumps(error_msg, indent=2)
+        return dumps(error_msg)
     
     except Exception as e:
         error_msg = {
@@ -136,14 +276,14 @@ def get_technical_analysis(ticker: str) -> str:
             "ticker": ticker,
             "data_source": "Financial Modeling Prep"
         }
-        return json.dumps(error_msg, indent=2)
+        return dumps(error_msg)
 
 def test_technical_analysis():
     """Test function to verify technical analysis works with AMZN"""
     print("🧪 Testing technical analysis with AMZN...")
     
-    result = get_technical_analysis("AMZN")
-    data = json.loads(result)
+    result = get_technical_analysis.invoke({"ticker": "AMZN"})
+    data = loads(result)
     
     if 'error' in data:
         print(f"❌ Error: {data['error']}")